@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""
+Фото и описания дилера из dealer_photos_for_cars_avito.xml по VIN.
+
+Файл не разбирается целиком в память на каждый запуск:
+- при первом обращении файл индексируется потоково (iterparse) в SQLite
+  с ключом VIN, рядом хранится хэш исходного файла;
+- пока хэш не изменился, индекс переиспользуется между запусками без разбора XML;
+- в памяти остаются только VIN, которые реально запрашивались (машины из фидов).
+
+AvitoPhotosIndex ведёт себя как словарь {vin: {'images': [...], 'description': ...}}
+только для чтения: `vin in index`, `index[vin]`, `index.get(vin)`.
+"""
+
+import json
+import os
+import sqlite3
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, Optional
+
+from file_hashes import hash_file
+
+AVITO_PHOTOS_PATH = './tmp/feeds/photos/dealer_photos_for_cars_avito.xml'
+AVITO_PHOTOS_CACHE_PATH = './tmp/cache/dealer_photos_for_cars_avito.sqlite3'
+# Сколько ждать, пока другой процесс (--workers) достраивает индекс
+AVITO_PHOTOS_LOCK_TIMEOUT = 300
+
+
+def _strip_cdata(text: str) -> str:
+    # Извлекаем текст из CDATA, записанного в файле как экранированный текст
+    if text.startswith('<![CDATA[') and text.endswith(']]>'):
+        return text[9:-3]
+    return text
+
+
+def iter_avito_ads(xml_path: str):
+    """Потоково отдаёт (vin, images, description) для каждого <Ad> верхнего уровня."""
+    depth = 0
+    for event, elem in ET.iterparse(xml_path, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth != 1 or elem.tag != 'Ad':
+            continue
+
+        vin = elem.findtext('VIN')
+        if vin:
+            images_elem = elem.find('Images')
+            images = [image.get('url') for image in images_elem.findall('Image')] if images_elem is not None else []
+            description = _strip_cdata(elem.findtext('Description') or '')
+            yield vin, images, description
+        elem.clear()
+
+
+class AvitoPhotosIndex:
+    def __init__(self, xml_path: str = AVITO_PHOTOS_PATH, cache_path: str = AVITO_PHOTOS_CACHE_PATH):
+        self.xml_path = xml_path
+        self.cache_path = cache_path
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_pid: Optional[int] = None
+        self._opened = False
+        self._entries: Dict[str, Optional[Dict[str, Any]]] = {}
+
+    def _open(self) -> None:
+        self._opened = True
+        if not os.path.exists(self.xml_path):
+            return
+
+        try:
+            source_hash = hash_file(self.xml_path)
+            os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+            db = sqlite3.connect(self.cache_path, timeout=AVITO_PHOTOS_LOCK_TIMEOUT, isolation_level=None)
+            db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS photos ('
+                ' vin TEXT PRIMARY KEY, images TEXT NOT NULL, description TEXT NOT NULL)'
+            )
+            if self._stored_hash(db) != source_hash:
+                self._rebuild(db, source_hash)
+        except Exception as e:
+            print(f"Произошла ошибка при работе с файлом: {e}")
+            return
+
+        self._db = db
+        self._db_pid = os.getpid()
+
+    @staticmethod
+    def _stored_hash(db: sqlite3.Connection) -> Optional[str]:
+        row = db.execute("SELECT value FROM meta WHERE key = 'source_hash'").fetchone()
+        return row[0] if row else None
+
+    def _rebuild(self, db: sqlite3.Connection, source_hash: str) -> None:
+        # Блокировка на запись: параллельные процессы ждут и берут готовый индекс
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            if self._stored_hash(db) == source_hash:
+                db.execute('COMMIT')
+                return
+
+            db.execute('DELETE FROM photos')
+            count = 0
+            for vin, images, description in iter_avito_ads(self.xml_path):
+                # Повторный VIN перезаписывает предыдущий, как и раньше
+                db.execute(
+                    'INSERT OR REPLACE INTO photos (vin, images, description) VALUES (?, ?, ?)',
+                    (vin, json.dumps(images, ensure_ascii=False), description),
+                )
+                count += 1
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('source_hash', ?)", (source_hash,))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            db.close()
+            raise
+        print(f"🗂️ Проиндексирован dealer_photos_for_cars_avito.xml: {count} объявлений")
+
+    def _lookup(self, vin: Any) -> Optional[Dict[str, Any]]:
+        if vin in self._entries:
+            return self._entries[vin]
+        if not self._opened:
+            self._open()
+        if self._db is None or not isinstance(vin, str):
+            return None
+        if self._db_pid != os.getpid():
+            # Соединение SQLite нельзя использовать после fork — открываем своё
+            self._db = sqlite3.connect(self.cache_path, timeout=AVITO_PHOTOS_LOCK_TIMEOUT, isolation_level=None)
+            self._db_pid = os.getpid()
+
+        row = self._db.execute('SELECT images, description FROM photos WHERE vin = ?', (vin,)).fetchone()
+        entry = {'images': json.loads(row[0]), 'description': row[1]} if row else None
+        self._entries[vin] = entry
+        return entry
+
+    def __contains__(self, vin: Any) -> bool:
+        return self._lookup(vin) is not None
+
+    def __getitem__(self, vin: Any) -> Dict[str, Any]:
+        entry = self._lookup(vin)
+        if entry is None:
+            raise KeyError(vin)
+        return entry
+
+    def get(self, vin: Any, default: Any = None) -> Any:
+        entry = self._lookup(vin)
+        return default if entry is None else entry
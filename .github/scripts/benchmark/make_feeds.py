@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+"""
+Синтетические фиды и минимальное дерево сайта для бенчмарка update_cars.py.
+
+Для каждого формата, который знает CarProcessor.setup_source_config, пишет
+feed.xml нужной разметки. duplicate_ratio — доля машин, которые повторяют
+марку/модель/комплектацию/цвет/год уже существующей машины с другим VIN,
+то есть попадают в тот же MDX (friendly_url), как складские дубли в реальных фидах.
+
+Запуск:
+    python .github/scripts/benchmark/make_feeds.py ./tmp/bench/site --source_type ads_ad --cars 10000
+"""
+
+import argparse
+import json
+import os
+import random
+from typing import Dict, List
+from xml.sax.saxutils import escape, quoteattr
+
+SOURCE_TYPES = [
+    'data_cars_car',
+    'ads_ad',
+    'vehicles_vehicle',
+    'catalog_vehicles_vehicle',
+    'carcopy_offers_offer',
+    'yml_catalog_shop_offers_offer',
+]
+
+MODELS = {
+    'Geely': {'coolray': 'Coolray', 'atlas-pro': 'Atlas Pro', 'monjaro': 'Monjaro', 'tugella': 'Tugella'},
+    'Haval': {'jolion': 'Jolion', 'f7': 'F7', 'dargo': 'Dargo', 'h9': 'H9'},
+    'Chery': {'tiggo-4-pro': 'Tiggo 4 Pro', 'tiggo-7-pro-max': 'Tiggo 7 Pro Max', 'tiggo-8-pro-max': 'Tiggo 8 Pro Max'},
+}
+COLORS = [
+    ('white', 'Белый', 'White'),
+    ('black', 'Черный', 'Black'),
+    ('gray', 'Серый', 'Gray'),
+    ('silver', 'Серебристый', 'Silver'),
+    ('blue', 'Синий', 'Blue'),
+]
+COMPLECTATIONS = ['Комфорт', 'Престиж', 'Флагман', 'Люкс', 'Элит']
+MODIFICATIONS = ['1.5 AT (150 л.с.)', '1.5 AMT (147 л.с.)', '2.0 AT (200 л.с.)', '2.0 AT 4WD (238 л.с.)']
+DESCRIPTIONS = [
+    '<p>Автомобиль в наличии в салоне официального дилера.</p><ul><li>Гарантия 7 лет</li><li>Трейд-ин</li></ul>',
+    '<p>Выгода при покупке в кредит.</p><p><strong>Предложение ограничено</strong>*</p>',
+    'Комплектация: {опции} и пакет зимних опций<br>Подогрев руля и сидений',
+    '',
+]
+
+
+def generate_cars(count: int, duplicate_ratio: float = 0.3, seed: int = 1) -> List[Dict[str, str]]:
+    """Машины фида: уникальные конфигурации и их складские дубли (новые VIN, те же признаки MDX)."""
+    rnd = random.Random(seed)
+    unique_count = max(1, round(count * (1 - duplicate_ratio))) if count else 0
+    cars = []
+    for index in range(count):
+        if index < unique_count:
+            brand = rnd.choice(list(MODELS))
+            car = {
+                'brand': brand,
+                'model': rnd.choice(list(MODELS[brand].values())),
+                'color': rnd.choice(COLORS)[1],
+                'complectation': rnd.choice(COMPLECTATIONS),
+                'modification': rnd.choice(MODIFICATIONS),
+                'year': rnd.choice(['2023', '2024', '2025']),
+            }
+        else:
+            car = dict(rnd.choice(cars[:unique_count]))
+        car.update({
+            'id': str(100000 + index),
+            'vin': f"XW{seed:02d}{index:09d}{rnd.randint(0, 999999):06d}"[:17],
+            'price': str(rnd.randint(18, 60) * 100000),
+            'discount': str(rnd.randint(0, 6) * 50000),
+            'description': rnd.choice(DESCRIPTIONS),
+            'images': [f"https://img.bench.local/{index}/{k}.jpg" for k in range(rnd.randint(1, 8))],
+        })
+        cars.append(car)
+    return cars
+
+
+def _tag(name: str, value: str) -> str:
+    return f"<{name}>{escape(value)}</{name}>"
+
+
+def _data_cars_car(car: Dict[str, str]) -> str:
+    images = ''.join(_tag('image', url) for url in car['images'])
+    return (
+        '<car>' + _tag('mark_id', car['brand']) + _tag('folder_id', car['model']) + _tag('vin', car['vin'])
+        + _tag('color', car['color']) + _tag('complectation_name', car['complectation'])
+        + _tag('modification_id', car['modification']) + _tag('year', car['year'])
+        + _tag('price', car['price']) + _tag('max_discount', car['discount'])
+        + _tag('availability', 'в наличии') + _tag('description', car['description'])
+        + f'<images>{images}</images></car>'
+    )
+
+
+def _ads_ad(car: Dict[str, str]) -> str:
+    images = ''.join(f'<Image url={quoteattr(url)}/>' for url in car['images'])
+    return (
+        '<Ad>' + _tag('Id', car['id']) + _tag('Make', car['brand']) + _tag('Model', car['model'])
+        + _tag('VIN', car['vin']) + _tag('Color', car['color']) + _tag('Complectation', car['complectation'])
+        + _tag('Modification', car['modification']) + _tag('Year', car['year'])
+        + _tag('Price', car['price']) + _tag('MaxDiscount', car['discount'])
+        + _tag('Availability', 'в наличии') + _tag('Description', car['description'])
+        + f'<Images>{images}</Images></Ad>'
+    )
+
+
+def _vehicles_vehicle(car: Dict[str, str]) -> str:
+    photos = ''.join(_tag('photo', url) for url in car['images'])
+    return (
+        '<offer>' + _tag('brand', car['brand']) + _tag('model', car['model']) + _tag('vin', car['vin'])
+        + _tag('bodyColor', car['color']) + _tag('complectation', car['complectation'])
+        + _tag('modification', car['modification']) + _tag('year', car['year'])
+        + _tag('price', car['price']) + _tag('creditDiscount', car['discount'])
+        + _tag('availability', 'в наличии') + _tag('description', car['description'])
+        + f'<photos>{photos}</photos></offer>'
+    )
+
+
+def _catalog_vehicles_vehicle(car: Dict[str, str]) -> str:
+    images = ''.join(_tag('image', url) for url in car['images'])
+    return (
+        '<vehicle>' + _tag('mark', car['brand']) + _tag('model', car['model']) + _tag('vin', car['vin'])
+        + _tag('color', car['color']) + _tag('сomplectation-name', car['complectation'])
+        + _tag('modification', car['modification']) + _tag('year', car['year'])
+        + _tag('price', car['price']) + _tag('availability', 'в наличии')
+        + _tag('description', car['description']) + f'<images>{images}</images></vehicle>'
+    )
+
+
+def _carcopy_offers_offer(car: Dict[str, str]) -> str:
+    photos = ''.join(_tag('photo', url) for url in car['images'])
+    return (
+        '<offer>' + _tag('make', car['brand']) + _tag('model', car['model']) + _tag('vin', car['vin'])
+        + _tag('color', car['color']) + _tag('complectation', car['complectation'])
+        + _tag('version', car['modification']) + _tag('year', car['year'])
+        + _tag('price', car['price']) + _tag('max-discount', car['discount'])
+        + _tag('availability', 'в наличии') + _tag('comment', car['description'])
+        + f'<photos>{photos}</photos></offer>'
+    )
+
+
+def _yml_offer(car: Dict[str, str]) -> str:
+    pictures = ''.join(_tag('picture', url) for url in car['images'])
+    params = ''.join(
+        f'<param name={quoteattr(name)}>{escape(value)}</param>'
+        for name, value in (('Модель', car['model']), ('Цвет', car['color']), ('Год выпуска', car['year']))
+    )
+    return (
+        f'<offer id="{car["id"]}" available="true">' + _tag('vendor', car['brand'])
+        + _tag('model', f"{car['model']} {car['modification']}") + _tag('price', car['price'])
+        + _tag('sales_notes', f"Максимальная скидка: {car['discount']}")
+        + _tag('description', car['description']) + params + pictures + '</offer>'
+    )
+
+
+# тип источника → (начало документа, разметка одной машины, конец документа)
+FEED_LAYOUTS: Dict[str, tuple] = {
+    'data_cars_car': ('<data><cars>', _data_cars_car, '</cars></data>'),
+    'ads_ad': ('<Ads formatVersion="3" target="Avito.ru">', _ads_ad, '</Ads>'),
+    'vehicles_vehicle': ('<vehicles>', _vehicles_vehicle, '</vehicles>'),
+    'catalog_vehicles_vehicle': ('<catalog><vehicles>', _catalog_vehicles_vehicle, '</vehicles></catalog>'),
+    'carcopy_offers_offer': ('<carcopy><offers>', _carcopy_offers_offer, '</offers></carcopy>'),
+    'yml_catalog_shop_offers_offer': (
+        '<yml_catalog date="2025-01-01 00:00"><shop><name>Bench</name><offers>',
+        _yml_offer,
+        '</offers></shop></yml_catalog>',
+    ),
+}
+
+
+def write_feed(path: str, source_type: str, cars: List[Dict[str, str]]) -> None:
+    """Пишет фид построчно, не собирая весь документ в памяти (нужно для 100k машин)."""
+    head, render_car, tail = FEED_LAYOUTS[source_type]
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("<?xml version='1.0' encoding='utf-8'?>\n" + head + '\n')
+        for car in cars:
+            f.write(render_car(car) + '\n')
+        f.write(tail + '\n')
+
+
+def _write_json(path: str, data) -> None:
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def write_site(root: str) -> None:
+    """Минимальные данные сайта, которые update_cars.py читает при импорте и обработке."""
+    _write_json(os.path.join(root, 'src/data/common/defaults/model.json'), {'feed': {}})
+    for brand, models in MODELS.items():
+        brand_id = brand.lower()
+        _write_json(os.path.join(root, f'src/data/common/brands/{brand_id}/defaults.json'), {'brand': {'id': brand_id, 'name': brand}})
+        for model_id, name in models.items():
+            _write_json(os.path.join(root, f'src/data/common/brands/{brand_id}/models/{model_id}.json'), {
+                'name': name,
+                'feed': {'folderIds': [name, name.upper()]},
+                'colors': [
+                    {'id': color_id, 'name': rus, 'names': [rus, eng], 'carImage': f'/img/colors/{color_id}.webp'}
+                    for color_id, rus, eng in COLORS
+                ],
+            })
+    _write_json(os.path.join(root, 'src/data/site/settings.json'), {'legal_city': 'Самара', 'legal_city_where': 'Самаре'})
+    _write_json(os.path.join(root, 'src/data/site/routes.json'), {'redirects': {}})
+    _write_json(os.path.join(root, 'src/data/site/sort_storage.json'), {})
+
+
+def build_case(root: str, source_type: str, cars_count: int, duplicate_ratio: float, seed: int = 1) -> str:
+    """Готовит дерево сайта с фидом и возвращает путь к feed.xml."""
+    write_site(root)
+    feed_path = os.path.join(root, 'feed.xml')
+    write_feed(feed_path, source_type, generate_cars(cars_count, duplicate_ratio, seed))
+    return feed_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic site tree and feed for update_cars.py')
+    parser.add_argument('output_dir', help='Site root to create')
+    parser.add_argument('--source_type', choices=SOURCE_TYPES, default='data_cars_car')
+    parser.add_argument('--cars', type=int, default=1000)
+    parser.add_argument('--duplicate_ratio', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    feed_path = build_case(args.output_dir, args.source_type, args.cars, args.duplicate_ratio, args.seed)
+    print(f"✅ {feed_path}: {args.cars} машин ({args.source_type}, дубли {args.duplicate_ratio:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+"""
+Сквозной бенчмарк update_cars.py на синтетических фидах (см. make_feeds.py).
+
+Для каждой комбинации формата, размера фида и доли дублей собирает отдельный
+сайт во временной папке, запускает update_cars.py в режиме одного файла с
+--skip_thumbs --skip_check_thumb и замеряет время, машин/с и пиковый RSS
+процесса. Результаты сравниваются с сохранённым baseline.json; при
+ухудшении больше --tolerance скрипт завершается с кодом 1. baseline.json
+зависит от машины и в репозиторий не входит: без него (или без нужного
+случая в нём) сравнение не проходит, пока baseline не сохранён --save_baseline.
+
+Запуск:
+    python .github/scripts/benchmark/run_benchmark.py --sizes 1000 10000
+    python .github/scripts/benchmark/run_benchmark.py --sizes 1000 --save_baseline
+    python .github/scripts/benchmark/run_benchmark.py --source_types ads_ad --sizes 100000 -- --workers 4
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from make_feeds import SOURCE_TYPES, build_case
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+UPDATE_CARS = os.path.join(os.path.dirname(BENCHMARK_DIR), 'update_cars.py')
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, 'baseline.json')
+DEFAULT_SIZES = [1000, 10000]
+DEFAULT_TOLERANCE = 0.2
+
+
+def case_key(source_type: str, cars: int, duplicate_ratio: float) -> str:
+    return f"{source_type}/{cars}/{duplicate_ratio:g}"
+
+
+def run_case(work_dir: str, source_type: str, cars: int, duplicate_ratio: float, extra_args: List[str]) -> Dict[str, object]:
+    site = os.path.join(work_dir, case_key(source_type, cars, duplicate_ratio).replace('/', '_'))
+    if os.path.exists(site):
+        shutil.rmtree(site)
+    build_case(site, source_type, cars, duplicate_ratio)
+
+    command = [
+        sys.executable, UPDATE_CARS,
+        '--source_type', source_type,
+        '--input_file', 'feed.xml',
+        '--output_path', './public/cars.xml',
+        '--cars_dir', 'src/content/cars',
+        '--temp_cars_dir', 'tmp/content/cars',
+        '--domain', 'bench.local',
+        '--skip_thumbs', '--skip_check_thumb',
+        '--run_report', 'tmp/run_report.json',
+        *extra_args,
+    ]
+    log_path = os.path.join(site, 'update_cars.log')
+    started = time.perf_counter()
+    with open(log_path, 'w', encoding='utf-8') as log:
+        process = subprocess.Popen(command, cwd=site, stdout=log, stderr=subprocess.STDOUT)
+        # wait4 отдаёт rusage именно этого процесса (ru_maxrss в КиБ на Linux)
+        _pid, status, usage = os.wait4(process.pid, 0)
+    wall_time = time.perf_counter() - started
+    # Процесс уже собран wait4 — сообщаем Popen код завершения, чтобы он не ждал его повторно
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise RuntimeError(f"update_cars.py завершился с кодом {process.returncode}, лог: {log_path}")
+
+    with open(os.path.join(site, 'tmp/run_report.json'), encoding='utf-8') as f:
+        report = json.load(f)
+
+    return {
+        'cars': cars,
+        'processed_cars': report.get('cars', 0),
+        'wall_time': round(wall_time, 3),
+        'cars_per_sec': round(cars / wall_time, 1),
+        'peak_rss_mb': round(usage.ru_maxrss / 1024, 1),
+        'stages': {name: values['total'] for name, values in report.get('stages', {}).items()},
+    }
+
+
+def compare(result: Dict[str, object], baseline: Optional[Dict[str, object]], tolerance: float) -> List[str]:
+    """Список ухудшений относительно baseline (пустой — всё в пределах tolerance)."""
+    if not baseline:
+        return []
+    regressions = []
+    if result['cars_per_sec'] < baseline['cars_per_sec'] * (1 - tolerance):
+        regressions.append(f"ухудшение: машин/с {result['cars_per_sec']} < {baseline['cars_per_sec']}")
+    if result['peak_rss_mb'] > baseline['peak_rss_mb'] * (1 + tolerance):
+        regressions.append(f"ухудшение: RSS {result['peak_rss_mb']} МБ > {baseline['peak_rss_mb']} МБ")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='End-to-end update_cars.py throughput benchmark on synthetic feeds. '
+                    'Arguments after "--" are passed to update_cars.py.'
+    )
+    parser.add_argument('--source_types', nargs='*', choices=SOURCE_TYPES, default=SOURCE_TYPES)
+    parser.add_argument('--sizes', nargs='*', type=int, default=DEFAULT_SIZES, help='Feed sizes, e.g. 1000 10000 100000')
+    parser.add_argument('--duplicate_ratios', nargs='*', type=float, default=[0.3], help='Share of cars sharing a friendly_url with another car')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Stored results to compare against')
+    parser.add_argument('--save_baseline', action='store_true', help='Write these results to --baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='Allowed relative slowdown / RSS growth')
+    parser.add_argument('--output', help='Write the results as JSON')
+    parser.add_argument('--work_dir', help='Where to build sites (temporary directory by default)')
+    args, extra_args = parser.parse_known_args()
+    if extra_args[:1] == ['--']:
+        extra_args = extra_args[1:]
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f).get('results', {})
+    elif not args.save_baseline:
+        print(f"❌ Нет baseline {args.baseline}: сравнивать не с чем. Сохраните его на этой машине "
+              f"запуском с --save_baseline (до изменений), затем повторите сравнение.")
+        sys.exit(2)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='update_cars_bench_')
+    results = {}
+    failed = False
+    try:
+        for source_type in args.source_types:
+            for cars in args.sizes:
+                for duplicate_ratio in args.duplicate_ratios:
+                    key = case_key(source_type, cars, duplicate_ratio)
+                    result = run_case(work_dir, source_type, cars, duplicate_ratio, extra_args)
+                    results[key] = result
+                    previous = baseline.get(key)
+                    if previous is None and not args.save_baseline:
+                        regressions = [f"случая нет в {args.baseline} — сохраните его с --save_baseline"]
+                    else:
+                        regressions = compare(result, previous, args.tolerance)
+                    failed = failed or bool(regressions)
+                    vs_baseline = f" (baseline {previous['cars_per_sec']} машин/с)" if previous else ''
+                    print(
+                        f"{'❌' if regressions else '✅'} {key}: {result['wall_time']} с, "
+                        f"{result['cars_per_sec']} машин/с{vs_baseline}, RSS {result['peak_rss_mb']} МБ, "
+                        f"в cars.xml {result['processed_cars']}"
+                    )
+                    for regression in regressions:
+                        print(f"   {regression}")
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    payload = {'update_cars_args': extra_args, 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        merged = {**baseline, **results}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'update_cars_args': extra_args, 'results': merged}, f, ensure_ascii=False, indent=2)
+        print(f"🧾 Baseline сохранён: {args.baseline}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
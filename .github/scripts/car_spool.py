@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+Временный файл для машин, которые нужно держать до конца фида.
+
+- --incremental: XML и подготовленные машины ждут, пока по всему фиду не станет
+  ясно, какие группы (MDX-файлы) берутся из прошлого запуска;
+- --feed_workers: подготовленные машины фида из процесса пула ждут, пока
+  основной процесс сведёт предыдущие фиды.
+
+Машины пишутся pickle подряд, в памяти остаются только смещения в файле,
+поэтому с --stream_xml память и в этих режимах не растёт с размером фида.
+"""
+
+import os
+import pickle
+import tempfile
+from typing import Any, Iterator
+
+
+class CarSpool:
+    """Объекты во временном файле: append() возвращает смещение для read()."""
+
+    def __init__(self, named: bool = False):
+        # named: файл остаётся на диске после detach() и читается другим процессом (iter_spool)
+        if named:
+            self._file = tempfile.NamedTemporaryFile(prefix='cars_', suffix='.spool', delete=False)
+            self.path = self._file.name
+        else:
+            self._file = tempfile.TemporaryFile(prefix='cars_', suffix='.spool')
+            self.path = None
+        self._end = 0
+        # Позиция файла — в конце: подряд идущие append() не двигают позицию
+        self._at_end = True
+
+    def append(self, value: Any) -> int:
+        if not self._at_end:
+            self._file.seek(self._end)
+            self._at_end = True
+        offset = self._end
+        pickle.dump(value, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._end = self._file.tell()
+        return offset
+
+    def read(self, offset: int) -> Any:
+        self._file.seek(offset)
+        self._at_end = False
+        return pickle.load(self._file)
+
+    def detach(self) -> str:
+        """Закрывает файл, оставляя его на диске; путь — для iter_spool."""
+        self._file.close()
+        return self.path
+
+    def close(self) -> None:
+        self._file.close()
+        if self.path is not None:
+            remove_spool(self.path)
+
+
+def iter_spool(path: str) -> Iterator[Any]:
+    """Объекты файла CarSpool по порядку; файл удаляется после чтения."""
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+    finally:
+        remove_spool(path)
+
+
+def remove_spool(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""
+Шаблоны h1/breadcrumb/title/description страниц машин (*_template конфигурации источника).
+
+Шаблон разбирается один раз за запуск (compile_template кэширует результат по тексту):
+получается список литералов, полей {{car.x}} / {{config.x}} и — в description —
+условных блоков {% if car.x %}...{% endif %}. Отрисовка для машины — склейка строк
+без регулярных выражений, результат тот же, что у прежних re.sub по шаблону.
+
+Ошибки в шаблоне (незакрытые {{ и {% if %}, неизвестный плейсхолдер)
+раньше молча попадали в страницы каждой машины; теперь compile_car_templates()
+проверяет шаблоны при загрузке конфигурации и сразу бросает TemplateError.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Tuple
+
+_PLACEHOLDER_RE = re.compile(r'\{\{\s*([^}]+)\s*\}\}')
+_CONDITION_RE = re.compile(r'\{% if ([^%]+)%\}([\s\S]*?)\{% endif %\}')
+# Следы разметки шаблона, которые не разобрались ни в плейсхолдер, ни в условие
+_MARKUP_LEFTOVERS = ('{{', '}}', '{%', '%}')
+
+DEFAULT_TEMPLATES = {
+    'h1_template': '{{car.mark_id}} {{car.folder_id}} {{car.modification_id}} {{car.complectation_name}} {{car.color}}',
+    'breadcrumb_template': '{{car.mark_id}} {{car.folder_id}} {{car.complectation_name}}',
+    'title_template': (
+        'Купить {{car.mark_id}} {{car.folder_id}} {{car.modification_id}} {{car.complectation_name}} {{car.color}}'
+        ' у официального дилера в {{config.legal_city_where}}'
+    ),
+    'description_template': (
+        'Купить автомобиль {{car.mark_id}} {{car.folder_id}}'
+        '{% if car.year %} {{car.year}} года выпуска{% endif %}'
+        '{% if car.complectation_name %}, комплектация {{car.complectation_name}}{% endif %}'
+        '{% if car.color %}, цвет - {{car.color}}{% endif %}'
+        '{% if car.modification_id %}, двигатель - {{car.modification_id}}{% endif %}'
+        ' у официального дилера в г. {{config.legal_city}}. Стоимость данного автомобиля {{car.mark_id}} {{car.folder_id}} – {{car.priceWithDiscount}}'
+    ),
+}
+# Условные блоки поддерживаются только в description_template
+CONDITIONAL_TEMPLATES = frozenset({'description_template'})
+
+# Элементы разобранного шаблона: (_LITERAL, текст), (_CAR, поле), (_CONFIG, поле), (_IF, поле, элементы)
+_LITERAL, _CAR, _CONFIG, _IF = range(4)
+
+
+class TemplateError(ValueError):
+    """Шаблон из конфигурации не разбирается."""
+
+
+def _compile_segments(text: str) -> List[Tuple]:
+    """Литералы и плейсхолдеры {{car.x}} / {{config.x}} куска шаблона без условий."""
+    items = []
+    position = 0
+    for match in _PLACEHOLDER_RE.finditer(text):
+        items.append((_LITERAL, text[position:match.start()]))
+        expr = match.group(1).strip()
+        if expr.startswith('car.') and expr[4:]:
+            items.append((_CAR, expr[4:]))
+        elif expr.startswith('config.') and expr[7:]:
+            items.append((_CONFIG, expr[7:]))
+        else:
+            raise TemplateError(f"неизвестный плейсхолдер {match.group(0)}")
+        position = match.end()
+    items.append((_LITERAL, text[position:]))
+
+    for item in items:
+        if item[0] == _LITERAL:
+            leftover = next((markup for markup in _MARKUP_LEFTOVERS if markup in item[1]), None)
+            if leftover is not None:
+                raise TemplateError(f"непарная разметка {leftover} в «{item[1]}»")
+    return [item for item in items if item != (_LITERAL, '')]
+
+
+def _compile_conditional(template: str) -> List[Tuple]:
+    """Шаблон description: куски между {% if car.x %}...{% endif %} и сами блоки."""
+    items = []
+    pieces = []
+    position = 0
+    for block in _CONDITION_RE.finditer(template):
+        pieces.append(template[position:block.start()])
+        items.extend(_compile_segments(template[position:block.start()]))
+        expr = block.group(1).strip()
+        if expr.startswith('car.') and expr[4:]:
+            pieces.append(block.group(2))
+            items.append((_IF, expr[4:], _compile_segments(block.group(2))))
+        else:
+            # Условие не по полю машины (например, {% if config.x %}) всегда ложно — блок пустой, как и прежде
+            pieces.append('')
+        position = block.end()
+    pieces.append(template[position:])
+    items.extend(_compile_segments(template[position:]))
+
+    # Прежде плейсхолдеры искались уже после подстановки условий: «{» в конце
+    # куска вместе со следующим куском могла образовать новый плейсхолдер
+    for piece in pieces[:-1]:
+        if piece.endswith('{'):
+            raise TemplateError(f"фигурная скобка перед блоком {{% if %}}: «{piece}»")
+    return items
+
+
+def _render(items: List[Tuple], car: Dict[str, Any], config: Dict[str, Any], parts: List[str]) -> None:
+    for item in items:
+        kind = item[0]
+        if kind == _LITERAL:
+            parts.append(item[1])
+        elif kind == _CAR:
+            parts.append(str(car.get(item[1], '')))
+        elif kind == _CONFIG:
+            parts.append(str(config.get(item[1], '')))
+        elif car.get(item[1]):
+            _render(item[2], car, config, parts)
+
+
+@lru_cache(maxsize=64)
+def compile_template(template: str, conditional: bool = False) -> Callable[[Dict[str, Any], Dict[str, Any]], str]:
+    """
+    Разбирает шаблон в функцию render(car, config) -> str.
+    conditional: разбирать {% if car.x %}...{% endif %} (шаблон description).
+    """
+    items = _compile_conditional(template) if conditional else _compile_segments(template)
+
+    def render(car: Dict[str, Any], config: Dict[str, Any]) -> str:
+        parts: List[str] = []
+        _render(items, car, config, parts)
+        return ''.join(parts)
+
+    return render
+
+
+def get_template_renderer(config: Dict[str, Any], key: str) -> Callable[[Dict[str, Any], Dict[str, Any]], str]:
+    """Функция отрисовки шаблона key из config (или шаблона по умолчанию)."""
+    return compile_template(config.get(key) or DEFAULT_TEMPLATES[key], key in CONDITIONAL_TEMPLATES)
+
+
+def compile_car_templates(config: Dict[str, Any]) -> None:
+    """Разбирает все *_template конфигурации; ошибка в шаблоне — TemplateError с именем ключа."""
+    for key in DEFAULT_TEMPLATES:
+        try:
+            get_template_renderer(config, key)
+        except TemplateError as e:
+            raise TemplateError(f"Ошибка в шаблоне {key}: {e}") from None
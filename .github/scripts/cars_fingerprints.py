@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+"""
+Хранилище отпечатков машин для инкрементального режима update_cars.py (--incremental).
+
+Лежит рядом с sort_storage.json. Единица повторного использования — MDX-файл
+(группа машин с одним friendly_url): для группы запоминаем отпечатки входных
+данных её машин и всё, что группа дала запуску — элементы cars.xml, строки цен
+для dealer-models_cars_price.json, превью, номер order, сообщения output.txt,
+отложенную ошибку цвета и хэш итогового MDX. Сообщения повторяются при взятии
+группы, поэтому output.txt тот же, что при обработке.
+
+Группа берётся из прошлого запуска, только если все её машины не изменились,
+в неё не попала новая машина, опубликованный MDX и превью на месте,
+а запись не старше max_age_hours.
+"""
+
+import json
+import os
+import time
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
+
+from file_hashes import hash_file
+
+FINGERPRINTS_PATH = './src/data/site/cars_fingerprints.json'
+FINGERPRINTS_VERSION = 2
+DEFAULT_MAX_AGE_HOURS = 24
+
+
+def element_to_record(car_elem: ET.Element) -> List[list]:
+    """Элемент машины cars.xml → JSON-совместимый список [тег, текст] (images — список URL)."""
+    record = []
+    for child in car_elem:
+        if child.tag == 'images':
+            record.append(['images', [image.text for image in child]])
+        else:
+            record.append([child.tag, child.text])
+    return record
+
+
+def record_to_element(record: List[list]) -> ET.Element:
+    """Обратное преобразование element_to_record (тот же порядок полей, что у create_car_element)."""
+    car_elem = ET.Element('car')
+    for tag, value in record:
+        elem = ET.SubElement(car_elem, tag)
+        if tag == 'images':
+            for image_url in value:
+                ET.SubElement(elem, 'image').text = image_url
+        else:
+            elem.text = value
+    return car_elem
+
+
+class CarsFingerprintStore:
+    def __init__(self, path: str = FINGERPRINTS_PATH, max_age_hours: float = DEFAULT_MAX_AGE_HOURS):
+        self.path = path
+        self.max_age_seconds = float(max_age_hours) * 3600
+        self.now = time.time()
+
+        # Группы прошлого запуска и группы, собранные (или взятые повторно) в этом запуске.
+        # Ключ группы — путь опубликованного MDX (cars_dir/friendly_url.mdx).
+        self.previous_groups: Dict[str, Dict[str, Any]] = {}
+        self.groups: Dict[str, Dict[str, Any]] = {}
+        self._temp_paths: Dict[str, str] = {}
+        self._processed_dirs: Set[str] = set()
+        self.reused_count = 0
+
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Не удалось прочитать {self.path}: {e}. Все машины будут обработаны заново")
+            return
+
+        if data.get('version') != FINGERPRINTS_VERSION:
+            return
+        self.previous_groups = data.get('groups', {})
+
+    @staticmethod
+    def group_key(cars_dir: str, file_path: str) -> str:
+        return os.path.normpath(os.path.join(cars_dir, os.path.basename(file_path)))
+
+    def find_reusable_groups(self, entries: List[Dict[str, Any]], environment: str, cars_dir: str) -> Set[str]:
+        """
+        Помечает entry['group'] у машин, чьи отпечатки совпали с прошлым запуском,
+        и возвращает ключи групп, которые можно взять целиком.
+
+        entries — машины фида в порядке обработки: {'vin', 'fingerprint', ...}.
+        """
+        self._processed_dirs.add(os.path.normpath(cars_dir))
+
+        groups_by_car = {}
+        for key, record in self.previous_groups.items():
+            if record.get('environment') != environment or os.path.dirname(key) != os.path.normpath(cars_dir):
+                continue
+            for vin, fingerprint in record['cars']:
+                groups_by_car[(vin, fingerprint)] = key
+
+        cars_by_group: Dict[str, List[list]] = {}
+        for entry in entries:
+            key = groups_by_car.get((entry['vin'], entry['fingerprint']))
+            entry['group'] = key
+            if key is not None:
+                cars_by_group.setdefault(key, []).append([entry['vin'], entry['fingerprint']])
+
+        reusable = set()
+        for key, cars in cars_by_group.items():
+            record = self.previous_groups[key]
+            if (
+                cars == record['cars']
+                and self.now - record.get('rendered_at', 0) < self.max_age_seconds
+                and hash_file(key) == record.get('mdx_hash')
+                and all(os.path.exists(thumb) for thumb in record.get('thumbs', []))
+            ):
+                reusable.add(key)
+        return reusable
+
+    def reuse_group(self, key: str, temp_path: str) -> Dict[str, Any]:
+        """Переносит запись группы прошлого запуска в текущий и возвращает её."""
+        record = self.previous_groups[key]
+        self.groups[key] = record
+        self._temp_paths[key] = temp_path
+        self.reused_count += 1
+        return record
+
+    def record_car(
+        self,
+        key: str,
+        temp_path: str,
+        environment: str,
+        vin: str,
+        fingerprint: str,
+        car_elem: ET.Element,
+        price_row: Optional[list],
+        thumbs: List[str],
+        order: Optional[int],
+        messages: List[list],
+    ) -> None:
+        """Добавляет обработанную машину в группу текущего запуска."""
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = {
+                'environment': environment,
+                'cars': [],
+                'xml': [],
+                'prices': [],
+                'thumbs': [],
+                'order': order,
+                'messages': [],
+                'rendered_at': self.now,
+            }
+            self._temp_paths[key] = temp_path
+        group['cars'].append([vin, fingerprint])
+        group['xml'].append(car_elem)
+        group['prices'].append(price_row)
+        group['thumbs'].extend(thumbs)
+        group['messages'].extend(messages)
+
+    def save(
+        self,
+        color_errors: Optional[Mapping[str, Tuple[str, tuple]]] = None,
+        groups_with_images: Optional[Mapping[str, bool]] = None,
+    ) -> None:
+        """
+        Сохраняет группы этого запуска; группы каталогов, которые в этом запуске
+        не обрабатывались (например, другой режим запуска), остаются как были.
+
+        color_errors / groups_with_images — отложенные ошибки цвета и признак
+        «в группе есть фото» по временному пути MDX (CarProcessor.pending_color_errors
+        и friendly_url_has_images): они решаются по всей группе в конце запуска.
+        """
+        color_errors = color_errors or {}
+        groups_with_images = groups_with_images or {}
+        groups = {
+            key: record
+            for key, record in self.previous_groups.items()
+            if os.path.dirname(key) not in self._processed_dirs
+        }
+
+        for key, group in self.groups.items():
+            temp_path = self._temp_paths[key]
+            mdx_hash = hash_file(temp_path)
+            if mdx_hash is None:
+                continue
+            groups[key] = {
+                **group,
+                'xml': [
+                    element if isinstance(element, list) else element_to_record(element)
+                    for element in group['xml']
+                ],
+                'color_error': color_errors.get(temp_path),
+                'has_images': bool(groups_with_images.get(temp_path)),
+                'mdx_hash': mdx_hash,
+            }
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temp_name = f"{self.path}.tmp"
+        with open(temp_name, 'w', encoding='utf-8') as f:
+            json.dump({'version': FINGERPRINTS_VERSION, 'groups': groups}, f, ensure_ascii=False)
+        os.replace(temp_name, self.path)
+        print(f"🧾 Отпечатки машин сохранены: {self.path} (групп: {len(groups)}, взято без изменений: {self.reused_count})")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+Скомпилированные снимки layered model catalog для config.py.
+
+Сборка каталога (чтение и deep_merge слоёв JSON, индексы моделей и
+комплектаций) нужна каждому скрипту и тесту, импортирующему config.py.
+Снимок хранит уже собранный результат в pickle-файле — отдельно сводку
+каталога и каждый бренд (см. config.ModelCatalog):
+
+- пока mtime и размер всех исходных файлов не изменились, снимок отдаётся сразу;
+- если изменились только mtime (например, свежий checkout в CI), сверяются
+  хэши содержимого — при совпадении снимок переиспользуется;
+- иначе каталог собирается заново и снимок перезаписывается.
+
+Ключ снимка включает версию кода сборки, поэтому правка config.py тоже
+приводит к пересборке.
+"""
+
+import os
+import pickle
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from file_hashes import file_stamp, hash_file
+
+CATALOG_SNAPSHOT_DIR = './tmp/cache/model_catalog'
+
+
+def _read_snapshot(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except Exception:
+        # Нет снимка или он битый — просто собираем заново
+        return None
+    return snapshot if isinstance(snapshot, dict) else None
+
+
+def _write_snapshot(path: str, snapshot: Dict[str, Any]) -> None:
+    tmp_path = f"{path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Не удалось сохранить снимок каталога {path}: {e}")
+
+
+def load_or_build(
+    sources: Iterable[str],
+    build: Callable[[], Any],
+    version: str,
+    path: str,
+) -> Any:
+    """
+    Возвращает build() из снимка, если исходные файлы sources не изменились.
+
+    sources — все файлы, от которых зависит результат (в том числе отсутствующие:
+    появление файла тоже сбрасывает снимок); version — версия кода сборки.
+    """
+    stamps = {os.fspath(source): file_stamp(os.fspath(source)) for source in sources}
+
+    hashes = None
+    snapshot = _read_snapshot(path)
+    if snapshot is not None and snapshot.get('version') == version:
+        if snapshot.get('stamps') == stamps:
+            return snapshot['value']
+
+        if set(snapshot.get('hashes') or ()) == set(stamps):
+            hashes = {source: hash_file(source) for source in stamps}
+            if snapshot['hashes'] == hashes:
+                snapshot['stamps'] = stamps
+                _write_snapshot(path, snapshot)
+                return snapshot['value']
+
+    # Хэши до сборки: если файл поменяется во время сборки, снимок сбросится в следующий раз
+    if hashes is None:
+        hashes = {source: hash_file(source) for source in stamps}
+    value = build()
+    _write_snapshot(path, {'version': version, 'stamps': stamps, 'hashes': hashes, 'value': value})
+    return value
@@ -1,6 +1,13 @@
 #!/usr/bin/env python
 import json
+import os
+import re
+from collections.abc import Mapping
+from contextlib import contextmanager
 from pathlib import Path
+from catalog_snapshot import CATALOG_SNAPSHOT_DIR, load_or_build
+from file_hashes import hash_file
+from reporter import report
 
 COLOROFF='\033[0m'
 BGYELLOW='\033[30;43m'
@@ -8,7 +15,44 @@ BGGREEN='\033[30;42m'
 BGRED='\033[30;41m'
 TEXTRED='\033[30;31m'
 
-def print_message(message, type='info'):
+# Сообщения, которые собирает capture_messages() (см. инкрементальный режим update_cars.py)
+_captured_messages = None
+
+
+@contextmanager
+def capture_messages():
+    """
+    Собирает [текст, тип, key] сообщений print_message внутри блока, чтобы
+    повторить их через replay_messages(), когда результат берётся из прошлого запуска.
+    """
+    global _captured_messages
+    outer = _captured_messages
+    _captured_messages = captured = []
+    try:
+        yield captured
+    finally:
+        _captured_messages = outer
+        if outer is not None:
+            outer.extend(captured)
+
+
+def replay_messages(messages):
+    """Повторяет сообщения capture_messages() (в том числе прочитанные из JSON)."""
+    for message, type, key in messages:
+        # После JSON key — список, а ключ дедупликации в reporter должен быть хэшируемым
+        print_message(message, type, key=tuple(key) if isinstance(key, list) else key)
+
+
+def print_message(message, type='info', key=None):
+    """
+    Сообщение в output.txt (через буфер reporter) и в stdout.
+    Повторы (тот же текст или тот же key, см. reporter.report) в stdout не печатаются.
+    """
+    if _captured_messages is not None:
+        _captured_messages.append([message, type, key])
+    if not report(message, key):
+        return
+
     if type == 'info':
         print(message)
     elif type == 'warning':
@@ -18,9 +62,6 @@ def print_message(message, type='info'):
     elif type == 'success':
         print(f"{BGGREEN}{message}{COLOROFF}")
 
-    with open('output.txt', 'a') as file:
-        file.write(f"{message}\n")
-
 COMMON_DATA_DIR = Path("./src/data/common")
 SITE_DATA_DIR = Path("./src/data/site")
 
@@ -56,46 +97,57 @@ def read_json(file_path: Path) -> dict:
         return {}
 
 
+def get_catalog_brand_dirs() -> list:
+    """Папки брендов common/brands с моделями (в порядке сборки каталога)."""
+    common_brands_dir = COMMON_DATA_DIR / "brands"
+    if not common_brands_dir.exists():
+        return []
+    return [
+        brand_dir
+        for brand_dir in sorted(common_brands_dir.iterdir())
+        if brand_dir.is_dir() and (brand_dir / "models").exists()
+    ]
+
+
+def load_brand_models(brand_dir: Path) -> list:
+    """Модели одного бренда из common/brands/<brand> со всеми слоями layered-каталога."""
+    common_model_defaults = read_json(COMMON_DATA_DIR / "defaults" / "model.json")
+    dealer_defaults = read_json(SITE_DATA_DIR / "data" / "defaults.json")
+    brand_id = brand_dir.name.lower()
+    common_brand_defaults = read_json(brand_dir / "defaults.json")
+    dealer_brand_defaults = read_json(SITE_DATA_DIR / "data" / "brands" / brand_id / "defaults.json")
+    result = []
+
+    for model_file in sorted((brand_dir / "models").glob("*.json")):
+        model_id = model_file.stem.lower()
+        model = deep_merge(
+            common_model_defaults,
+            common_brand_defaults,
+            read_json(model_file),
+            dealer_defaults,
+            dealer_brand_defaults,
+            read_json(SITE_DATA_DIR / "data" / "brands" / brand_id / "models" / f"{model_id}.json"),
+        )
+        model['id'] = model_id
+        result.append(model)
+
+    return result
+
+
 def load_model_catalog():
     """Загружаем полный layered-каталог моделей из common/brands.
 
     В отличие от site/models.json, этот каталог не ограничен model-matrix и нужен
     для сопоставления фидов новых авто, где могут встречаться бренды вне сайта.
     """
-    common_model_defaults = read_json(COMMON_DATA_DIR / "defaults" / "model.json")
-    dealer_defaults = read_json(SITE_DATA_DIR / "data" / "defaults.json")
     common_brands_dir = COMMON_DATA_DIR / "brands"
-    result = []
-
     if not common_brands_dir.exists():
         print_message(f"Ошибка: папка {common_brands_dir} не найдена", 'error')
         return []
 
-    for brand_dir in sorted(common_brands_dir.iterdir()):
-        if not brand_dir.is_dir():
-            continue
-
-        brand_id = brand_dir.name.lower()
-        models_dir = brand_dir / "models"
-        if not models_dir.exists():
-            continue
-
-        common_brand_defaults = read_json(brand_dir / "defaults.json")
-        dealer_brand_defaults = read_json(SITE_DATA_DIR / "data" / "brands" / brand_id / "defaults.json")
-
-        for model_file in sorted(models_dir.glob("*.json")):
-            model_id = model_file.stem.lower()
-            model = deep_merge(
-                common_model_defaults,
-                common_brand_defaults,
-                read_json(model_file),
-                dealer_defaults,
-                dealer_brand_defaults,
-                read_json(SITE_DATA_DIR / "data" / "brands" / brand_id / "models" / f"{model_id}.json"),
-            )
-            model['id'] = model_id
-            result.append(model)
-
+    result = []
+    for brand_dir in get_catalog_brand_dirs():
+        result.extend(load_brand_models(brand_dir))
     return result
 
 
@@ -182,9 +234,26 @@ def build_model_index(models: list) -> dict:
     return index
 
 
-# Глобально подгружаем полный layered-каталог и индекс для быстрых запросов
-model_catalog_data = load_model_catalog()
-model_index_by_brand = build_model_index(model_catalog_data)
+def build_model_color_index(models: list) -> dict:
+    """Индекс цветов моделей: { brand_id: { id: { alias_lower: color_entry } } }.
+
+    Алиасы — id / name / names / aliases цвета; при совпадении алиасов побеждает
+    первый цвет в списке colors, как при последовательном поиске.
+    """
+    index: dict = {}
+    for model in models:
+        brand = get_model_brand_id(model)
+        model_id = str(model.get('id') or '').lower()
+        if not brand or not model_id:
+            continue
+        colors: dict = {}
+        for entry in model.get('colors') or []:
+            if not isinstance(entry, dict):
+                continue
+            for alias in get_color_aliases(entry):
+                colors.setdefault(alias.lower(), entry)
+        index.setdefault(brand, {})[model_id] = colors
+    return index
 
 
 def build_model_lookup(models: list):
@@ -229,61 +298,198 @@ def build_model_lookup(models: list):
 
     return lookup
 
-model_lookup = build_model_lookup(model_catalog_data)
 
+def build_complectation_translation_map(models: list) -> dict:
+    """Строит словарь {русское_название_lower: английское_название} из комплектаций каталога."""
+    trans = {}
+    for model in models:
+        for comp in model.get('complectations', []):
+            caption = comp.get('displayName') or comp.get('caption', '')
+            name = comp.get('name', '')
+            if not caption or not name:
+                continue
+            # caption формата "Русское / English" или "Русское - English"
+            for sep in (' / ', ' - '):
+                if sep in caption:
+                    rus_part = caption.split(sep, 1)[0].strip()
+                    if rus_part and re.search(r'[а-яёА-ЯЁ]', rus_part):
+                        trans[rus_part.lower()] = name
+                    break
+    return trans
+
+
+def build_brand_catalog(brand_dir: Path) -> dict:
+    """Модели одного бренда и индексы по ним (содержимое снимка бренда)."""
+    models = load_brand_models(brand_dir)
+    lookup = build_model_lookup(models)
+    index_by_brand = build_model_index(models)
+    return {
+        'models': models,
+        'index_by_brand': index_by_brand,
+        'lookup': lookup,
+        'complectations': build_complectation_translation_map(models),
+        'colors_by_brand': build_model_color_index(models),
+        # Все имена бренда, по которым его ищут в model_lookup и model_index_by_brand
+        'aliases': sorted(set(lookup) | set(index_by_brand)),
+    }
 
 
-def get_model_info(
-    brand: str,
-    model: str,
-    property: str = None,
-    color: str = None,
-    vin: str = None,
-    log_errors: bool = True
-) -> str | dict | None:
-    """
-    Получение информации о модели автомобиля на основе нового мэпинга.
+def get_brand_catalog_sources(brand_dir: Path) -> list:
+    """Файлы слоёв каталога одного бренда, включая необязательные: их появление тоже меняет каталог."""
+    site_brand_dir = SITE_DATA_DIR / "data" / "brands" / brand_dir.name.lower()
+    return [
+        COMMON_DATA_DIR / "defaults" / "model.json",
+        SITE_DATA_DIR / "data" / "defaults.json",
+        brand_dir / "defaults.json",
+        *sorted((brand_dir / "models").glob("*.json")),
+        site_brand_dir / "defaults.json",
+        *sorted(site_brand_dir.glob("models/*.json")),
+    ]
 
-    Теперь поддерживаются только свойства мэпинга:
-      - 'mark_id' — бренд из layered-каталога
-      - 'id' — идентификатор модели (slug) из layered-каталога
-      - 'color_id' — идентификатор цвета (при указании color)
 
-    Поиск модели идёт по feed.folderIds / feed.modelNames / feed_names / name / displayName.
+class ModelCatalog:
+    """Layered-каталог, который собирается по брендам при первом обращении.
 
-    Args:
-        brand: Название бренда (любая регистровая форма)
-        model: Название модели (значение из feed_names или name)
-        property: Запрашиваемое свойство ('mark_id', 'id' или 'color_id' при указании color)
-        color: Цвет автомобиля (для поиска carImage или id цвета)
-        vin: VIN автомобиля (для удобства логирования)
-        log_errors: Писать ли ошибки в output.txt через print_message
-
-    Returns:
-        str | dict | None: Значение свойства, словарь модели или None, если не найдено
+    При старте читается только сводка (имена бренда → папки брендов и общий словарь
+    комплектаций), модели бренда — когда фид впервые спрашивает этот бренд.
+    Сводка и каждый бренд хранятся снимками в tmp/cache (см. catalog_snapshot).
     """
-    if vin:
-        vin = vin.upper()
+
+    def __init__(self, snapshot_dir: str = CATALOG_SNAPSHOT_DIR):
+        self.snapshot_dir = snapshot_dir
+        self.version = hash_file(__file__)
+        self.brand_dirs = {brand_dir.name: brand_dir for brand_dir in get_catalog_brand_dirs()}
+        self._brands: dict = {}
+        self._lookup_buckets: dict = {}
+        self._index_buckets: dict = {}
+        self._color_buckets: dict = {}
+
+        if not (COMMON_DATA_DIR / "brands").exists():
+            print_message(f"Ошибка: папка {COMMON_DATA_DIR / 'brands'} не найдена", 'error')
+            self.summary = {'aliases': {}, 'complectations': {}}
+        else:
+            sources = [source for brand_dir in self.brand_dirs.values() for source in get_brand_catalog_sources(brand_dir)]
+            self.summary = load_or_build(
+                sources, self._build_summary, self.version, os.path.join(snapshot_dir, 'summary.pickle'),
+            )
+
+    def _load_brand(self, name: str) -> dict:
+        brand_dir = self.brand_dirs[name]
+        return load_or_build(
+            get_brand_catalog_sources(brand_dir),
+            lambda: build_brand_catalog(brand_dir),
+            self.version,
+            os.path.join(self.snapshot_dir, f"brand-{name}.pickle"),
+        )
+
+    def _build_summary(self) -> dict:
+        aliases: dict = {}
+        complectations: dict = {}
+        # Бренды здесь не запоминаются: в памяти остаются только те, что спросит фид
+        for name in self.brand_dirs:
+            brand = self._load_brand(name)
+            for alias in brand['aliases']:
+                aliases.setdefault(alias, []).append(name)
+            complectations.update(brand['complectations'])
+        return {'aliases': aliases, 'complectations': complectations}
+
+    def brand(self, name: str) -> dict:
+        if name not in self._brands:
+            self._brands[name] = self._load_brand(name)
+        return self._brands[name]
+
+    def _merged_bucket(self, alias: str, part: str, buckets: dict):
+        if alias not in buckets:
+            merged = None
+            # Бренды в порядке папок: при совпадении имён побеждает последний, как в полном каталоге
+            for name in self.summary['aliases'].get(alias, ()):
+                bucket = self.brand(name)[part].get(alias)
+                if bucket is not None:
+                    merged = {**(merged or {}), **bucket}
+            buckets[alias] = merged
+        return buckets[alias]
+
+    def lookup_bucket(self, brand_name: str):
+        """model_lookup[brand_name]: { model_name: { mark_id, id } } или None."""
+        return self._merged_bucket(brand_name, 'lookup', self._lookup_buckets)
+
+    def index_bucket(self, brand_id: str):
+        """model_index_by_brand[brand_id]: { model_id: model_obj } или None."""
+        return self._merged_bucket(brand_id, 'index_by_brand', self._index_buckets)
+
+    def color_bucket(self, brand_id: str):
+        """Индекс цветов моделей бренда: { model_id: { alias_lower: color_entry } } или None."""
+        return self._merged_bucket(brand_id, 'colors_by_brand', self._color_buckets)
+
+    def brand_names(self) -> list:
+        return list(self.summary['aliases'])
+
+    def all_models(self) -> list:
+        """Весь каталог (загружает все бренды)."""
+        return [model for name in self.brand_dirs for model in self.brand(name)['models']]
+
+    def fingerprint(self):
+        """Хэш содержимого всех слоёв каталога (без загрузки брендов)."""
+        return {
+            os.fspath(source): hash_file(source)
+            for brand_dir in self.brand_dirs.values()
+            for source in get_brand_catalog_sources(brand_dir)
+        }
+
+
+class LazyBrandMapping(Mapping):
+    """Словарь { бренд: bucket } поверх ModelCatalog, бренды грузятся при первом обращении."""
+
+    def __init__(self, get_bucket):
+        self._get_bucket = get_bucket
+
+    def __getitem__(self, key):
+        bucket = self._get_bucket(key)
+        if bucket is None:
+            raise KeyError(key)
+        return bucket
+
+    def __iter__(self):
+        return (key for key in model_catalog.brand_names() if self._get_bucket(key) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+# Глобально поднимаем сводку каталога; модели бренда грузятся при первом запросе
+model_catalog = ModelCatalog()
+model_index_by_brand = LazyBrandMapping(model_catalog.index_bucket)
+model_lookup = LazyBrandMapping(model_catalog.lookup_bucket)
+model_colors_by_brand = LazyBrandMapping(model_catalog.color_bucket)
+complectation_translation_map = model_catalog.summary['complectations']
+
+
+# (brand, model, property, color) → (значение, ошибка или None); ошибка — (текст без vin, ключ повторов)
+_model_info_cache: dict = {}
+
+
+def _resolve_model_info(brand: str, model: str, property: str = None, color: str = None):
+    """Разрешение get_model_info без логирования: (значение, (текст ошибки, ключ) или None)."""
     normalized_property = property.lower() if property else None
 
     # Нормализуем входные данные
     normalized_brand = normalize_lookup_key(brand)
     normalized_model = normalize_lookup_key(model)
     brand_bucket = model_lookup.get(normalized_brand)
-    
+
     if not brand_bucket:
-        errorText = f"\nvin: <code>{vin}</code>\n<b>Не найден бренд</b> <code>{brand}</code> в layered model catalog (модель {normalized_model})"
-        if log_errors:
-            print_message(errorText, 'error')
-        return None
-    
+        return None, (
+            f"<b>Не найден бренд</b> <code>{brand}</code> в layered model catalog (модель {normalized_model})",
+            ('Не найден бренд', normalized_brand),
+        )
+
     model_ref = brand_bucket.get(normalized_model)
 
     if not model_ref:
-        errorText = f"\nvin: <code>{vin}</code>\n<b>Не найдено название модели</b> <code>{model}</code> в feed.folderIds/feed.modelNames бренда <code>{brand}</code> в layered model catalog (ищем {property or color})"
-        if log_errors:
-            print_message(errorText, 'error')
-        return None
+        return None, (
+            f"<b>Не найдено название модели</b> <code>{model}</code> в feed.folderIds/feed.modelNames бренда <code>{brand}</code> в layered model catalog (ищем {property or color})",
+            ('Не найдено название модели', normalized_brand, normalized_model),
+        )
 
     # Получаем фактический объект модели из индекса по бренду
     target_brand = model_ref.get('mark_id')
@@ -294,108 +500,120 @@ def get_model_info(
     if isinstance(brand_bucket, dict):
         model_obj = brand_bucket.get(target_id)
 
-    # На случай рассинхронизации попробуем найти линейным поиском
     if not model_obj:
-        for m in model_catalog_data:
-            if get_model_brand_id(m) == target_brand and m.get('id') == target_id:
-                model_obj = m
-                break
-
-    if not model_obj:
-        errorText = (
-            f"\nvin: <code>{vin}</code>\n"
-            f"<b>Не найдены данные модели</b> <code>{model}</code> бренда <code>{brand}</code> в layered model catalog"
+        return None, (
+            f"<b>Не найдены данные модели</b> <code>{model}</code> бренда <code>{brand}</code> в layered model catalog",
+            ('Не найдены данные модели', normalized_brand, normalized_model),
         )
-        if log_errors:
-            print_message(errorText, 'error')
-        return None
-    
-    # Поиск информации о цвете по списку colors[].names / id / name
+
+    # Поиск информации о цвете по индексу colors[].names / id / name
     if color:
         normalized_color = color.lower().strip()
-        colors = model_obj.get('colors') or []
-
-        def match_color(entry: dict) -> bool:
-            for n in get_color_aliases(entry):
-                if isinstance(n, str) and n.lower() == normalized_color:
-                    return True
-            return False
-
-        for entry in colors:
-            if isinstance(entry, dict) and match_color(entry):
-                if normalized_property in (None, 'carimage', 'color_image'):
-                    return get_color_image(entry)
-                if normalized_property in ('color_id', 'colorid'):
-                    return entry.get('id')
-                if normalized_property in ('color', 'color_entry'):
-                    return entry
-                # Если передано свойство, но оно не связано с цветом — возвращаем carImage для обратной совместимости
-                return get_color_image(entry)
-
-        errorText = (
-            f"\nvin: <code>{vin}</code>\n"
-            f"<b>Не найден цвет</b> <code>{color}</code> модели <code>{model}</code> бренда <code>{brand}</code> в layered model catalog"
+        entry = (model_colors_by_brand.get(target_brand) or {}).get(target_id, {}).get(normalized_color)
+        if entry is not None:
+            if normalized_property in (None, 'carimage', 'color_image'):
+                return get_color_image(entry), None
+            if normalized_property in ('color_id', 'colorid'):
+                return entry.get('id'), None
+            if normalized_property in ('color', 'color_entry'):
+                return entry, None
+            # Если передано свойство, но оно не связано с цветом — возвращаем carImage для обратной совместимости
+            return get_color_image(entry), None
+
+        return None, (
+            f"<b>Не найден цвет</b> <code>{color}</code> модели <code>{model}</code> бренда <code>{brand}</code> в layered model catalog",
+            ('Не найден цвет', normalized_brand, normalized_model, normalized_color),
         )
-        if log_errors:
-            print_message(errorText, 'error')
-        return None
-    
+
     # Если запрашивается конкретное свойство
     if property:
         if normalized_property == 'mark_id':
-            return target_brand
+            return target_brand, None
         if normalized_property == 'id':
-            return target_id
+            return target_id, None
         if normalized_property == 'folder':
             # По новой схеме folder = id
-            return target_id
+            return target_id, None
         if normalized_property == 'color_id':
-            errorText = (
-                f"\nvin: <code>{vin}</code>\n"
-                f"<b>Для получения color_id необходимо указать цвет</b> для модели <code>{model}</code> бренда <code>{brand}</code>"
+            return None, (
+                f"<b>Для получения color_id необходимо указать цвет</b> для модели <code>{model}</code> бренда <code>{brand}</code>",
+                ('Нет цвета для color_id', normalized_brand, normalized_model),
             )
-            if log_errors:
-                print_message(errorText, 'error')
-            return None
         if normalized_property == 'cyrillic':
             value = model_obj.get('cyrillic')
             if value:
-                return value
-            errorText = (
-                f"\nvin: <code>{vin}</code>\n"
-                f"<b>Не найдено кириллическое имя</b> для модели <code>{model}</code> бренда <code>{brand}</code>"
+                return value, None
+            return None, (
+                f"<b>Не найдено кириллическое имя</b> для модели <code>{model}</code> бренда <code>{brand}</code>",
+                ('Не найдено кириллическое имя', normalized_brand, normalized_model),
             )
-            if log_errors:
-                print_message(errorText, 'error')
-            return None
         if normalized_property == 'name':
             value = get_model_display_name(model_obj) or model_obj.get('name')
             if value:
-                return value
-            errorText = (
-                f"\nvin: <code>{vin}</code>\n"
-                f"<b>Не найдено поле name</b> для модели <code>{model}</code> бренда <code>{brand}</code>"
+                return value, None
+            return None, (
+                f"<b>Не найдено поле name</b> для модели <code>{model}</code> бренда <code>{brand}</code>",
+                ('Не найдено поле name', normalized_brand, normalized_model),
             )
-            if log_errors:
-                print_message(errorText, 'error')
-            return None
 
-        errorText = (
-            f"\nvin: <code>{vin}</code>\n"
+        return None, (
             f"<b>Неизвестное свойство</b> <code>{property}</code> для модели <code>{model}</code> бренда <code>{brand}</code>. "
-            f"Поддерживаются: <code>mark_id</code>, <code>id</code>, <code>folder</code>, <code>cyrillic</code>, <code>name</code>."
+            f"Поддерживаются: <code>mark_id</code>, <code>id</code>, <code>folder</code>, <code>cyrillic</code>, <code>name</code>.",
+            ('Неизвестное свойство', normalized_brand, normalized_model, property),
         )
-        if log_errors:
-            print_message(errorText, 'error')
-        return None
-    
+
     # Возвращаем полезный минимум, если не указаны property и color
     return {
         'mark_id': target_brand,
         'id': target_id,
         'name': get_model_display_name(model_obj) or model_obj.get('name'),
         'cyrillic': model_obj.get('cyrillic'),
-    }
+    }, None
+
+
+def get_model_info(
+    brand: str,
+    model: str,
+    property: str = None,
+    color: str = None,
+    vin: str = None,
+    log_errors: bool = True
+) -> str | dict | None:
+    """
+    Получение информации о модели автомобиля на основе нового мэпинга.
+
+    Теперь поддерживаются только свойства мэпинга:
+      - 'mark_id' — бренд из layered-каталога
+      - 'id' — идентификатор модели (slug) из layered-каталога
+      - 'color_id' — идентификатор цвета (при указании color)
+
+    Поиск модели идёт по feed.folderIds / feed.modelNames / feed_names / name / displayName.
+    Результат запоминается по (brand, model, property, color): повторный запрос —
+    поиск в словаре, ошибка из запомненного результата только пишется в output.txt.
+
+    Args:
+        brand: Название бренда (любая регистровая форма)
+        model: Название модели (значение из feed_names или name)
+        property: Запрашиваемое свойство ('mark_id', 'id' или 'color_id' при указании color)
+        color: Цвет автомобиля (для поиска carImage или id цвета)
+        vin: VIN автомобиля (для удобства логирования)
+        log_errors: Писать ли ошибки в output.txt через print_message
+
+    Returns:
+        str | dict | None: Значение свойства, словарь модели или None, если не найдено
+    """
+    cache_key = (brand, model, property, color)
+    resolved = _model_info_cache.get(cache_key)
+    if resolved is None:
+        resolved = _model_info_cache[cache_key] = _resolve_model_info(brand, model, property, color)
+
+    value, error = resolved
+    if error is not None and log_errors:
+        if vin:
+            vin = vin.upper()
+        error_text, error_key = error
+        print_message(f"\nvin: <code>{vin}</code>\n{error_text}", 'error', key=error_key)
+    return value
 
 
 def get_folder(brand: str, model: str, vin: str = None) -> str | None:
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+"""
+Хэши и отметки (mtime, размер) файлов и хэши значений: версии кода и отпечатки
+исходных данных для кэшей (снимки настроек и каталога, индекс фото Avito,
+кэш описаний, инкрементальный режим).
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Optional, Tuple
+
+
+def hash_value(value: Any) -> str:
+    """Стабильный хэш JSON-представления значения."""
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def hash_file(path: str) -> Optional[str]:
+    digest = hashlib.sha1()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, размер) файла или None, если файла нет."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+"""
+Запись и чтение frontmatter MDX-файлов машин (render_car_file / read_car_file).
+
+- dump_frontmatter(data) даёт ровно тот же текст, что
+  yaml.safe_dump(data, default_flow_style=False, allow_unicode=True), чтобы
+  в git не появлялись лишние диффы. Для данных машины (строки, целые, списки
+  URL, imageSets — списки словарей) текст собирается напрямую: правила выбора
+  стиля скаляра и переноса строк повторяют yaml.emitter.Emitter, но без
+  representer/serializer и цепочки событий. Всё, что за пределами этой схемы
+  (float, даты, общие ссылки на один список и т.п.), уходит в yaml.safe_dump.
+  CSafeDumper для записи не годится: libyaml переносит длинные строки
+  в двойных кавычках не так, как Python-эмиттер, и файлы бы поменялись;
+- load_frontmatter(text) — yaml.safe_load через CSafeLoader, если PyYAML
+  собран с libyaml, иначе через обычный SafeLoader.
+"""
+
+import re
+from typing import Any, List, Optional
+
+import yaml
+from yaml.resolver import Resolver
+
+try:
+    from yaml import CSafeLoader as FrontmatterLoader
+except ImportError:  # PyYAML без libyaml
+    from yaml import SafeLoader as FrontmatterLoader
+
+BEST_WIDTH = 80
+BEST_INDENT = 2
+
+_BREAKS = '\n\x85\u2028\u2029'
+_WHITESPACE = '\0 \t\r' + _BREAKS
+# Символы, которые Emitter.analyze_scalar (allow_unicode=True) считает специальными
+_SPECIAL_RE = re.compile('[^\n\x20-\x7E\x85\xA0-\uD7FF\uE000-\uFFFD\U00010000-\U0010FFFE]|\uFEFF')
+_BREAK_SPACE_RE = re.compile('[\n\x85\u2028\u2029] ')
+_SPACE_BREAK_RE = re.compile(' [\n\x85\u2028\u2029]')
+_BLOCK_COLON_RE = re.compile('[:](?:[\0 \t\r\n\x85\u2028\u2029]|\\Z)')
+_BLOCK_HASH_RE = re.compile('[\0 \t\r\n\x85\u2028\u2029]#')
+_PLAIN_TOKEN_RE = re.compile(' +|[^ ]+')
+# Символы, которые write_double_quoted пишет как есть
+_DOUBLE_QUOTED_PLAIN_RE = re.compile(r'[\x20-\x21\x23-\x5B\x5D-\x7E\xA0-\u2027\u202A-\uD7FF\uE000-\uFEFE\uFF00-\uFFFD]')
+_ESCAPE_REPLACEMENTS = {
+    '\0': '0', '\x07': 'a', '\x08': 'b', '\x09': 't', '\x0A': 'n', '\x0B': 'v', '\x0C': 'f', '\x0D': 'r',
+    '\x1B': 'e', '"': '"', '\\': '\\', '\x85': 'N', '\xA0': '_', '\u2028': 'L', '\u2029': 'P',
+}
+_IMPLICIT_RESOLVERS = Resolver.yaml_implicit_resolvers
+
+
+class _Unsupported(Exception):
+    """Данные вне схемы быстрого эмиттера — нужен yaml.safe_dump."""
+
+
+def _resolves_to_str(value: str) -> bool:
+    """Прочитается ли value без кавычек как строка (а не null/bool/int/float/дата)."""
+    resolvers = _IMPLICIT_RESOLVERS.get(value[0] if value else '', []) + _IMPLICIT_RESOLVERS.get(None, [])
+    return not any(regexp.match(value) for _, regexp in resolvers)
+
+
+def _choose_style(value: str, simple_key: bool) -> str:
+    """Стиль скаляра-строки, как Emitter.choose_scalar_style: '' (plain), "'" или '"'."""
+    if not value:
+        # Пустая строка без кавычек прочиталась бы как null
+        if simple_key:
+            raise _Unsupported('empty key')
+        return "'"
+
+    special = _SPECIAL_RE.search(value) is not None
+    space_break = _SPACE_BREAK_RE.search(value) is not None
+    break_space = _BREAK_SPACE_RE.search(value) is not None
+    multiline = any(ch in value for ch in _BREAKS)
+    # Emitter.check_simple_key: длина ключа вместе с подготовленным тегом '!!str' меньше 128
+    if simple_key and (multiline or len(value) + len('!!str') >= 128):
+        raise _Unsupported('complex key')
+
+    if not (special or space_break or break_space or multiline) and _resolves_to_str(value):
+        first = value[0]
+        followed_by_whitespace = len(value) == 1 or value[1] in _WHITESPACE
+        block_indicators = (
+            value.startswith('---') or value.startswith('...')
+            or first in '#,[]{}&*!|>\'"%@`'
+            or (first in '?-' and followed_by_whitespace)
+            or _BLOCK_COLON_RE.search(value) is not None
+            or _BLOCK_HASH_RE.search(value) is not None
+        )
+        if not block_indicators and value[0] != ' ' and value[-1] != ' ':
+            return ''
+
+    if not (special or space_break or break_space):
+        return "'"
+    return '"'
+
+
+class _FrontmatterEmitter:
+    """Состояние и писатели yaml.emitter.Emitter для блочного YAML без якорей и тегов."""
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.indent = 0
+        self.column = 0
+        self.whitespace = True
+        self.indention = True
+        self.seen_collections = set()
+
+    # Служебные писатели Emitter
+
+    def write_indicator(self, indicator: str, need_whitespace: bool, whitespace: bool = False, indention: bool = False):
+        data = indicator if self.whitespace or not need_whitespace else ' ' + indicator
+        self.whitespace = whitespace
+        self.indention = self.indention and indention
+        self.column += len(data)
+        self.parts.append(data)
+
+    def write_indent(self):
+        if not self.indention or self.column > self.indent or (self.column == self.indent and not self.whitespace):
+            self.write_line_break()
+        if self.column < self.indent:
+            self.whitespace = True
+            self.parts.append(' ' * (self.indent - self.column))
+            self.column = self.indent
+
+    def write_line_break(self, data: str = '\n'):
+        self.whitespace = True
+        self.indention = True
+        self.column = 0
+        self.parts.append(data)
+
+    # Скаляры
+
+    def write_plain(self, text: str, split: bool):
+        if not self.whitespace:
+            self.column += 1
+            self.parts.append(' ')
+        self.whitespace = False
+        self.indention = False
+        if not split or self.column + len(text) <= BEST_WIDTH + 1:
+            # Ни один пробел не окажется правее BEST_WIDTH — переносов не будет
+            self.column += len(text)
+            self.parts.append(text)
+            return
+        for token in _PLAIN_TOKEN_RE.findall(text):
+            if token == ' ' and self.column > BEST_WIDTH:
+                self.write_indent()
+                self.whitespace = False
+                self.indention = False
+            else:
+                self.column += len(token)
+                self.parts.append(token)
+
+    def write_single_quoted(self, text: str, split: bool):
+        self.write_indicator("'", True)
+        if (not split or self.column + len(text) + text.count("'") <= BEST_WIDTH + 1) and not any(ch in text for ch in _BREAKS):
+            data = text.replace("'", "''")
+            self.column += len(data)
+            self.parts.append(data)
+            self.write_indicator("'", False)
+            return
+
+        # Дословный перенос Emitter.write_single_quoted
+        spaces = breaks = False
+        start = end = 0
+        while end <= len(text):
+            ch = text[end] if end < len(text) else None
+            if spaces:
+                if ch is None or ch != ' ':
+                    if start + 1 == end and self.column > BEST_WIDTH and split and start != 0 and end != len(text):
+                        self.write_indent()
+                    else:
+                        data = text[start:end]
+                        self.column += len(data)
+                        self.parts.append(data)
+                    start = end
+            elif breaks:
+                if ch is None or ch not in _BREAKS:
+                    if text[start] == '\n':
+                        self.write_line_break()
+                    for br in text[start:end]:
+                        self.write_line_break(br)
+                    self.write_indent()
+                    start = end
+            else:
+                if ch is None or ch in ' ' + _BREAKS or ch == "'":
+                    if start < end:
+                        data = text[start:end]
+                        self.column += len(data)
+                        self.parts.append(data)
+                        start = end
+            if ch == "'":
+                self.column += 2
+                self.parts.append("''")
+                start = end + 1
+            if ch is not None:
+                spaces = ch == ' '
+                breaks = ch in _BREAKS
+            end += 1
+        self.write_indicator("'", False)
+
+    def write_double_quoted(self, text: str, split: bool):
+        # Дословно Emitter.write_double_quoted (allow_unicode=True)
+        self.write_indicator('"', True)
+        start = end = 0
+        while end <= len(text):
+            ch = text[end] if end < len(text) else None
+            if ch is None or _DOUBLE_QUOTED_PLAIN_RE.match(ch) is None:
+                if start < end:
+                    data = text[start:end]
+                    self.column += len(data)
+                    self.parts.append(data)
+                    start = end
+                if ch is not None:
+                    if ch in _ESCAPE_REPLACEMENTS:
+                        data = '\\' + _ESCAPE_REPLACEMENTS[ch]
+                    elif ch <= '\xFF':
+                        data = '\\x%02X' % ord(ch)
+                    elif ch <= '\uFFFF':
+                        data = '\\u%04X' % ord(ch)
+                    else:
+                        data = '\\U%08X' % ord(ch)
+                    self.column += len(data)
+                    self.parts.append(data)
+                    start = end + 1
+            if 0 < end < len(text) - 1 and (ch == ' ' or start >= end) and self.column + (end - start) > BEST_WIDTH and split:
+                data = text[start:end] + '\\'
+                if start < end:
+                    start = end
+                self.column += len(data)
+                self.parts.append(data)
+                self.write_indent()
+                self.whitespace = False
+                self.indention = False
+                if text[start] == ' ':
+                    self.column += 1
+                    self.parts.append('\\')
+            end += 1
+        self.write_indicator('"', False)
+
+    def write_scalar(self, value: Any, simple_key: bool = False):
+        value_type = type(value)
+        if value_type is str:
+            style = _choose_style(value, simple_key)
+        elif value_type is bool:
+            value, style = ('true' if value else 'false'), ''
+        elif value_type is int:
+            value, style = str(value), ''
+        elif value is None:
+            value, style = 'null', ''
+        else:
+            raise _Unsupported(value_type.__name__)
+
+        if style == '':
+            self.write_plain(value, not simple_key)
+        elif style == "'":
+            self.write_single_quoted(value, not simple_key)
+        else:
+            self.write_double_quoted(value, not simple_key)
+
+    # Узлы (Emitter.expect_*)
+
+    def write_node(self, value: Any, mapping_context: bool):
+        value_type = type(value)
+        if value_type is list or value_type is dict:
+            # Один и тот же объект дважды safe_dump записал бы через якорь &id001
+            if id(value) in self.seen_collections:
+                raise _Unsupported('alias')
+            self.seen_collections.add(id(value))
+            if not value:
+                self.write_indicator('[' if value_type is list else '{', True, whitespace=True)
+                self.write_indicator(']' if value_type is list else '}', False)
+            elif value_type is list:
+                self.write_sequence(value, indentless=mapping_context and not self.indention)
+            else:
+                self.write_mapping(value)
+        else:
+            # Скаляр пишется с отступом вложенного блока для переносов
+            outer_indent = self.indent
+            self.indent += BEST_INDENT
+            self.write_scalar(value)
+            self.indent = outer_indent
+
+    def write_sequence(self, items: list, indentless: bool):
+        outer_indent = self.indent
+        if not indentless:
+            self.indent += BEST_INDENT
+        for item in items:
+            self.write_indent()
+            self.write_indicator('-', True, indention=True)
+            self.write_node(item, mapping_context=False)
+        self.indent = outer_indent
+
+    def write_mapping(self, mapping: dict, root: bool = False):
+        outer_indent = self.indent
+        if not root:
+            self.indent += BEST_INDENT
+        for key, value in sorted(mapping.items(), key=_mapping_key):
+            self.write_indent()
+            self.write_scalar(key, simple_key=True)
+            self.write_indicator(':', False)
+            self.write_node(value, mapping_context=True)
+        self.indent = outer_indent
+
+
+def _mapping_key(item):
+    if type(item[0]) is not str:
+        raise _Unsupported('key')
+    return item[0]
+
+
+def _emit_frontmatter(data: Any) -> Optional[str]:
+    """Быстрый текст frontmatter или None, если data вне схемы эмиттера."""
+    if type(data) is not dict or not data:
+        return None
+    emitter = _FrontmatterEmitter()
+    try:
+        emitter.seen_collections.add(id(data))
+        emitter.write_mapping(data, root=True)
+    except _Unsupported:
+        return None
+    emitter.write_indent()
+    return ''.join(emitter.parts)
+
+
+def dump_frontmatter(data: Any) -> str:
+    """yaml.safe_dump(data, default_flow_style=False, allow_unicode=True), символ в символ."""
+    text = _emit_frontmatter(data)
+    if text is None:
+        text = yaml.safe_dump(data, default_flow_style=False, allow_unicode=True)
+    return text
+
+
+def load_frontmatter(text: str) -> Any:
+    """yaml.safe_load(text), через libyaml, если он есть."""
+    return yaml.load(text, Loader=FrontmatterLoader)
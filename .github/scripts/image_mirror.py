@@ -23,6 +23,9 @@ from urllib.parse import urlparse
 import requests
 from PIL import Image, ImageOps
 
+from reporter import report
+from settings_snapshot import cached_file
+
 
 REQUEST_TIMEOUT = (8, 30)
 DEFAULT_REMOTE_PREFIX = "cars"
@@ -132,21 +135,24 @@ def read_env_json(path: Path) -> dict[str, str]:
     """
     candidates = [path, Path(__file__).resolve().parents[2] / path]
     for candidate in candidates:
-        if not candidate.exists():
-            continue
+        values = cached_file(candidate, _parse_env_json)
+        if values is not None:
+            return values
 
-        try:
-            with candidate.open("r", encoding="utf-8") as file:
-                data = json.load(file)
-        except Exception:
-            continue
+    return {}
 
-        return {
-            key: value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
-            for key, value in data.items()
-        }
 
-    return {}
+def _parse_env_json(path: str) -> dict[str, str] | None:
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+    except Exception:
+        return None
+
+    return {
+        key: value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+        for key, value in data.items()
+    }
 
 
 def env_value(env_file_values: dict[str, str], key: str, default: str | None = None) -> str | None:
@@ -160,7 +166,12 @@ def env_value(env_file_values: dict[str, str], key: str, default: str | None = N
 
 def resolve_setting(key: str, default: str | None = None) -> str | None:
     """Значение настройки с приоритетом os.environ > .env > env.json > default."""
-    return env_value(read_env_file(Path(DEFAULT_ENV_FILE)), key, default)
+    env_file_values = cached_file(DEFAULT_ENV_FILE, _read_env_file_path) or {}
+    return env_value(env_file_values, key, default)
+
+
+def _read_env_file_path(path: str) -> dict[str, str]:
+    return read_env_file(Path(path))
 
 
 def int_value(value: Any, default: int) -> int:
@@ -187,8 +198,7 @@ def float_value(value: Any, default: float) -> float:
 
 
 def append_output_message(message: str) -> None:
-    with open("output.txt", "a", encoding="utf-8") as file:
-        file.write(message.rstrip() + "\n")
+    report(message.rstrip())
 
 
 def inspect_remote_image(url: str) -> dict[str, Any]:
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+Дисковый кэш справочников getAutocatalog (generation/modification/complectation)
+для update_cars.py: SQLite-файл с ключом (kind, id) и временем запроса.
+
+- свежая запись (моложе ttl) отдаётся без запроса;
+- «не найдено» (ответ без имени) тоже кэшируется, но на negative_ttl;
+- устаревшая запись отдаётся как есть, а обновляется в фоне — новое значение
+  записывается в close() и используется со следующего запуска;
+- ошибки сети не кэшируются.
+"""
+
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+LOOKUP_CACHE_PATH = './tmp/cache/autocatalog_lookups.sqlite3'
+DEFAULT_LOOKUP_TTL_DAYS = 30
+DEFAULT_LOOKUP_NEGATIVE_TTL_HOURS = 24
+LOOKUP_REFRESH_WORKERS = 4
+
+# fetch(kind, id_value) → (ответ получен, имя или None)
+LookupFetch = Callable[[str, str], Tuple[bool, Optional[str]]]
+
+
+class LookupCache:
+    def __init__(
+        self,
+        path: str = LOOKUP_CACHE_PATH,
+        ttl_days: float = DEFAULT_LOOKUP_TTL_DAYS,
+        negative_ttl_hours: float = DEFAULT_LOOKUP_NEGATIVE_TTL_HOURS,
+    ):
+        self.path = path
+        self.ttl_seconds = float(ttl_days) * 86400
+        self.negative_ttl_seconds = float(negative_ttl_hours) * 3600
+        self._refresh_pool: Optional[ThreadPoolExecutor] = None
+        self._refreshing: Dict[Tuple[str, str], object] = {}
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS lookups ('
+            ' kind TEXT NOT NULL, id TEXT NOT NULL, name TEXT, fetched_at REAL NOT NULL,'
+            ' PRIMARY KEY (kind, id))'
+        )
+        self._db.commit()
+
+    def get(self, kind: str, id_value: str) -> Tuple[bool, Optional[str], bool]:
+        """(есть в кэше, имя или None, запись устарела)."""
+        row = self._db.execute(
+            'SELECT name, fetched_at FROM lookups WHERE kind = ? AND id = ?',
+            (kind, str(id_value)),
+        ).fetchone()
+        if row is None:
+            return False, None, False
+
+        name, fetched_at = row
+        ttl = self.ttl_seconds if name is not None else self.negative_ttl_seconds
+        return True, name, time.time() - fetched_at >= ttl
+
+    def set(self, kind: str, id_value: str, name: Optional[str]) -> None:
+        self.set_many({(kind, str(id_value)): name})
+
+    def set_many(self, names: Dict[Tuple[str, str], Optional[str]]) -> None:
+        now = time.time()
+        self._db.executemany(
+            'INSERT OR REPLACE INTO lookups (kind, id, name, fetched_at) VALUES (?, ?, ?, ?)',
+            [(kind, str(id_value), name, now) for (kind, id_value), name in names.items()],
+        )
+        self._db.commit()
+
+    def refresh_in_background(self, keys: Iterable[Tuple[str, str]], fetch: LookupFetch) -> None:
+        """Запрашивает устаревшие записи в фоновых потоках, не дожидаясь ответа."""
+        for key in keys:
+            if key in self._refreshing:
+                continue
+            if self._refresh_pool is None:
+                self._refresh_pool = ThreadPoolExecutor(max_workers=LOOKUP_REFRESH_WORKERS)
+            self._refreshing[key] = self._refresh_pool.submit(fetch, *key)
+
+    def close(self) -> None:
+        """Дожидается фоновых обновлений, записывает их и закрывает базу."""
+        if self._refresh_pool is not None:
+            refreshed = {}
+            for key, future in self._refreshing.items():
+                ok, name = future.result()
+                if ok:
+                    refreshed[key] = name
+            self._refresh_pool.shutdown()
+            self._refresh_pool = None
+            self._refreshing.clear()
+            if refreshed:
+                self.set_many(refreshed)
+                print(f"🔄 Обновлено в кэше справочников: {len(refreshed)} ID")
+        self._db.close()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+"""
+Быстрый путь и кэш форматирования описаний машин в MDX (utils.process_description).
+
+- simple_html_to_string() — однопроходный токенайзер для «простого» HTML
+  (теги без атрибутов, правильно вложенные, текст с сущностями). Для такого
+  HTML результат совпадает со str(BeautifulSoup(html, 'html.parser')), но без
+  построения дерева; для всего остального возвращает None, и utils
+  использует BeautifulSoup как раньше;
+- DescriptionCache — дисковый кэш готовых описаний между запусками: SQLite
+  с ключом по хэшу исходного текста и версии кода форматирования; в файле
+  хранятся строки только текущей версии. Дилерские фиды повторяют одно и то же
+  описание у десятков машин.
+"""
+
+import hashlib
+from html.entities import html5
+import os
+import re
+import sqlite3
+from typing import Callable, Dict, Optional
+
+DESCRIPTION_CACHE_PATH = './tmp/cache/description_mdx.sqlite3'
+
+_ENTITY_RE = re.compile(r'&(?:([a-zA-Z][a-zA-Z0-9]*)|#([0-9]{1,7})|#[xX]([0-9a-fA-F]{1,6}));')
+_TAG_RE = re.compile(r'<(/?)([a-z][a-z0-9]*)(\s*/)?>')
+_MARKUP_RE = re.compile(r'<[^<>]*>')
+# Пустые элементы: BeautifulSoup пишет их как <br/>
+_VOID_TAGS = frozenset({'br', 'hr'})
+# Содержимое script/style html.parser не разбирает, а теги документа BeautifulSoup
+# обрабатывает особо — такие описания идут только через BeautifulSoup
+_COMPLEX_TAGS = frozenset({'script', 'style', 'html', 'head', 'body', 'pre', 'textarea'})
+# Строка только из этих символов BeautifulSoup сворачивает в '\n' или ' '
+_ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+
+def _decode_entity(match: 're.Match') -> Optional[str]:
+    name, decimal, hexadecimal = match.groups()
+    if name is not None:
+        return html5.get(f"{name};")
+    else:
+        codepoint = int(decimal, 10) if decimal is not None else int(hexadecimal, 16)
+        # Управляющие, C1 (windows-1252), суррогаты — BeautifulSoup разбирает их по-своему
+        if codepoint < 0x20 or 0x7F <= codepoint < 0xA0 or 0xD800 <= codepoint < 0xE000 or codepoint > 0x10FFFF:
+            return None
+    return chr(codepoint)
+
+
+def _escape_text(text: str) -> Optional[str]:
+    """Текст между тегами так, как его выводит BeautifulSoup, или None для сложных случаев."""
+    if '<' in text or '\r' in text:
+        return None
+
+    if '&' in text:
+        parts = []
+        position = 0
+        while True:
+            amp = text.find('&', position)
+            if amp == -1:
+                break
+            parts.append(text[position:amp])
+            entity = _ENTITY_RE.match(text, amp)
+            if entity is not None:
+                char = _decode_entity(entity)
+                if char is None:
+                    return None
+                parts.append(char)
+                position = entity.end()
+            elif amp + 1 < len(text) and text[amp + 1].isspace():
+                # Одиночный амперсанд перед пробелом — просто текст
+                parts.append('&')
+                position = amp + 1
+            else:
+                return None
+        parts.append(text[position:])
+        text = ''.join(parts)
+
+    if text and not text.strip(_ASCII_SPACES):
+        return '\n' if '\n' in text else ' '
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def simple_html_to_string(raw_html: str) -> Optional[str]:
+    """
+    str(BeautifulSoup(raw_html, 'html.parser')) для простого HTML или None,
+    если HTML простым не является (атрибуты, комментарии, незакрытые теги и т.п.).
+    """
+    parts = []
+    stack = []
+    # Пустые элементы, закрытые BeautifulSoup сразу (<br>): следующий <br/> он
+    # оставит открытым — такой HTML отдаём BeautifulSoup
+    closed_void_tags = set()
+    position = 0
+
+    for match in _MARKUP_RE.finditer(raw_html):
+        text = _escape_text(raw_html[position:match.start()])
+        if text is None:
+            return None
+        parts.append(text)
+        position = match.end()
+
+        tag = _TAG_RE.fullmatch(match.group(0))
+        if tag is None:
+            return None
+        closing, name, self_closing = tag.groups()
+        if name in _COMPLEX_TAGS:
+            return None
+
+        if name in _VOID_TAGS:
+            if closing or (self_closing and name in closed_void_tags):
+                return None
+            if not self_closing:
+                closed_void_tags.add(name)
+            parts.append(f'<{name}/>')
+        elif self_closing:
+            return None
+        elif closing:
+            if not stack or stack.pop() != name:
+                return None
+            parts.append(f'</{name}>')
+        else:
+            stack.append(name)
+            parts.append(f'<{name}>')
+
+    text = _escape_text(raw_html[position:])
+    if text is None or stack:
+        return None
+    parts.append(text)
+    return ''.join(parts)
+
+
+class DescriptionCache:
+    """Готовые MDX-описания по sha1(версия кода + исходный текст)."""
+
+    def __init__(self, version: str, path: str = DESCRIPTION_CACHE_PATH):
+        self.version = version
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_pid: Optional[int] = None
+        # Описания этого процесса: повтор в пределах запуска — поиск в словаре
+        self._memory: Dict[str, str] = {}
+
+    def prepare(self) -> None:
+        """
+        WAL, таблицы и удаление строк прежней версии кода — один раз в родительском
+        процессе до запуска пулов (--workers, --feed_workers); воркеры только подключаются.
+        """
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            try:
+                db.execute('PRAGMA journal_mode=WAL')
+                db.execute('CREATE TABLE IF NOT EXISTS descriptions (key TEXT PRIMARY KEY, mdx TEXT NOT NULL)')
+                db.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)')
+                row = db.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+                if row is None or row[0] != self.version:
+                    db.execute('DELETE FROM descriptions')
+                    db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('version', ?)", (self.version,))
+                    db.execute('VACUUM')
+            finally:
+                db.close()
+        except sqlite3.Error as e:
+            # Без кэша описания просто форматируются заново (см. get_or_format)
+            print(f"⚠️ Кэш описаний недоступен ({self.path}): {e}")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Соединение SQLite нельзя использовать после fork (--workers) — у процесса своё
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._db.execute('PRAGMA synchronous=OFF')
+            self._db_pid = os.getpid()
+        return self._db
+
+    def get_or_format(self, raw: str, format_description: Callable[[str], str]) -> str:
+        cached = self._memory.get(raw)
+        if cached is not None:
+            return cached
+
+        key = hashlib.sha1(f"{self.version}\0{raw}".encode('utf-8')).hexdigest()
+        try:
+            row = self._connect().execute('SELECT mdx FROM descriptions WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error:
+            # Кэш — только ускорение: занятая или испорченная база считается промахом
+            row = None
+        if row is not None:
+            result = row[0]
+        else:
+            result = format_description(raw)
+            try:
+                self._connect().execute('INSERT OR REPLACE INTO descriptions (key, mdx) VALUES (?, ?)', (key, result))
+            except sqlite3.Error:
+                pass
+
+        self._memory[raw] = result
+        return result
+
+    def close(self) -> None:
+        if self._db is not None and self._db_pid == os.getpid():
+            self._db.close()
+        self._db = None
+        self._memory.clear()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Замена по словарю «подстрока → перевод» за один проход автомата Ахо — Корасик.
+
+Семантика та же, что у последовательного цикла в _translate_russian_in_url:
+
+    for rus, eng in pairs:          # pairs уже упорядочены (длинные первыми)
+        idx = text.lower().find(rus)
+        if idx != -1:
+            text = text[:idx] + eng + text[idx + len(rus):]
+
+то есть каждая подстрока заменяется не больше одного раза (первое вхождение),
+и замена видна следующим подстрокам. Вместо find по каждому ключу словаря
+автомат за один проход по тексту находит, какие ключи в нём вообще есть;
+после каждой замены (их обычно 0–2) текст просматривается заново.
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+
+class PatternReplacer:
+    def __init__(self, pairs: Iterable[Tuple[str, str]]):
+        self.pairs: List[Tuple[str, str]] = list(pairs)
+        # Автомат: переходы, суффиксные ссылки и номера ключей, заканчивающихся в узле
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        # Пустой ключ find находит всегда (в начале строки)
+        self._always = tuple(rank for rank, (pattern, _) in enumerate(self.pairs) if not pattern)
+
+        own: List[List[int]] = [[]]
+        for rank, (pattern, _) in enumerate(self.pairs):
+            node = 0
+            for ch in pattern:
+                next_node = self._goto[node].get(ch)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][ch] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                    own.append([])
+                node = next_node
+            if pattern:
+                own[node].append(rank)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            self._out[node] = tuple(own[node]) + self._out[self._fail[node]]
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                queue.append(child)
+
+    def __bool__(self) -> bool:
+        return bool(self.pairs)
+
+    def find_present(self, text: str) -> List[int]:
+        """Номера ключей (в порядке приоритета), которые встречаются в text."""
+        goto, fail, out = self._goto, self._fail, self._out
+        present = set(self._always)
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                present.update(out[node])
+        return sorted(present)
+
+    def replace(self, text: str) -> str:
+        text_lower = text.lower()
+        pending = self.find_present(text_lower)
+        while pending:
+            rank = pending[0]
+            rus, eng = self.pairs[rank]
+            idx = text_lower.find(rus)
+            text = text[:idx] + eng + text[idx + len(rus):]
+            text_lower = text.lower()
+            # Замена могла убрать или создать вхождения следующих по приоритету ключей
+            pending = [r for r in self.find_present(text_lower) if r > rank]
+        return text
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Буферизованный вывод сообщений скриптов в output.txt и сводка запуска в stdout.
+
+- report() копит сообщения в памяти; output.txt дописывается одним куском
+  в flush() (и автоматически при выходе из процесса);
+- одинаковые сообщения пишутся один раз, а сообщения с ключом группы
+  (вид ошибки, бренд, модель) — первым из группы с числом повторов;
+- tally()/progress() вместо строки в stdout на каждую машину: счётчики
+  печатаются сводкой (print_summary), прогресс — каждые PROGRESS_EVERY шагов;
+- detail() — построчный вывод для отладки, только при UPDATE_CARS_VERBOSE.
+
+Сообщения и счётчики процессов пула (--workers) забираются take_report()
+и добавляются в основной процесс через merge_report(), как замеры run_report.
+"""
+
+import atexit
+import os
+from typing import Any, Dict, Hashable, List, Optional
+
+OUTPUT_PATH = 'output.txt'
+PROGRESS_EVERY = 500
+VERBOSE = str(os.getenv('UPDATE_CARS_VERBOSE', '')).strip().lower() in {'1', 'true', 'yes', 'on'}
+
+# Сообщения в порядке первого появления и их индекс по ключу дедупликации
+_messages: List[Dict[str, Any]] = []
+_messages_by_key: Dict[Hashable, Dict[str, Any]] = {}
+_counters: Dict[str, int] = {}
+
+
+def _add_message(message: str, key: Optional[Hashable], repeats: int) -> bool:
+    dedupe_key = ('message', message) if key is None else ('key', key)
+    entry = _messages_by_key.get(dedupe_key)
+    if entry is not None:
+        entry['repeats'] += repeats + 1
+        return False
+
+    entry = {'message': message, 'key': key, 'repeats': repeats}
+    _messages_by_key[dedupe_key] = entry
+    _messages.append(entry)
+    return True
+
+
+def report(message: str, key: Optional[Hashable] = None) -> bool:
+    """
+    Добавляет сообщение для output.txt. key — ключ группы повторов, например
+    ('Не найден цвет', brand, model); без ключа повтором считается тот же текст.
+
+    Returns:
+        True для нового сообщения, False для повтора (он только посчитан)
+    """
+    return _add_message(message, key, 0)
+
+
+def tally(label: str, amount: int = 1) -> None:
+    _counters[label] = _counters.get(label, 0) + amount
+
+
+def progress(label: str) -> None:
+    """Счётчик шагов с выводом каждые PROGRESS_EVERY шагов."""
+    tally(label)
+    if _counters[label] % PROGRESS_EVERY == 0:
+        print(f"⏳ {label}: {_counters[label]}")
+
+
+def detail(message: str) -> None:
+    """Подробная строка для отладки (UPDATE_CARS_VERBOSE)."""
+    if VERBOSE:
+        print(message)
+
+
+def take_report() -> Dict[str, Any]:
+    """Забирает накопленные сообщения и счётчики (в процессе пула — чтобы вернуть их основному)."""
+    taken = {
+        'messages': [(entry['message'], entry['key'], entry['repeats']) for entry in _messages],
+        'counters': dict(_counters),
+    }
+    _messages.clear()
+    _messages_by_key.clear()
+    _counters.clear()
+    return taken
+
+
+def merge_report(taken: Dict[str, Any]) -> None:
+    for message, key, repeats in taken['messages']:
+        _add_message(message, key, repeats)
+    for label, amount in taken['counters'].items():
+        tally(label, amount)
+
+
+def format_message(entry: Dict[str, Any]) -> str:
+    if not entry['repeats']:
+        return entry['message']
+    return f"{entry['message']}\n<i>Повторов: {entry['repeats']}</i>"
+
+
+def flush(path: str = OUTPUT_PATH) -> None:
+    """Дописывает накопленные сообщения в output.txt одним куском."""
+    if not _messages:
+        return
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write(''.join(f"{format_message(entry)}\n" for entry in _messages))
+    _messages.clear()
+    _messages_by_key.clear()
+
+
+def print_summary() -> None:
+    """Печатает счётчики tally/progress за запуск."""
+    if not _counters:
+        return
+    print("📊 Итоги:")
+    for label, amount in _counters.items():
+        print(f"   {label}: {amount}")
+
+
+atexit.register(flush)
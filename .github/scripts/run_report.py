@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+Замеры времени по стадиям update_cars.py и JSON-отчёт о запуске.
+
+Стадия — именованный участок кода (разбор машины, справочники, изображения,
+запись MDX, публикация...). Каждый проход стадии — один замер, поэтому для
+стадий, которые выполняются на каждую машину, p50/p95 — это время на машину.
+Стадии могут быть вложенными: время внешней включает время внутренних.
+
+Замеры из процессов пула (--workers) забираются take_samples() и
+добавляются в основной процесс через merge_samples().
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Dict, List, Optional
+
+RUN_REPORT_PATH = './tmp/update_cars_run_report.json'
+
+_samples: Dict[str, List[float]] = {}
+_started_at = time.time()
+_started = time.perf_counter()
+
+
+def record(name: str, seconds: float) -> None:
+    _samples.setdefault(name, []).append(seconds)
+
+
+@contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def timed(name: str):
+    """Декоратор: каждый вызов функции — замер стадии name."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def take_samples() -> Dict[str, List[float]]:
+    """Забирает накопленные замеры (в процессе пула — чтобы вернуть их основному процессу)."""
+    samples = dict(_samples)
+    _samples.clear()
+    return samples
+
+
+def merge_samples(samples: Dict[str, List[float]]) -> None:
+    for name, values in samples.items():
+        _samples.setdefault(name, []).extend(values)
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    """Percentile по ближайшему рангу."""
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize() -> Dict[str, Dict[str, Any]]:
+    summary = {}
+    for name, values in sorted(_samples.items()):
+        ordered = sorted(values)
+        summary[name] = {
+            'count': len(ordered),
+            'total': round(sum(ordered), 6),
+            'p50': round(_percentile(ordered, 50), 6),
+            'p95': round(_percentile(ordered, 95), 6),
+            'max': round(ordered[-1], 6),
+        }
+    return summary
+
+
+def write_run_report(path: Optional[str] = RUN_REPORT_PATH, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Пишет отчёт о запуске в JSON (path=None — только вернуть) и печатает итог по стадиям."""
+    report = {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z', time.localtime(_started_at)),
+        'duration': round(time.perf_counter() - _started, 3),
+        **(extra or {}),
+        'stages': summarize(),
+    }
+
+    if path:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"⏱️ Время работы: {report['duration']} с")
+    for name, values in report['stages'].items():
+        print(f"   {name}: {values['total']:.3f} с, {values['count']} раз, p50 {values['p50'] * 1000:.2f} мс, p95 {values['p95'] * 1000:.2f} мс")
+    if path:
+        print(f"🧾 Отчёт о запуске: {path}")
+    return report
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Снимки файлов настроек сайта (settings.json, env.json, .env) на время запуска.
+
+Файл разбирается один раз и перечитывается только если изменились его mtime
+или размер. Проверка stat делается не чаще SNAPSHOT_CHECK_INTERVAL секунд,
+поэтому обращение к настройкам на каждую машину — это поиск в словаре.
+
+Модуль зависит только от file_hashes, его используют update_cars.py, utils.py и image_mirror.py.
+"""
+
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from file_hashes import file_stamp
+
+SITE_SETTINGS_PATH = './src/data/site/settings.json'
+SNAPSHOT_CHECK_INTERVAL = 1.0
+
+# (абсолютный путь, loader) → {'stamp': (mtime_ns, size) | None, 'value': ..., 'checked_at': ...}
+_snapshots: Dict[Tuple[str, Callable[[str], Any]], Dict[str, Any]] = {}
+
+
+def cached_file(path, loader: Callable[[str], Any]) -> Any:
+    """
+    Возвращает loader(path), перечитывая файл только при изменении mtime/размера.
+    Если файла нет — None (пока файл не появится).
+
+    Результат общий для всех вызовов, изменять его нельзя.
+    """
+    path = os.path.abspath(os.fspath(path))
+    key = (path, loader)
+    now = time.monotonic()
+
+    snapshot = _snapshots.get(key)
+    if snapshot is not None and now - snapshot['checked_at'] < SNAPSHOT_CHECK_INTERVAL:
+        return snapshot['value']
+
+    stamp = file_stamp(path)
+    if snapshot is None or snapshot['stamp'] != stamp:
+        snapshot = {
+            'stamp': stamp,
+            'value': None if stamp is None else loader(path),
+        }
+        _snapshots[key] = snapshot
+    snapshot['checked_at'] = now
+    return snapshot['value']
+
+
+def invalidate_snapshots() -> None:
+    """Сбрасывает все снимки (например, после записи настроек в этом же процессе)."""
+    _snapshots.clear()
+
+
+def read_json(path: str) -> Optional[Any]:
+    """Читает JSON-файл; при ошибке печатает её и возвращает None."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        print(f"Ошибка при чтении {path}")
+    except Exception as e:
+        print(f"Произошла ошибка при работе с файлом: {e}")
+    return None
+
+
+def get_site_settings(path: str = SITE_SETTINGS_PATH) -> Dict[str, Any]:
+    """Итоговый settings.json сайта ({} если файла нет или он битый)."""
+    settings = cached_file(path, read_json)
+    return settings if isinstance(settings, dict) else {}
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+from contextlib import redirect_stdout
+from io import StringIO
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import avito_photos
+from avito_photos import AvitoPhotosIndex
+
+
+AVITO_XML = """<?xml version='1.0' encoding='utf-8'?>
+<Ads formatVersion="3" target="Avito.ru">
+  <Ad>
+    <VIN>VIN1</VIN>
+    <Images><Image url="https://avito.example/1.jpg"/><Image url="https://avito.example/2.jpg"/></Images>
+    <Description>&lt;![CDATA[&lt;p&gt;Описание&lt;/p&gt;]]&gt;</Description>
+  </Ad>
+  <Ad>
+    <VIN>VIN2</VIN>
+    <Description><![CDATA[Без фото]]></Description>
+  </Ad>
+  <Ad>
+    <Images><Image url="https://avito.example/no-vin.jpg"/></Images>
+  </Ad>
+  <Ad>
+    <VIN>VIN1</VIN>
+    <Images><Image url="https://avito.example/last.jpg"/></Images>
+  </Ad>
+</Ads>
+"""
+
+
+class AvitoPhotosIndexTests(unittest.TestCase):
+    """Индекс фото дилера по VIN: ленивое построение и переиспользование между запусками."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.xml_path = os.path.join(self.tmp_dir.name, 'dealer_photos_for_cars_avito.xml')
+        self.cache_path = os.path.join(self.tmp_dir.name, 'cache', 'photos.sqlite3')
+        self.write_xml(AVITO_XML)
+
+    def write_xml(self, content):
+        with open(self.xml_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    def open_index(self):
+        index = AvitoPhotosIndex(self.xml_path, self.cache_path)
+        self.addCleanup(lambda: index._db is not None and index._db.close())
+        return index
+
+    def test_lookup_by_vin(self):
+        index = self.open_index()
+        with redirect_stdout(StringIO()):
+            self.assertIn('VIN1', index)
+
+        # Повторный VIN — побеждает последнее объявление, без Images — пустой список
+        self.assertEqual(index['VIN1'], {'images': ['https://avito.example/last.jpg'], 'description': ''})
+        self.assertEqual(index['VIN2'], {'images': [], 'description': 'Без фото'})
+        self.assertNotIn('VIN3', index)
+        self.assertIsNone(index.get('VIN3'))
+        self.assertIsNone(index.get(None))
+        with self.assertRaises(KeyError):
+            index['VIN3']
+
+    def test_description_cdata_text_is_unwrapped(self):
+        self.write_xml(AVITO_XML.replace(
+            '<Ad>\n    <VIN>VIN1</VIN>\n    <Images><Image url="https://avito.example/last.jpg"/></Images>\n  </Ad>\n', ''))
+        index = self.open_index()
+        with redirect_stdout(StringIO()):
+            self.assertEqual(index['VIN1']['description'], '<p>Описание</p>')
+        self.assertEqual(len(index['VIN1']['images']), 2)
+
+    def test_index_is_reused_until_file_changes(self):
+        with redirect_stdout(StringIO()):
+            self.open_index().get('VIN1')
+
+        with mock.patch.object(avito_photos, 'iter_avito_ads', wraps=avito_photos.iter_avito_ads) as iter_ads:
+            self.assertIn('VIN2', self.open_index())
+            iter_ads.assert_not_called()
+
+            self.write_xml(AVITO_XML.replace('VIN2', 'VIN9'))
+            with redirect_stdout(StringIO()):
+                index = self.open_index()
+                self.assertIn('VIN9', index)
+            self.assertNotIn('VIN2', index)
+            iter_ads.assert_called_once()
+
+    def test_missing_or_broken_file_is_empty(self):
+        os.remove(self.xml_path)
+        self.assertNotIn('VIN1', self.open_index())
+
+        self.write_xml('<Ads><Ad><VIN>VIN1</VIN>')
+        output = StringIO()
+        with redirect_stdout(output):
+            self.assertNotIn('VIN1', self.open_index())
+        self.assertIn('Произошла ошибка при работе с файлом', output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
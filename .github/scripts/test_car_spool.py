@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+import os
+import unittest
+
+from car_spool import CarSpool, iter_spool
+
+
+class CarSpoolTests(unittest.TestCase):
+    """Машины во временном файле читаются такими же, какими записаны."""
+
+    def test_reads_by_offset_between_appends(self):
+        spool = CarSpool()
+        self.addCleanup(spool.close)
+        first = spool.append('<car><vin>XW8ZZZ61ZKG000001</vin></car>')
+        second = spool.append({'vin': 'XW8ZZZ61ZKG000002', 'unique_id': '7'})
+        self.assertEqual(spool.read(first), '<car><vin>XW8ZZZ61ZKG000001</vin></car>')
+        third = spool.append({'file_path': 'haval-jolion.mdx'})
+
+        self.assertEqual(list(spool.read(second).items()), [('vin', 'XW8ZZZ61ZKG000002'), ('unique_id', '7')])
+        self.assertEqual(spool.read(third), {'file_path': 'haval-jolion.mdx'})
+        self.assertEqual(spool.read(first), '<car><vin>XW8ZZZ61ZKG000001</vin></car>')
+
+    def test_named_spool_is_read_in_order_and_removed(self):
+        spool = CarSpool(named=True)
+        for index in range(3):
+            spool.append({'order': index})
+        path = spool.detach()
+
+        self.assertEqual([car['order'] for car in iter_spool(path)], [0, 1, 2])
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+import re
+import unittest
+
+from car_templates import DEFAULT_TEMPLATES, TemplateError, compile_car_templates, compile_template
+
+
+def render_with_regex(template, car, config, conditional=False):
+    """Прежняя отрисовка: re.sub по {% if %} (для description) и по {{...}}."""
+    if conditional:
+        def if_replacer(match):
+            expr = match.group(1).strip()
+            if expr.startswith('car.') and car.get(expr[4:]):
+                return match.group(2)
+            return ''
+        template = re.sub(r'\{% if ([^%]+)%\}([\s\S]*?)\{% endif %\}', if_replacer, template)
+
+    def replacer(match):
+        expr = match.group(1).strip()
+        if expr.startswith('car.'):
+            return str(car.get(expr[4:], ''))
+        elif expr.startswith('config.'):
+            return str(config.get(expr[7:], ''))
+        return match.group(0)
+    return re.sub(r'\{\{\s*([^}]+)\s*\}\}', replacer, template)
+
+
+CARS = [
+    {'mark_id': 'Haval', 'folder_id': 'Jolion', 'year': 2024, 'color': 'Белый', 'priceWithDiscount': 2199000,
+     'modification_id': '1.5 AMT', 'complectation_name': 'Comfort'},
+    {'mark_id': 'Geely', 'folder_id': 'Coolray', 'year': '', 'color': None, 'complectation_name': '{{car.vin}}'},
+    {},
+]
+CONFIG = {'legal_city': 'Самара', 'legal_city_where': 'Самаре'}
+
+
+class CompileTemplateTests(unittest.TestCase):
+    """Разобранный шаблон отрисовывается так же, как прежние re.sub по шаблону."""
+
+    def test_matches_regex_rendering(self):
+        templates = [(template, key == 'description_template') for key, template in DEFAULT_TEMPLATES.items()]
+        templates += [
+            ('{{ car.mark_id }} {car} {{config.legal_city}}: {{car.missing}}', False),
+            ('{% if car.color %}{{car.color}}{% endif %}{% if car.year %}, {{car.year}} г.{% endif %} {ok}', True),
+            ('{{car.mark_id}}{% if config.legal_city %} в г. {{config.legal_city}}{% endif %}{% if car. %}!{% endif %}', True),
+        ]
+        for template, conditional in templates:
+            render = compile_template(template, conditional)
+            for car in CARS:
+                with self.subTest(template=template, car=car):
+                    self.assertEqual(render(car, CONFIG), render_with_regex(template, car, CONFIG, conditional))
+
+    def test_malformed_templates_fail_at_load(self):
+        for template in (
+            '{{car.mark_id}} {{car.folder_id',
+            '{{mark_id}}',
+            '{% if car.year %}{{car.year}}',
+            '{{car.mark_id}}{% endif %}',
+            '{%if car.year %}{{car.year}}{% endif %}',
+            '{% if car.year %}{{car.year}}{% endif %}}}',
+        ):
+            with self.subTest(template):
+                with self.assertRaises(TemplateError):
+                    compile_car_templates({'description_template': template})
+
+        with self.assertRaisesRegex(TemplateError, 'h1_template'):
+            compile_car_templates({'h1_template': '{% if car.year %}{{car.year}}{% endif %}'})
+        compile_car_templates({'h1_template': '', 'title_template': '{{car.mark_id}} в {{config.legal_city_where}}'})
+
+
+if __name__ == '__main__':
+    unittest.main()
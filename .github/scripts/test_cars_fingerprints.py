@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+from contextlib import redirect_stdout
+from io import StringIO
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+from cars_fingerprints import CarsFingerprintStore, element_to_record, record_to_element
+
+
+class CarsFingerprintStoreTests(unittest.TestCase):
+    """Группа берётся из прошлого запуска только если её машины и MDX не изменились."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, 'cars_fingerprints.json')
+        self.cars_dir = os.path.join(self.tmp_dir.name, 'cars')
+        self.temp_dir = os.path.join(self.tmp_dir.name, 'tmp_cars')
+        os.makedirs(self.cars_dir)
+        os.makedirs(self.temp_dir)
+
+    def car_element(self, vin):
+        car = ET.Element('car')
+        ET.SubElement(car, 'vin').text = vin
+        images = ET.SubElement(car, 'images')
+        ET.SubElement(images, 'image').text = f'https://example.ru/{vin}.jpg'
+        return car
+
+    def run_first(self, cars, messages=(), color_errors=None):
+        """Первый запуск: одна группа haval-jolion.mdx, опубликованная в cars_dir."""
+        store = CarsFingerprintStore(self.path)
+        store.find_reusable_groups([{'vin': vin, 'fingerprint': fp} for vin, fp in cars], 'env', self.cars_dir)
+        temp_path = os.path.join(self.temp_dir, 'haval-jolion.mdx')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write('---\norder: 1\n---\n')
+        key = store.group_key(self.cars_dir, temp_path)
+        for index, (vin, fp) in enumerate(cars):
+            store.record_car(key, temp_path, 'env', vin, fp, self.car_element(vin),
+                             price_row=['Haval', 'Jolion', 100, 10], thumbs=[],
+                             order=1 if index == 0 else None, messages=list(messages))
+        with redirect_stdout(StringIO()):
+            store.save(color_errors={temp_path: color_errors} if color_errors else None)
+        os.replace(temp_path, key)
+        return key
+
+    def test_element_record_round_trip(self):
+        car = self.car_element('X1')
+        restored = record_to_element(element_to_record(car))
+        self.assertEqual(ET.tostring(restored), ET.tostring(car))
+
+    def test_unchanged_group_is_reusable(self):
+        key = self.run_first([('A1', 'fa'), ('B2', 'fb')])
+        entries = [{'vin': 'A1', 'fingerprint': 'fa'}, {'vin': 'B2', 'fingerprint': 'fb'}]
+
+        reusable = CarsFingerprintStore(self.path).find_reusable_groups(entries, 'env', self.cars_dir)
+
+        self.assertEqual(reusable, {key})
+        self.assertEqual([entry['group'] for entry in entries], [key, key])
+
+    def test_group_with_messages_is_reusable_and_keeps_them(self):
+        warning = ['Не переведено: <code>Джолион</code>', 'warning', ['Не переведено', 'Джолион']]
+        color_error = ('vin: A1 Не найден цвет', ('Не найден цвет', 'Haval', 'Jolion', 'Белый'))
+        key = self.run_first([('A1', 'fa'), ('B2', 'fb')], messages=[warning], color_errors=color_error)
+        entries = [{'vin': 'A1', 'fingerprint': 'fa'}, {'vin': 'B2', 'fingerprint': 'fb'}]
+
+        store = CarsFingerprintStore(self.path)
+        self.assertEqual(store.find_reusable_groups(entries, 'env', self.cars_dir), {key})
+        record = store.previous_groups[key]
+        self.assertEqual(record['messages'], [warning, warning])
+        self.assertEqual(record['color_error'], [color_error[0], list(color_error[1])])
+        self.assertFalse(record['has_images'])
+
+    def test_changed_car_environment_or_mdx_blocks_reuse(self):
+        key = self.run_first([('A1', 'fa'), ('B2', 'fb')])
+        unchanged = lambda: [{'vin': 'A1', 'fingerprint': 'fa'}, {'vin': 'B2', 'fingerprint': 'fb'}]
+
+        changed_car = [{'vin': 'A1', 'fingerprint': 'fa'}, {'vin': 'B2', 'fingerprint': 'new'}]
+        self.assertEqual(CarsFingerprintStore(self.path).find_reusable_groups(changed_car, 'env', self.cars_dir), set())
+        self.assertEqual(CarsFingerprintStore(self.path).find_reusable_groups(unchanged(), 'other', self.cars_dir), set())
+        self.assertEqual(CarsFingerprintStore(self.path, max_age_hours=0).find_reusable_groups(unchanged(), 'env', self.cars_dir), set())
+
+        with open(key, 'a', encoding='utf-8') as f:
+            f.write('edited\n')
+        self.assertEqual(CarsFingerprintStore(self.path).find_reusable_groups(unchanged(), 'env', self.cars_dir), set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+import json
+import os
+from pathlib import Path
+import tempfile
+import unittest
+from unittest import mock
+
+from catalog_snapshot import load_or_build
+import config
+
+
+class CatalogSnapshotTests(unittest.TestCase):
+    """Снимок каталога: переиспользование и сброс при изменении исходных файлов."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.snapshot_path = os.path.join(self.tmp_dir.name, 'cache', 'catalog.pickle')
+        self.model_path = os.path.join(self.tmp_dir.name, 'coolray.json')
+        self.optional_path = os.path.join(self.tmp_dir.name, 'site_coolray.json')
+        self.write(self.model_path, '{"name": "Coolray"}')
+
+    def write(self, path, content):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    def load(self, version='1'):
+        build = mock.Mock(side_effect=lambda: {'models': [Path(self.model_path).read_text(encoding='utf-8')]})
+        value = load_or_build([self.model_path, self.optional_path], build, version, self.snapshot_path)
+        return value, build.call_count
+
+    def test_snapshot_is_reused_while_sources_unchanged(self):
+        first, builds = self.load()
+        self.assertEqual(builds, 1)
+
+        value, builds = self.load()
+        self.assertEqual(builds, 0)
+        self.assertEqual(value, first)
+
+    def test_touched_source_with_same_content_is_reused(self):
+        self.load()
+        stat = os.stat(self.model_path)
+        os.utime(self.model_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+        self.assertEqual(self.load()[1], 0)
+
+    def test_changed_or_new_source_rebuilds(self):
+        self.load()
+        self.write(self.model_path, '{"name": "Coolray New"}')
+        value, builds = self.load()
+        self.assertEqual(builds, 1)
+        self.assertEqual(value, {'models': ['{"name": "Coolray New"}']})
+
+        self.write(self.optional_path, '{"cyrillic": "Кулрей"}')
+        self.assertEqual(self.load()[1], 1)
+
+    def test_code_version_change_rebuilds(self):
+        self.load(version='1')
+        self.assertEqual(self.load(version='2')[1], 1)
+
+    def test_broken_snapshot_rebuilds(self):
+        self.load()
+        self.write(self.snapshot_path, 'not a pickle')
+        self.assertEqual(self.load()[1], 1)
+        self.assertEqual(self.load()[1], 0)
+
+
+
+class ModelCatalogTests(unittest.TestCase):
+    """Каталог по брендам: сводка при старте, модели бренда — при первом обращении."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        cwd = os.getcwd()
+        os.chdir(self.tmp_dir.name)
+        self.addCleanup(os.chdir, cwd)
+
+        self.write_json('src/data/common/brands/geely/defaults.json', {'brand': {'id': 'geely', 'name': 'Geely'}})
+        self.write_json('src/data/common/brands/geely/models/coolray.json', {
+            'name': 'Coolray',
+            'feed': {'folderIds': ['Coolray New']},
+            'colors': [
+                {'id': 'white', 'name': 'Белый', 'names': ['White'], 'carImage': '/img/white.webp'},
+                {'id': 'pearl', 'name': 'Жемчуг', 'names': ['white'], 'carImage': '/img/pearl.webp'},
+            ],
+            'complectations': [{'name': 'Flagship', 'caption': 'Флагман / Flagship'}],
+        })
+        self.write_json('src/data/common/brands/haval/defaults.json', {'brand': {'id': 'haval', 'name': 'Haval'}})
+        self.write_json('src/data/common/brands/haval/models/jolion.json', {'name': 'Jolion'})
+        self.write_json('src/data/site/data/brands/geely/models/coolray.json', {'cyrillic': 'Кулрей'})
+
+    def write_json(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    def open_catalog(self):
+        return config.ModelCatalog(snapshot_dir='tmp/cache/model_catalog')
+
+    def test_brands_are_loaded_on_first_access(self):
+        catalog = self.open_catalog()
+        self.assertEqual(catalog.summary['complectations'], {'флагман': 'Flagship'})
+        self.assertEqual(catalog._brands, {})
+
+        self.assertEqual(catalog.lookup_bucket('geely')['coolray new'], {'mark_id': 'geely', 'id': 'coolray'})
+        self.assertEqual(catalog.index_bucket('geely')['coolray']['cyrillic'], 'Кулрей')
+        self.assertIsNone(catalog.lookup_bucket('lada'))
+        self.assertEqual(list(catalog._brands), ['geely'])
+
+    def test_catalog_matches_full_build(self):
+        catalog = self.open_catalog()
+        models = config.load_model_catalog()
+        self.assertEqual(catalog.all_models(), models)
+
+        reopened = self.open_catalog()
+        lookup = {alias: reopened.lookup_bucket(alias) for alias in reopened.brand_names()}
+        self.assertEqual(lookup, config.build_model_lookup(models))
+
+    def test_get_model_info_uses_color_index_and_memoizes(self):
+        catalog = self.open_catalog()
+        patches = {
+            'model_lookup': config.LazyBrandMapping(catalog.lookup_bucket),
+            'model_index_by_brand': config.LazyBrandMapping(catalog.index_bucket),
+            'model_colors_by_brand': config.LazyBrandMapping(catalog.color_bucket),
+            '_model_info_cache': {},
+        }
+        with mock.patch.multiple(config, **patches), mock.patch.object(config, 'print_message') as print_message:
+            # Первый цвет с совпавшим алиасом побеждает
+            self.assertEqual(config.get_color_filename('Geely', 'Coolray', ' WHITE '), '/img/white.webp')
+            self.assertEqual(config.get_model_info('Geely', 'Coolray', 'color_id', color='Жемчуг'), 'pearl')
+
+            with mock.patch.object(config, '_resolve_model_info', wraps=config._resolve_model_info) as resolve:
+                self.assertIsNone(config.get_color_filename('Geely', 'Coolray', 'Синий', vin='vin1'))
+                self.assertIsNone(config.get_color_filename('Geely', 'Coolray', 'Синий', vin='vin2'))
+                self.assertEqual(resolve.call_count, 1)
+
+        # Ошибка запомненного результата пишется для каждой машины со своим VIN
+        messages = [call.args[0] for call in print_message.call_args_list]
+        self.assertEqual(len(messages), 2)
+        self.assertIn('<code>VIN1</code>', messages[0])
+        self.assertIn('<code>VIN2</code>', messages[1])
+        self.assertEqual(print_message.call_args.kwargs['key'], ('Не найден цвет', 'geely', 'coolray', 'синий'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+import random
+import unittest
+
+import yaml
+
+from frontmatter_io import _emit_frontmatter, dump_frontmatter, load_frontmatter
+
+
+def safe_dump(data):
+    """Прежняя сериализация frontmatter в render_car_file."""
+    return yaml.safe_dump(data, default_flow_style=False, allow_unicode=True)
+
+
+CAR_DATA = {
+    'vin': 'XW8ZZZ61ZKG000001',
+    'vin_hidden': 'XW8ZZ...00001',
+    'vin_list': 'XW8ZZZ61ZKG000001, XW8ZZZ61ZKG000002',
+    'mark_id': 'Haval',
+    'folder_id': 'Jolion',
+    'modification_id': '1.5 AMT (143 л.с.)',
+    'complectation_name': 'Comfort',
+    'color': 'Белый',
+    'year': 2024,
+    'run': 0,
+    'price': 2499000,
+    'max_discount': 300000,
+    'order': 7,
+    'availability': 'в наличии',
+    'currency': 'RUR',
+    'h1': 'Haval Jolion 1.5 AMT (143 л.с.) Comfort',
+    'title': "Купить Haval Jolion 2024 у официального дилера — 'Haval Центр' в Самаре, цена 2 499 000 ₽",
+    'description': 'Новый Haval Jolion: комплектация Comfort, цвет белый. Выгода до 300 000 ₽: trade-in, кредит #1',
+    'equipment': 'Климат-контроль<br>\nПодогрев сидений<br>\n  Камера заднего вида',
+    'extras': '',
+    'modelYear': '2024',
+    'gearboxType': 'true',
+    'image': 'https://cdn.example.ru/cars/haval/jolion/1.jpg',
+    'images': ['https://cdn.example.ru/cars/haval/jolion/%d.jpg' % i for i in range(3)],
+    'thumbs': [],
+    'imageSets': [
+        {'large': 'https://cdn.example.ru/cars/a-large.webp', 'medium': 'https://cdn.example.ru/cars/a-medium.webp'},
+        {},
+    ],
+    'options': {},
+}
+
+
+class DumpFrontmatterTests(unittest.TestCase):
+    """Frontmatter совпадает с yaml.safe_dump символ в символ."""
+
+    def test_car_data_matches_safe_dump(self):
+        text = _emit_frontmatter(CAR_DATA)
+        self.assertEqual(text, safe_dump(CAR_DATA))
+        self.assertEqual(load_frontmatter(text), CAR_DATA)
+
+    def test_matches_safe_dump_on_random_strings(self):
+        rnd = random.Random(1)
+        alphabet = "аб cd:#-'\"\n\t&*!|>%@`,?[]{}01.~\\\x85\xa0\u2028\uFEFF\U0001F600\x07"
+        words = ['', ' ', 'null', 'No', '~', '1', '0x1F', '1.5e3', '2020-01-01', '---', '- a', '12:30']
+        for _ in range(1000):
+            values = [
+                rnd.choice(words) if rnd.random() < 0.2
+                else ''.join(rnd.choice(alphabet if rnd.random() < 0.3 else 'абв где жз ab, ')
+                             for _ in range(rnd.choice([3, 20, 85, 200])))
+                for _ in range(3)
+            ]
+            data = {'title': values[0], 'images': [values[1]], 'imageSets': [{'large': values[2]}], values[1][:130] or 'k': 1}
+            text = _emit_frontmatter(data)
+            if text is not None:
+                self.assertEqual(text, safe_dump(data), data)
+
+    def test_unsupported_data_falls_back_to_safe_dump(self):
+        images = ['https://example.ru/1.jpg']
+        for data in ({'price': 1.5}, {'images': images, 'thumbs': images}, {1: 'a'}, {'k' * 130: 'a'}, {}):
+            with self.subTest(data):
+                self.assertIsNone(_emit_frontmatter(data))
+                self.assertEqual(dump_frontmatter(data), safe_dump(data))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+from contextlib import redirect_stdout
+from io import StringIO
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from lookup_cache import LookupCache
+
+
+class LookupCacheTests(unittest.TestCase):
+    """Дисковый кэш справочников: TTL, «не найдено» и фоновое обновление."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, 'cache', 'lookups.sqlite3')
+
+    def open_cache(self, **kwargs):
+        cache = LookupCache(self.path, **kwargs)
+        self.addCleanup(cache._db.close)
+        return cache
+
+    def test_values_survive_reopen(self):
+        cache = self.open_cache()
+        cache.set('generation', '332036', 'II (2021—н.в.)')
+        cache.set('complectation', '1', None)
+        cache.close()
+
+        cache = self.open_cache()
+        self.assertEqual(cache.get('generation', '332036'), (True, 'II (2021—н.в.)', False))
+        self.assertEqual(cache.get('complectation', '1'), (True, None, False))
+        self.assertEqual(cache.get('modification', '2'), (False, None, False))
+
+    def test_negative_results_expire_sooner(self):
+        cache = self.open_cache(ttl_days=30, negative_ttl_hours=1)
+        cache.set_many({('generation', '1'): 'I', ('generation', '2'): None})
+
+        with mock.patch('lookup_cache.time.time', return_value=time.time() + 2 * 3600):
+            self.assertEqual(cache.get('generation', '1'), (True, 'I', False))
+            self.assertEqual(cache.get('generation', '2'), (True, None, True))
+
+    def test_background_refresh_is_saved_on_close(self):
+        cache = self.open_cache()
+        cache.set('generation', '1', 'old')
+        calls = []
+
+        def fetch(kind, id_value):
+            calls.append((kind, id_value))
+            return (True, 'new') if id_value == '1' else (False, None)
+
+        cache.refresh_in_background([('generation', '1'), ('generation', '1'), ('generation', '2')], fetch)
+        with redirect_stdout(StringIO()):
+            cache.close()
+
+        self.assertEqual(sorted(calls), [('generation', '1'), ('generation', '2')])
+        cache = self.open_cache()
+        self.assertEqual(cache.get('generation', '1')[1], 'new')
+        self.assertFalse(cache.get('generation', '2')[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+from contextlib import closing, redirect_stdout
+import importlib
+from io import StringIO
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from mdx_description import DescriptionCache, simple_html_to_string
+
+# utils сообщает о недостающих generated data через stdout при импорте.
+with redirect_stdout(StringIO()):
+    import utils
+
+# Другие тесты подменяют bs4 заглушкой (sys.modules) — эталон сверяем с настоящим
+if getattr(sys.modules.get('bs4'), '__file__', None) is None:
+    sys.modules.pop('bs4', None)
+BeautifulSoup = importlib.import_module('bs4').BeautifulSoup
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testdata', 'mdx_descriptions.json')
+
+
+class ProcessDescriptionGoldenTests(unittest.TestCase):
+    """Описания в MDX совпадают с эталоном, снятым с форматирования через BeautifulSoup."""
+
+    def setUp(self):
+        with open(GOLDEN_PATH, 'r', encoding='utf-8') as f:
+            self.golden = json.load(f)
+        patcher = mock.patch.object(utils, 'BeautifulSoup', BeautifulSoup)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_matches_golden_output(self):
+        for entry in self.golden:
+            with self.subTest(entry['input']):
+                self.assertEqual(utils.process_description(entry['input']), entry['output'])
+
+    def test_fast_path_matches_beautifulsoup(self):
+        fast_path_used = 0
+        for entry in self.golden:
+            serialized = simple_html_to_string(entry['input'])
+            if serialized is None:
+                continue
+            fast_path_used += 1
+            with self.subTest(entry['input']):
+                self.assertEqual(serialized, str(BeautifulSoup(entry['input'], 'html.parser')))
+        self.assertGreater(fast_path_used, len(self.golden) // 2)
+
+    def test_complex_html_falls_back(self):
+        for raw in ('<p class="x">a</p>', '<b>a', 'a</b>', '<br>a<br/>', '&nbsp', '<!-- c -->', 'a\r\nb'):
+            with self.subTest(raw):
+                self.assertIsNone(simple_html_to_string(raw))
+
+
+class DescriptionCacheTests(unittest.TestCase):
+    """Кэш описаний: повторное описание не форматируется ни в этом, ни в следующем запуске."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, 'cache', 'descriptions.sqlite3')
+
+    def open_cache(self, version='1'):
+        cache = DescriptionCache(version, self.path)
+        cache.prepare()
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_reuses_formatted_description_across_runs(self):
+        format_description = mock.Mock(side_effect=lambda raw: f'<p> {raw} </p>')
+        cache = self.open_cache()
+        self.assertEqual(cache.get_or_format('Текст', format_description), '<p> Текст </p>')
+        self.assertEqual(cache.get_or_format('Текст', format_description), '<p> Текст </p>')
+        cache.close()
+
+        self.assertEqual(self.open_cache().get_or_format('Текст', format_description), '<p> Текст </p>')
+        self.assertEqual(format_description.call_count, 1)
+
+        # Другая версия кода форматирования — формат заново
+        self.open_cache(version='2').get_or_format('Текст', format_description)
+        self.assertEqual(format_description.call_count, 2)
+
+    def test_drops_rows_of_other_versions(self):
+        format_description = mock.Mock(side_effect=lambda raw: f'<p> {raw} </p>')
+        cache = self.open_cache(version='1')
+        cache.get_or_format('Первый', format_description)
+        cache.close()
+        cache = self.open_cache(version='2')
+        cache.get_or_format('Второй', format_description)
+        cache.close()
+
+        with closing(sqlite3.connect(self.path)) as db:
+            self.assertEqual(db.execute('SELECT COUNT(*) FROM descriptions').fetchone()[0], 1)
+
+    def test_database_errors_are_cache_misses(self):
+        format_description = mock.Mock(side_effect=lambda raw: f'<p> {raw} </p>')
+        cache = self.open_cache()
+        with mock.patch.object(cache, '_connect', side_effect=sqlite3.OperationalError('database is locked')):
+            self.assertEqual(cache.get_or_format('Текст', format_description), '<p> Текст </p>')
+        self.assertEqual(format_description.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
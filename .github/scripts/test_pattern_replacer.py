@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+import random
+import unittest
+
+from pattern_replacer import PatternReplacer
+
+
+def replace_sequentially(text, pairs):
+    """Прежний цикл _translate_russian_in_url: find по каждому ключу."""
+    text_lower = text.lower()
+    for rus, eng in pairs:
+        idx = text_lower.find(rus)
+        if idx != -1:
+            text = text[:idx] + eng + text[idx + len(rus):]
+            text_lower = text.lower()
+    return text
+
+
+class PatternReplacerTests(unittest.TestCase):
+    """Автомат замен совпадает с последовательным поиском ключей по приоритету."""
+
+    def test_longest_first_and_single_replacement(self):
+        pairs = [('люкс плюс', 'lux-plus'), ('люкс', 'lux'), ('плюс', 'plus')]
+        replacer = PatternReplacer(pairs)
+        for text in ('Люкс Плюс', 'люкс и люкс', 'плюс люкс плюс', 'Base'):
+            self.assertEqual(replacer.replace(text), replace_sequentially(text, pairs))
+        self.assertEqual(replacer.replace('Люкс Плюс'), 'lux-plus')
+        self.assertEqual(replacer.replace('люкс и люкс'), 'lux и люкс')
+
+    def test_replacement_can_create_next_match(self):
+        pairs = [('абв', 'г'), ('гд', 'x')]
+        self.assertEqual(PatternReplacer(pairs).replace('абвд'), 'x')
+
+    def test_matches_sequential_replacement_on_random_texts(self):
+        rnd = random.Random(1)
+        alphabet = 'абвгАБ x'
+        for _ in range(300):
+            keys = {''.join(rnd.choice('абвг') for _ in range(rnd.randint(1, 4))) for _ in range(rnd.randint(1, 6))}
+            pairs = sorted(
+                ((key, rnd.choice(['', 'a', 'в', 'гб', key.upper()])) for key in keys),
+                key=lambda x: len(x[0]),
+                reverse=True,
+            )
+            replacer = PatternReplacer(pairs)
+            for _ in range(10):
+                text = ''.join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 12)))
+                self.assertEqual(replacer.replace(text), replace_sequentially(text, pairs), (text, pairs))
+
+
+if __name__ == '__main__':
+    unittest.main()
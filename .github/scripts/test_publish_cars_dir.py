@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+from contextlib import redirect_stdout
+from io import StringIO
+import os
+import tempfile
+import unittest
+
+# utils сообщает о недостающих generated data через stdout при импорте.
+with redirect_stdout(StringIO()):
+    from utils import publish_cars_dir
+
+
+class PublishCarsDirTests(unittest.TestCase):
+    """Публикация пишет только разницу между временной и основной папкой."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.temp_cars_dir = os.path.join(self.tmp_dir.name, 'tmp_cars')
+        self.cars_dir = os.path.join(self.tmp_dir.name, 'cars')
+        os.makedirs(self.temp_cars_dir)
+        os.makedirs(self.cars_dir)
+
+    def write(self, directory, name, content, mtime=None):
+        path = os.path.join(directory, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def test_writes_only_added_and_changed_files(self):
+        same = self.write(self.cars_dir, 'same.mdx', 'order: 1', mtime=1_000_000)
+        self.write(self.cars_dir, 'changed.mdx', 'order: 2')
+        self.write(self.cars_dir, 'removed.mdx', 'order: 3')
+        self.write(self.temp_cars_dir, 'same.mdx', 'order: 1')
+        self.write(self.temp_cars_dir, 'changed.mdx', 'order: 20')
+        self.write(self.temp_cars_dir, 'added.mdx', 'order: 4')
+
+        counts = publish_cars_dir(self.temp_cars_dir, self.cars_dir)
+
+        self.assertEqual(counts, {'added': 1, 'changed': 1, 'removed': 1, 'unchanged': 1})
+        self.assertEqual(sorted(os.listdir(self.cars_dir)), ['added.mdx', 'changed.mdx', 'same.mdx'])
+        with open(os.path.join(self.cars_dir, 'changed.mdx'), encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'order: 20')
+        self.assertEqual(os.path.getmtime(same), 1_000_000)
+
+    def test_empty_temp_dir_keeps_live_files(self):
+        self.write(self.cars_dir, 'car.mdx', 'order: 1')
+
+        self.assertIsNone(publish_cars_dir(self.temp_cars_dir, self.cars_dir))
+        self.assertEqual(os.listdir(self.cars_dir), ['car.mdx'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+import os
+import tempfile
+import unittest
+
+import reporter
+
+
+class ReporterTests(unittest.TestCase):
+    """output.txt пишется одним куском, повторы сообщений сворачиваются."""
+
+    def setUp(self):
+        reporter.take_report()
+        self.addCleanup(reporter.take_report)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, 'output.txt')
+
+    def read_output(self):
+        with open(self.path, encoding='utf-8') as f:
+            return f.read()
+
+    def test_deduplicates_by_text_and_key(self):
+        self.assertTrue(reporter.report('Ошибка A'))
+        self.assertFalse(reporter.report('Ошибка A'))
+        self.assertTrue(reporter.report('vin: 1 Не найден цвет', key=('Не найден цвет', 'geely', 'coolray')))
+        self.assertFalse(reporter.report('vin: 2 Не найден цвет', key=('Не найден цвет', 'geely', 'coolray')))
+        reporter.report('vin: 3 Не найден цвет', key=('Не найден цвет', 'geely', 'coolray'))
+
+        reporter.flush(self.path)
+
+        self.assertEqual(
+            self.read_output(),
+            'Ошибка A\n<i>Повторов: 1</i>\nvin: 1 Не найден цвет\n<i>Повторов: 2</i>\n',
+        )
+
+    def test_flush_appends_and_clears_buffer(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('from getOneXML\n')
+        reporter.report('Ошибка B')
+
+        reporter.flush(self.path)
+        reporter.flush(self.path)
+
+        self.assertEqual(self.read_output(), 'from getOneXML\nОшибка B\n')
+
+    def test_merge_worker_report(self):
+        reporter.report('Ошибка C')
+        reporter.tally('MDX создано')
+        worker_report = reporter.take_report()
+
+        reporter.report('Ошибка C')
+        reporter.tally('MDX создано', 2)
+        reporter.merge_report(worker_report)
+
+        self.assertEqual(reporter.take_report(), {
+            'messages': [('Ошибка C', None, 1)],
+            'counters': {'MDX создано': 3},
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+from contextlib import redirect_stdout
+from io import StringIO
+import json
+import os
+import tempfile
+import unittest
+
+import run_report
+
+
+class RunReportTests(unittest.TestCase):
+    """Итоги по стадиям: число замеров, сумма и percentile по ближайшему рангу."""
+
+    def setUp(self):
+        run_report.take_samples()
+        self.addCleanup(run_report.take_samples)
+
+    def test_summary_and_report_file(self):
+        for seconds in [0.01 * i for i in range(1, 21)]:
+            run_report.record('images', seconds)
+        run_report.merge_samples({'images': [1.0], 'publish': [0.5]})
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'report', 'run.json')
+            with redirect_stdout(StringIO()):
+                run_report.write_run_report(path, {'cars': 21})
+            with open(path, encoding='utf-8') as f:
+                report = json.load(f)
+
+        self.assertEqual(report['cars'], 21)
+        images = report['stages']['images']
+        self.assertEqual(images['count'], 21)
+        self.assertAlmostEqual(images['total'], 3.1)
+        self.assertAlmostEqual(images['p50'], 0.11)
+        self.assertAlmostEqual(images['p95'], 0.2)
+        self.assertEqual(images['max'], 1.0)
+        self.assertEqual(report['stages']['publish']['count'], 1)
+
+    def test_timed_records_each_call(self):
+        @run_report.timed('mdx_write')
+        def write(value):
+            return value * 2
+
+        self.assertEqual(write(2), 4)
+        write(3)
+
+        self.assertEqual(len(run_report.take_samples()['mdx_write']), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+import json
+import os
+import tempfile
+import unittest
+
+import settings_snapshot
+from settings_snapshot import cached_file, get_site_settings, read_json
+
+
+class SettingsSnapshotTests(unittest.TestCase):
+    """Снимок перечитывает файл только при изменении mtime/размера."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, 'settings.json')
+        self.loads = 0
+
+        settings_snapshot.invalidate_snapshots()
+        self.addCleanup(settings_snapshot.invalidate_snapshots)
+        interval = settings_snapshot.SNAPSHOT_CHECK_INTERVAL
+        settings_snapshot.SNAPSHOT_CHECK_INTERVAL = 0
+        self.addCleanup(setattr, settings_snapshot, 'SNAPSHOT_CHECK_INTERVAL', interval)
+
+    def counting_loader(self, path):
+        self.loads += 1
+        return read_json(path)
+
+    def write_settings(self, data, mtime_ns):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def test_reads_file_once_while_unchanged(self):
+        self.write_settings({'legal_city': 'Самара'}, 1_000_000_000)
+
+        first = cached_file(self.path, self.counting_loader)
+        second = cached_file(self.path, self.counting_loader)
+
+        self.assertEqual(first, {'legal_city': 'Самара'})
+        self.assertIs(first, second)
+        self.assertEqual(self.loads, 1)
+
+    def test_rereads_file_after_change(self):
+        self.write_settings({'legal_city': 'Самара'}, 1_000_000_000)
+        cached_file(self.path, self.counting_loader)
+
+        self.write_settings({'legal_city': 'Тольятти'}, 2_000_000_000)
+
+        self.assertEqual(cached_file(self.path, self.counting_loader), {'legal_city': 'Тольятти'})
+        self.assertEqual(self.loads, 2)
+
+    def test_missing_file_and_site_settings_default(self):
+        self.assertIsNone(cached_file(self.path, self.counting_loader))
+        self.assertEqual(get_site_settings(self.path), {})
+        self.assertEqual(self.loads, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+from contextlib import redirect_stdout
+from io import StringIO
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+# utils сообщает о недостающих generated data через stdout при импорте.
+with redirect_stdout(StringIO()):
+    from utils import CarsXmlWriter
+
+
+class CarsXmlWriterTests(unittest.TestCase):
+    """Потоковая запись cars.xml должна совпадать с ElementTree.write."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.output_path = os.path.join(self.tmp_dir.name, 'cars.xml')
+
+    def make_car(self, vin, description):
+        car = ET.Element('car')
+        ET.SubElement(car, 'vin').text = vin
+        ET.SubElement(car, 'description').text = description
+        images = ET.SubElement(car, 'images')
+        ET.SubElement(images, 'image').text = 'https://example.ru/1.jpg?a=1&b=2'
+        return car
+
+    def element_tree_bytes(self, cars):
+        data_root = ET.Element('data')
+        cars_container = ET.SubElement(data_root, 'cars')
+        for car in cars:
+            cars_container.append(car)
+        path = os.path.join(self.tmp_dir.name, 'expected.xml')
+        ET.ElementTree(data_root).write(path, encoding='utf-8', xml_declaration=True)
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def read_output(self):
+        with open(self.output_path, 'rb') as f:
+            return f.read()
+
+    def test_matches_element_tree_write(self):
+        cars = [self.make_car('XW1', '<p>Кредит & "трейд-ин"</p>\nв наличии'), self.make_car('XW2', 'Белый')]
+        writer = CarsXmlWriter(self.output_path)
+        for car in cars:
+            writer.append(car)
+        writer.finish()
+
+        self.assertEqual(len(writer), 2)
+        self.assertEqual(self.read_output(), self.element_tree_bytes(cars))
+        self.assertFalse(os.path.exists(writer.temp_path))
+
+    def test_empty_list_matches_element_tree_write(self):
+        writer = CarsXmlWriter(self.output_path)
+        writer.finish()
+
+        self.assertEqual(self.read_output(), self.element_tree_bytes([]))
+
+    def test_discard_keeps_previous_file(self):
+        with open(self.output_path, 'w', encoding='utf-8') as f:
+            f.write('previous')
+
+        writer = CarsXmlWriter(self.output_path)
+        writer.append(self.make_car('XW1', 'Белый'))
+        writer.discard()
+
+        self.assertEqual(self.read_output(), b'previous')
+        self.assertFalse(os.path.exists(writer.temp_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+from contextlib import redirect_stdout
+from io import StringIO
+import unittest
+from unittest import mock
+
+# utils сообщает о недостающих generated data через stdout при импорте.
+with redirect_stdout(StringIO()):
+    import utils
+
+
+URL_TRANSLATIONS_BY_BRAND = {
+    'Geely': {
+        'престиж': 'prestige',
+        'люкс': 'lux',
+        'Coolray': {'Люкс': 'luxe', 'флагман': 'flagship'},
+    },
+    'geely': {'престиж': 'ignored'},
+    'Haval': 'не словарь',
+}
+
+
+class UrlOverrideTablesTests(unittest.TestCase):
+    """Таблицы переопределений перевода URL по бренду и модели из settings.json."""
+
+    def setUp(self):
+        self.tables = utils._build_url_override_tables(URL_TRANSLATIONS_BY_BRAND)
+
+    def test_model_overrides_extend_brand_overrides(self):
+        self.assertEqual(dict(self.tables['geely']['']), {'престиж': 'prestige', 'люкс': 'lux'})
+        self.assertEqual(
+            self.tables['geely']['coolray'],
+            (('престиж', 'prestige'), ('флагман', 'flagship'), ('люкс', 'luxe')),
+        )
+        self.assertNotIn('haval', self.tables)
+
+    def test_translation_is_cached_and_warning_repeated_per_vin(self):
+        patches = {
+            '_url_override_tables': self.tables,
+            '_url_override_replacers': {},
+            '_url_translation_cache': {},
+        }
+        with mock.patch.multiple(utils, **patches), mock.patch.object(utils, 'print_message') as print_message:
+            self.assertEqual(utils._translate_russian_in_url('Люкс престиж', 'GEELY', 'coolray'), 'luxe prestige')
+
+            with mock.patch.object(utils, '_resolve_russian_in_url', wraps=utils._resolve_russian_in_url) as resolve:
+                for vin in ('VIN1', 'VIN2'):
+                    self.assertEqual(utils._translate_russian_in_url('Гранд', 'Geely', 'Atlas', vin), 'Grand')
+                self.assertEqual(resolve.call_count, 1)
+
+        self.assertEqual(print_message.call_count, 2)
+        self.assertIn('<code>VIN2</code>', print_message.call_args.args[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
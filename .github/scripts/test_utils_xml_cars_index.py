@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+from contextlib import redirect_stdout
+from io import StringIO
+import os
+import tempfile
+import unittest
+
+# utils сообщает о недостающих generated data через stdout при импорте.
+with redirect_stdout(StringIO()):
+    from utils import build_xml_cars_index, iter_xml_cars
+
+
+class XmlCarsIndexTests(unittest.TestCase):
+    """Потоковый индекс машин должен давать то же, что полный разбор дерева."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def write_feed(self, content, encoding='utf-8'):
+        path = os.path.join(self.tmp_dir.name, 'feed.xml')
+        with open(path, 'wb') as f:
+            f.write(content.encode(encoding))
+        return path
+
+    def index(self, path, container_path, vin_tag='vin'):
+        with redirect_stdout(StringIO()):
+            return build_xml_cars_index(path, container_path, vin_tag)
+
+    def test_indexes_cars_inside_first_container(self):
+        path = self.write_feed(
+            '<?xml version="1.0" encoding="utf-8"?>'
+            '<data><cars><car><vin> B2 </vin><mark>Haval</mark></car><car><vin>A1</vin></car></cars>'
+            '<cars><car><vin>C3</vin></car></cars></data>'
+        )
+        encoding, index = self.index(path, ('cars',))
+
+        self.assertEqual(encoding, 'utf-8')
+        self.assertEqual([vin for vin, _start, _end in index], ['B2', 'A1'])
+        cars = [car.findtext('mark') for car in iter_xml_cars(path, encoding, index)]
+        self.assertEqual(cars, ['Haval', None])
+
+    def test_root_container_and_vin_text_before_nested_tag(self):
+        path = self.write_feed('<Ads><Ad><VIN>X1<b>tail</b>rest</VIN></Ad><Ad/><Ad><Id>1</Id></Ad></Ads>')
+        encoding, index = self.index(path, (), 'VIN')
+
+        self.assertIsNone(encoding)
+        self.assertEqual([vin for vin, _start, _end in index], ['X1', '', ''])
+        self.assertEqual([car.tag for car in iter_xml_cars(path, encoding, index)], ['Ad', 'Ad', 'Ad'])
+
+    def test_keeps_declared_single_byte_encoding(self):
+        path = self.write_feed(
+            '<?xml version="1.0" encoding="windows-1251"?>'
+            '<catalog><vehicles><vehicle><vin>Z9</vin><сomplectation-name>Комфорт</сomplectation-name></vehicle></vehicles></catalog>',
+            encoding='cp1251',
+        )
+        encoding, index = self.index(path, ('vehicles',))
+        car = next(iter_xml_cars(path, encoding, index))
+
+        self.assertEqual(car.findtext('сomplectation-name'), 'Комфорт')
+
+    def test_missing_container_gives_empty_index(self):
+        path = self.write_feed('<yml_catalog><shop><name>x</name></shop></yml_catalog>')
+        self.assertEqual(self.index(path, ('shop', 'offers'), None), (None, []))
+
+    def test_namespaced_or_broken_feed_is_not_streamable(self):
+        namespaced = self.write_feed('<data xmlns:a="urn:a"><cars><a:car><vin>1</vin></a:car></cars></data>')
+        self.assertIsNone(self.index(namespaced, ('cars',)))
+
+        broken = self.write_feed('<data><cars><car></cars></data>')
+        self.assertIsNone(self.index(broken, ('cars',)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,15 +3,112 @@ import os
 import json
 import argparse
 import glob
+import re
 import shutil
 from pathlib import Path
 from utils import *
+from settings_snapshot import get_site_settings
+from run_report import RUN_REPORT_PATH, merge_samples, stage, take_samples, write_run_report
+from reporter import detail, flush as flush_report, merge_report, print_summary, progress, take_report, tally
+from avito_photos import AvitoPhotosIndex
+from car_templates import compile_car_templates
+from car_spool import CarSpool, iter_spool, remove_spool
+from lookup_cache import DEFAULT_LOOKUP_NEGATIVE_TTL_HOURS, DEFAULT_LOOKUP_TTL_DAYS, LookupCache
+from cars_fingerprints import (
+    DEFAULT_MAX_AGE_HOURS,
+    FINGERPRINTS_PATH,
+    CarsFingerprintStore,
+    record_to_element,
+)
+from file_hashes import hash_file, hash_value
 import xml.etree.ElementTree as ET
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import requests
 
 TRUTHY_ENV_VALUES = {'1', 'true', 'yes', 'on'}
 AVAILABLE_CAR_VALUE = 'в наличии'
+# Размер пачки машин, отправляемой в процесс пула, и глубина очереди пачек на процесс
+PREPARE_BATCH_SIZE = 16
+PREPARE_BATCHES_PER_WORKER = 4
+# Поля car_data с ID справочников getAutocatalog (первое заполненное) и число потоков их предзагрузки
+LOOKUP_ID_FIELDS = {
+    'generation': ('GenerationId', 'generation_id', 'generationId'),
+    'modification': ('ModificationId', 'modification_id', 'modificationId'),
+    'complectation': ('ComplectationId', 'complectation_id', 'complectationId'),
+}
+LOOKUP_PREFETCH_WORKERS = 8
+# Параметры запуска, которые не влияют на содержимое MDX и cars.xml (--incremental)
+INCREMENTAL_IGNORED_CONFIG_KEYS = {
+    'workers', 'stream_xml', 'incremental', 'incremental_max_age_hours',
+    'lookup_cache_ttl_days', 'lookup_cache_negative_ttl_hours', 'run_report',
+    'legal_city', 'legal_city_where', 'auto_scan', 'base_dirs', 'xml_url',
+    'config_source', 'config_path', 'github_repo', 'github_path', 'gist_id',
+}
+# Хэш кода, каталога моделей и словаря локализации — считается один раз за запуск
+_incremental_static_hash: Optional[str] = None
+# Автоопределение типа фида: корневой тег → тип источника, файл читается кусками
+SOURCE_TYPE_SNIFF_CHUNK_SIZE = 8192
+SOURCE_TYPE_BY_ROOT_TAG = {
+    'data': 'data_cars_car',
+    'vehicles': 'vehicles_vehicle',
+    'catalog': 'catalog_vehicles_vehicle',
+    'carcopy': 'carcopy_offers_offer',
+    'yml_catalog': 'yml_catalog_shop_offers_offer',
+}
+# Параметры YML (<param name="...">) → внутренние имена и скидки из sales_notes
+YML_PARAM_MAPPING = {
+    'Год выпуска': 'year',
+    'Кузов': 'body_type',
+    'Руль': 'wheel',
+    'Цвет': 'color',
+    'ПТС': 'pts_type',
+    'Двигатель': 'engine_info',
+    'Привод': 'drive_type',
+    'КПП': 'gearbox_type',
+    'Поколение': 'generation',
+    'Модель': 'model_name'
+}
+YML_SALES_NOTES_PATTERNS = (
+    ('max_discount', re.compile(r'Максимальная скидка: (\d+)')),
+    ('tradein_discount', re.compile(r'trade-in до (\d+)')),
+    ('credit_discount', re.compile(r'в кредит до (\d+)')),
+    ('insurance_discount', re.compile(r'страховки до (\d+)')),
+)
+# Путь от корня до элемента со списком машин для потокового чтения (--stream_xml)
+# и автоопределения типа фида
+CARS_CONTAINER_PATHS = {
+    'data_cars_car': ('cars',),
+    'ads_ad': (),
+    'catalog_vehicles_vehicle': ('vehicles',),
+    'vehicles_vehicle': (),
+    'carcopy_offers_offer': ('offers',),
+    'yml_catalog_shop_offers_offer': ('shop', 'offers'),
+}
+
+
+def compile_extraction_plan(field_mapping: Dict[str, any]) -> Dict[str, any]:
+    """
+    Разворачивает field_mapping типа источника в план извлечения для extract_car_data:
+    поля в порядке маппинга с кортежем тегов-кандидатов (первый тег с текстом)
+    и настройки тегов изображений. Считается один раз в setup_source_config.
+    """
+    fields = []
+    for internal_name, xml_field in field_mapping.items():
+        # Пропускаем служебные поля, которые не являются XML тегами
+        if xml_field in ['image_tag', 'image_url_attr'] or xml_field is None:
+            continue
+        # поддержка одиночного имени тега или списка имён
+        tags = tuple(xml_field) if isinstance(xml_field, (list, tuple)) else (xml_field,)
+        fields.append((internal_name, tags))
+
+    return {
+        'fields': fields,
+        'image_tag': field_mapping.get('image_tag', 'image'),
+        'image_url_attr': field_mapping.get('image_url_attr'),
+    }
 
 
 class CarProcessor:
@@ -38,37 +135,16 @@ class CarProcessor:
             except Exception as e:
                 print(f"Произошла ошибка при работе с файлом: {e}")
         
-        self.dealer_photos_for_cars_avito = {}
-        if os.path.exists('./tmp/feeds/photos/dealer_photos_for_cars_avito.xml'):
-            try:
-                avito_root = get_xml_content('./tmp/feeds/photos/dealer_photos_for_cars_avito.xml', '')
-                for car in avito_root.findall('Ad'):
-                    vin = car.find('VIN').text
-                    self.dealer_photos_for_cars_avito[vin] = {
-                        'images': [],
-                        'description': ''
-                    }
-                    # Обработка изображений
-                    for image in car.find('Images').findall('Image'):
-                        self.dealer_photos_for_cars_avito[vin]['images'].append(image.get('url'))
-                    # Обработка описания
-                    description_elem = car.find('Description')
-                    if description_elem is not None and description_elem.text:
-                        # Извлекаем текст из CDATA
-                        description_text = description_elem.text
-                        if description_text.startswith('<![CDATA[') and description_text.endswith(']]>'):
-                            description_text = description_text[9:-3]  # Удаляем CDATA обертку
-                        self.dealer_photos_for_cars_avito[vin]['description'] = description_text
-            except json.JSONDecodeError:
-                print("Ошибка при чтении dealer_photos_for_cars_avito.xml")
-            except Exception as e:
-                print(f"Произошла ошибка при работе с файлом: {e}")
+        # Индекс фото дилера по VIN: XML разбирается лениво и кэшируется между запусками
+        self.dealer_photos_for_cars_avito = AvitoPhotosIndex()
 
         # --- Кэш и настройки для внешних запросов по ID ---
         # Задача: по числовым ID (generation/modification/complectation)
         # получить человекочитаемые значения из внешнего API и подставить в данные.
         self._lookup_cache: Dict[Tuple[str, str], Optional[str]] = {}
         self._lookup_base_url = "https://cdn.alexsab.ru/getAutocatalog/index.php"
+        # Дисковый кэш справочников между запусками, задаётся в main()
+        self.lookup_store: Optional[LookupCache] = None
 
         # --- Поля, требующие обязательной нормализации значений ---
         # Документируем: расширяем список по мере появления новых кейсов,
@@ -79,10 +155,23 @@ class CarProcessor:
 
         # Отложенные ошибки "не найден цвет" по итоговому файлу (friendly_url).
         # Нужны, чтобы не писать ложные ошибки, если позже в эту же карточку пришли фото.
-        self.pending_color_errors: Dict[str, str] = {}
+        self.pending_color_errors: Dict[str, Tuple[str, Tuple[str, ...]]] = {}
         self.friendly_url_has_images: Dict[str, bool] = {}
         self.reported_redirected_car_urls = set()
 
+        # Пул процессов (--workers) и незавершённые записи MDX по пути файла
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending_writes: Dict[str, any] = {}
+
+        # MDX групп friendly_url, ещё не записанные на диск: путь → (frontmatter, контент, префикс)
+        self._car_files: Dict[str, Tuple[Dict[str, any], str, str]] = {}
+
+        # Число машин в cars.xml за запуск (для отчёта о запуске)
+        self.processed_cars_count = 0
+
+        # Хранилище отпечатков машин (--incremental), задаётся в main()
+        self.fingerprints: Optional[CarsFingerprintStore] = None
+
     def setup_source_config(self):
         """Настройка конфигурации в зависимости от типа источника"""
         configs = {
@@ -339,6 +428,7 @@ class CarProcessor:
         self.config = configs.get(self.source_type)
         if not self.config:
             raise ValueError(f"Неизвестный тип источника: {self.source_type}")
+        self.extraction_plan = compile_extraction_plan(self.config['field_mapping'])
 
     def should_skip_car_for_availability(self, car: ET.Element) -> bool:
         """Проверяет доступность до полной обработки автомобиля."""
@@ -377,43 +467,17 @@ class CarProcessor:
             
         Returns:
             str: Определенный тип источника или None
+
+        Читает только начало файла инкрементальным парсером и останавливается,
+        как только структура однозначно совпала с одним из известных форматов.
+        Правила те же, что при разборе всего дерева: контейнер ищется в первом
+        подходящем элементе (root.find), иначе проверяется первый дочерний Ad.
         """
         try:
-            root = get_xml_content(xml_file_path, '')
-            root_tag = root.tag
-            
-            # Проверяем корневой элемент
-            if root_tag == 'data':
-                cars_elem = root.find('cars')
-                if cars_elem is not None:
-                    return 'data_cars_car'
-            
-            if root_tag == 'vehicles':
-                return 'vehicles_vehicle'
-            
-            if root_tag == 'catalog':
-                offers_elem = root.find('vehicles')
-                if offers_elem is not None:
-                    return 'catalog_vehicles_vehicle'
-                
-            if root_tag == 'carcopy':
-                offers_elem = root.find('offers')
-                if offers_elem is not None:
-                    return 'carcopy_offers_offer'
-            
-            if root_tag == 'yml_catalog':
-                shop_elem = root.find('shop')
-                if shop_elem is not None:
-                    offers_elem = shop_elem.find('offers')
-                    if offers_elem is not None:
-                        return 'yml_catalog_shop_offers_offer'
-            
-            # Проверяем структуру ads_ad
-            if len(root) > 0:
-                first_child = root[0]
-                if first_child.tag == 'Ad':
-                    return 'ads_ad'
-            
+            detected_type, root_tag = self._sniff_source_type(xml_file_path)
+            if detected_type:
+                return detected_type
+
             print(f"Предупреждение: Не удалось определить тип для файла {xml_file_path}, корневой элемент: {root_tag}")
             return None
             
@@ -421,6 +485,63 @@ class CarProcessor:
             print(f"Ошибка при автоопределении типа для {xml_file_path}: {e}")
             return None
 
+    def _sniff_source_type(self, xml_file_path: str) -> Tuple[Optional[str], Optional[str]]:
+        """Возвращает (тип источника или None, корневой тег), дочитывая файл только до решения."""
+        parser = ET.XMLPullParser(events=('start', 'end'))
+        depth = 0
+        root_tag = None
+        candidate_type = None
+        container_path = ()
+        matched = 0
+        first_child_tag = None
+
+        with open(xml_file_path, 'rb') as f:
+            while True:
+                chunk = f.read(SOURCE_TYPE_SNIFF_CHUNK_SIZE)
+                if chunk:
+                    parser.feed(chunk)
+                else:
+                    parser.close()
+
+                for event, elem in parser.read_events():
+                    if event == 'end':
+                        # Первый найденный элемент пути закрылся без нужного потомка
+                        if candidate_type and matched and depth == matched + 1:
+                            break
+                        if depth == 2:
+                            elem.clear()
+                        depth -= 1
+                        continue
+
+                    depth += 1
+                    if depth == 1:
+                        # Проверяем корневой элемент
+                        root_tag = elem.tag
+                        candidate_type = SOURCE_TYPE_BY_ROOT_TAG.get(root_tag)
+                        container_path = CARS_CONTAINER_PATHS.get(candidate_type, ())
+                        if candidate_type and not container_path:
+                            return candidate_type, root_tag
+                        continue
+
+                    if depth == 2 and first_child_tag is None:
+                        first_child_tag = elem.tag
+                        if candidate_type is None:
+                            break
+
+                    if candidate_type and depth == matched + 2 and elem.tag == container_path[matched]:
+                        matched += 1
+                        if matched == len(container_path):
+                            return candidate_type, root_tag
+                else:
+                    if chunk:
+                        continue
+                break
+
+        # Проверяем структуру ads_ad
+        if first_child_tag == 'Ad':
+            return 'ads_ad', root_tag
+        return None, root_tag
+
     def extract_car_data(self, car: ET.Element) -> Dict[str, any]:
         """
         Извлекает данные автомобиля из XML элемента согласно конфигурации.
@@ -431,47 +552,8 @@ class CarProcessor:
         Returns:
             Dict: Словарь с данными автомобиля
         """
-        car_data = {}
+        car_data = self.extract_mapped_fields(car)
 
-        # # 1. Сохраняем все поля из XML как есть
-        # for child in car:
-        #     if child.tag not in ['images', 'image', 'param']:  # обработаем их отдельно
-        #         if child.text:
-        #             car_data[child.tag] = child.text.strip()
-
-        # 2. Применяем field_mapping (перезаписываем нужные поля)
-        field_mapping = self.config['field_mapping']
-        
-        # Извлекаем основные поля
-        for internal_name, xml_field in field_mapping.items():
-            # Пропускаем служебные поля, которые не являются XML тегами
-            if xml_field in ['image_tag', 'image_url_attr'] or xml_field is None:
-                continue
-                
-            if internal_name == 'images':
-                # Особая обработка для изображений
-                images_container = car.find(xml_field)
-                if images_container is not None:
-                    car_data['images'] = self.extract_images(images_container)
-                else:
-                    car_data['images'] = []
-                continue
-                
-            # поддержка одиночного имени тега или списка имён
-            elem = None
-            if isinstance(xml_field, (list, tuple)):
-                # перебираем возможные варианты и берём первый найденный
-                for name in xml_field:
-                    candidate = car.find(name)
-                    if candidate is not None and candidate.text:
-                        elem = candidate
-                        break
-            else:
-                elem = car.find(xml_field)
-
-            if elem is not None and elem.text:
-                car_data[internal_name] = elem.text.strip()
-        
         # Обработка специальных случаев для разных форматов
         if self.source_type == 'yml_catalog':
             # В YML некоторые данные могут быть в параметрах
@@ -531,6 +613,35 @@ class CarProcessor:
         
         return car_data
 
+    def extract_mapped_fields(self, car: ET.Element) -> Dict[str, any]:
+        """
+        Поля машины по extraction_plan (без цветов и особых случаев форматов):
+        дети элемента обходятся один раз, для каждого тега берётся первый такой элемент.
+        """
+        children = {}
+        for child in car:
+            children.setdefault(child.tag, child)
+
+        car_data = {}
+        for internal_name, tags in self.extraction_plan['fields']:
+            if internal_name == 'images':
+                # Особая обработка для изображений
+                images_container = children.get(tags[0])
+                if images_container is not None:
+                    car_data['images'] = self.extract_images(images_container)
+                else:
+                    car_data['images'] = []
+                continue
+
+            # перебираем возможные варианты и берём первый с текстом
+            for tag in tags:
+                elem = children.get(tag)
+                if elem is not None and elem.text:
+                    car_data[internal_name] = elem.text.strip()
+                    break
+
+        return car_data
+
     def extract_images(self, images_container: ET.Element) -> List[str]:
         """
         Извлекает URL изображений из контейнера.
@@ -542,8 +653,8 @@ class CarProcessor:
             List[str]: Список URL изображений
         """
         images = []
-        image_tag = self.config['field_mapping'].get('image_tag', 'image')
-        image_url_attr = self.config['field_mapping'].get('image_url_attr')
+        image_tag = self.extraction_plan['image_tag']
+        image_url_attr = self.extraction_plan['image_url_attr']
         
         for img in images_container.findall(image_tag):
             if image_url_attr:
@@ -571,22 +682,9 @@ class CarProcessor:
         params = {}
         for param in car.findall('param'):
             name = param.get('name')
-            if name and param.text:
-                # Маппинг названий параметров на внутренние имена
-                param_mapping = {
-                    'Год выпуска': 'year',
-                    'Кузов': 'body_type',
-                    'Руль': 'wheel',
-                    'Цвет': 'color',
-                    'ПТС': 'pts_type',
-                    'Двигатель': 'engine_info',
-                    'Привод': 'drive_type',
-                    'КПП': 'gearbox_type',
-                    'Поколение': 'generation',
-                    'Модель': 'model_name'
-                }
-                if name in param_mapping:
-                    params[param_mapping[name]] = param.text.strip()
+            # Маппинг названий параметров на внутренние имена (YML_PARAM_MAPPING)
+            if name and param.text and name in YML_PARAM_MAPPING:
+                params[YML_PARAM_MAPPING[name]] = param.text.strip()
         
         # Генерируем VIN из доступных данных
         vendor = car.find('vendor')
@@ -604,49 +702,61 @@ class CarProcessor:
         # Извлекаем скидки из sales_notes
         sales_notes = car.find('sales_notes')
         if sales_notes is not None and sales_notes.text:
-            notes_text = sales_notes.text
-            # Парсим скидки из текста
-            import re
-            
-            # Ищем максимальную скидку
-            max_discount_match = re.search(r'Максимальная скидка: (\d+)', notes_text)
-            if max_discount_match:
-                params['max_discount'] = max_discount_match.group(1)
-            
-            # Ищем скидки по программам
-            tradein_match = re.search(r'trade-in до (\d+)', notes_text)
-            if tradein_match:
-                params['tradein_discount'] = tradein_match.group(1)
-            
-            credit_match = re.search(r'в кредит до (\d+)', notes_text)
-            if credit_match:
-                params['credit_discount'] = credit_match.group(1)
-            
-            insurance_match = re.search(r'страховки до (\d+)', notes_text)
-            if insurance_match:
-                params['insurance_discount'] = insurance_match.group(1)
+            # Ищем максимальную скидку и скидки по программам
+            for field, pattern in YML_SALES_NOTES_PATTERNS:
+                match = pattern.search(sales_notes.text)
+                if match:
+                    params[field] = match.group(1)
         
         return params
 
     def _fetch_lookup_value(self, kind: str, id_value: str) -> Optional[str]:
         """
-        Делает GET-запрос к справочнику (`kind` ∈ {generation, modification, complectation})
-        и возвращает человекочитаемое имя из атрибута `name` первого подходящего тега.
+        Имя из справочника (`kind` ∈ {generation, modification, complectation}) по ID.
 
-        Пример запроса:
-        - generation: https://cdn.alexsab.ru/getAutocatalog/index.php?lookup=1&type=generation&id=332036
-        - modification: https://cdn.alexsab.ru/getAutocatalog/index.php?lookup=1&type=modification&id=18488230
-        - complectation: https://cdn.alexsab.ru/getAutocatalog/index.php?lookup=1&type=complectation&id=18791852
-
-        Возвращаемое значение кэшируется по ключу (kind, id_value).
+        Возвращаемое значение кэшируется по ключу (kind, id_value); обычно кэш уже
+        заполнен prefetch_lookup_values до обработки машин.
         """
         if not id_value:
             return None
 
         cache_key = (kind, str(id_value))
-        if cache_key in self._lookup_cache:
-            return self._lookup_cache[cache_key]
+        if cache_key not in self._lookup_cache:
+            self._lookup_cache[cache_key] = self._load_lookup_value(*cache_key)
+        return self._lookup_cache[cache_key]
+
+    def _cached_lookup_value(self, kind: str, id_value: str) -> Tuple[bool, Optional[str]]:
+        """
+        Значение из дискового кэша справочников: (найдено, имя).
+        Устаревшая запись отдаётся сразу, а её обновление уходит в фон.
+        """
+        if self.lookup_store is None:
+            return False, None
+        found, name, stale = self.lookup_store.get(kind, id_value)
+        if stale:
+            self.lookup_store.refresh_in_background([(kind, id_value)], self._request_lookup_value)
+        return found, name
+
+    def _load_lookup_value(self, kind: str, id_value: str) -> Optional[str]:
+        found, name = self._cached_lookup_value(kind, id_value)
+        if found:
+            return name
+        ok, name = self._request_lookup_value(kind, id_value)
+        if ok and self.lookup_store is not None:
+            self.lookup_store.set(kind, id_value, name)
+        return name
+
+    def _request_lookup_value(self, kind: str, id_value: str, session=None) -> Tuple[bool, Optional[str]]:
+        """
+        Делает GET-запрос к справочнику и возвращает (ответ получен, имя): имя берётся
+        из атрибута `name` первого подходящего тега. При ошибке — (False, None).
+        Кэши не трогает, поэтому безопасен для вызова из потоков.
 
+        Пример запроса:
+        - generation: https://cdn.alexsab.ru/getAutocatalog/index.php?lookup=1&type=generation&id=332036
+        - modification: https://cdn.alexsab.ru/getAutocatalog/index.php?lookup=1&type=modification&id=18488230
+        - complectation: https://cdn.alexsab.ru/getAutocatalog/index.php?lookup=1&type=complectation&id=18791852
+        """
         try:
             params = {
                 'lookup': '1',
@@ -654,25 +764,73 @@ class CarProcessor:
                 'id': str(id_value)
             }
             # Делаем запрос к API с небольшим таймаутом.
-            resp = requests.get(self._lookup_base_url, params=params, timeout=7)
+            resp = (session or requests).get(self._lookup_base_url, params=params, timeout=7)
             resp.raise_for_status()
 
             # Пытаемся распарсить как XML и найти первый элемент с атрибутом name
             # Документация: пользователь сообщил, что нужное значение лежит в атрибуте name
             root = ET.fromstring(resp.content)
-            resolved_name: Optional[str] = None
             for elem in root.iter():
                 if 'name' in elem.attrib and elem.attrib['name']:
-                    resolved_name = elem.attrib['name'].strip()
-                    break
-
-            self._lookup_cache[cache_key] = resolved_name
-            return resolved_name
+                    return True, elem.attrib['name'].strip()
+            return True, None
         except Exception as e:
             # Логируем, но не прерываем обработку автомобиля
             print(f"[lookup:{kind}] Ошибка при запросе ID={id_value}: {e}")
-            self._lookup_cache[cache_key] = None
-            return None
+            return False, None
+
+    @staticmethod
+    def get_lookup_id(car_data: Dict[str, any], kind: str) -> Optional[str]:
+        """Числовой ID справочника `kind` из car_data (первое заполненное поле LOOKUP_ID_FIELDS) или None."""
+        for field in LOOKUP_ID_FIELDS[kind]:
+            value = car_data.get(field)
+            if value:
+                return str(value) if str(value).isdigit() else None
+        return None
+
+    def prefetch_lookup_values(self, cars) -> None:
+        """
+        Собирает ID справочников по всем машинам фида и заранее запрашивает их
+        параллельно (LOOKUP_PREFETCH_WORKERS потоков, общий requests.Session),
+        чтобы resolve_external_ids брал имена только из _lookup_cache.
+        ID из дискового кэша (lookup_store) не запрашиваются.
+        """
+        missing = {}
+        for car in cars:
+            if self.should_skip_car_for_availability(car):
+                continue
+            # ID справочников — обычные поля маппинга, цвета тут не нужны
+            car_data = self.extract_mapped_fields(car)
+            for kind in LOOKUP_ID_FIELDS:
+                id_value = self.get_lookup_id(car_data, kind)
+                if id_value and (kind, id_value) not in self._lookup_cache:
+                    missing[(kind, id_value)] = None
+
+        for key in list(missing):
+            found, name = self._cached_lookup_value(*key)
+            if found:
+                self._lookup_cache[key] = name
+                del missing[key]
+
+        if not missing:
+            return
+
+        print(f"🔎 Запрос справочников: {len(missing)} ID")
+        workers = min(LOOKUP_PREFETCH_WORKERS, len(missing))
+        fetched = {}
+        with requests.Session() as session:
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = pool.map(lambda key: self._request_lookup_value(*key, session=session), missing)
+                for key, (ok, name) in zip(missing, results):
+                    self._lookup_cache[key] = name
+                    if ok:
+                        fetched[key] = name
+
+        if fetched and self.lookup_store is not None:
+            self.lookup_store.set_many(fetched)
 
     def _maybe_update_year_from_generation_name(self, car_data: Dict[str, any], generation_name: str) -> None:
         """
@@ -705,56 +863,44 @@ class CarProcessor:
         Важно: вызывается ДО генерации friendly_url и расчёта цен.
         """
         # --- GenerationId → generation_name (+ попытка заполнить year) ---
-        gen_id = (
-            car_data.get('GenerationId')
-            or car_data.get('generation_id')
-            or car_data.get('generationId')
-        )
-        if gen_id and str(gen_id).isdigit():
-            gen_name = self._fetch_lookup_value('generation', str(gen_id))
+        gen_id = self.get_lookup_id(car_data, 'generation')
+        if gen_id:
+            gen_name = self._fetch_lookup_value('generation', gen_id)
             if gen_name:
                 car_data['generation_name'] = gen_name
                 # Попробуем аккуратно выставить year, если его нет или он не в формате года
                 self._maybe_update_year_from_generation_name(car_data, gen_name)
                 # Лог: показываем значение, которое записали
-                print(f"[GENERATION] GenerationId={gen_id} -> generation_name='{gen_name}'")
+                detail(f"[GENERATION] GenerationId={gen_id} -> generation_name='{gen_name}'")
             else:
                 # Лог: не нашли расшифровку
-                print(f"[GENERATION] GenerationId={gen_id} -> не найдено")
+                detail(f"[GENERATION] GenerationId={gen_id} -> не найдено")
 
         # --- ModificationId → modification_id (человекочитаемая строка) ---
-        mod_id = (
-            car_data.get('ModificationId')
-            or car_data.get('modification_id')
-            or car_data.get('modificationId')
-        )
-        if mod_id and str(mod_id).isdigit():
-            mod_name = self._fetch_lookup_value('modification', str(mod_id))
+        mod_id = self.get_lookup_id(car_data, 'modification')
+        if mod_id:
+            mod_name = self._fetch_lookup_value('modification', mod_id)
             if mod_name:
                 # Подменяем, чтобы URL и карточка имели читаемый текст
                 car_data['modification_id'] = mod_name
                 # Лог: показываем значение, которое записали
-                print(f"[MODIFICATION] ModificationId={mod_id} -> modification_id='{mod_name}'")
+                detail(f"[MODIFICATION] ModificationId={mod_id} -> modification_id='{mod_name}'")
             else:
                 # Лог: не нашли расшифровку
-                print(f"[MODIFICATION] ModificationId={mod_id} -> не найдено")
+                detail(f"[MODIFICATION] ModificationId={mod_id} -> не найдено")
 
         # --- ComplectationId → complectation_name ---
-        comp_id = (
-            car_data.get('ComplectationId')
-            or car_data.get('complectation_id')
-            or car_data.get('complectationId')
-        )
-        if comp_id and str(comp_id).isdigit():
-            comp_name = self._fetch_lookup_value('complectation', str(comp_id))
+        comp_id = self.get_lookup_id(car_data, 'complectation')
+        if comp_id:
+            comp_name = self._fetch_lookup_value('complectation', comp_id)
             if comp_name:
                 # Заполняем или подменяем значение имени комплектации
                 car_data['complectation_name'] = comp_name
                 # Лог: показываем значение, которое записали
-                print(f"[COMPLECTATION] ComplectationId={comp_id} -> complectation_name='{comp_name}'")
+                detail(f"[COMPLECTATION] ComplectationId={comp_id} -> complectation_name='{comp_name}'")
             else:
                 # Лог: не нашли расшифровку
-                print(f"[COMPLECTATION] ComplectationId={comp_id} -> не найдено")
+                detail(f"[COMPLECTATION] ComplectationId={comp_id} -> не найдено")
 
         return car_data
 
@@ -826,13 +972,14 @@ class CarProcessor:
         self.pending_color_errors[group_key] = (
             f"\nvin: <code>{vin}</code>\n"
             f"<b>Не найден цвет</b> <code>{color}</code> модели <code>{model}</code> бренда <code>{brand}</code> в layered model catalog\n"
-            f"<code>{friendly_url}</code>"
+            f"<code>{friendly_url}</code>",
+            ('Не найден цвет', brand, model, color),
         )
 
     def flush_deferred_color_errors(self) -> None:
         """Пишет накопленные ошибки цвета в output.txt после полной обработки всех машин."""
-        for error_text in self.pending_color_errors.values():
-            print_message(error_text, 'error')
+        for error_text, key in self.pending_color_errors.values():
+            print_message(error_text, 'error', key=key)
         self.pending_color_errors.clear()
 
     def calculate_max_discount(self, car_data: Dict[str, any]) -> int:
@@ -917,36 +1064,60 @@ class CarProcessor:
                 parts.append(value)
         return " ".join(parts)
 
-    def process_car(self, car: ET.Element, config: Dict) -> ET.Element:
-        """Обработка отдельного автомобиля"""
+    def prepare_car(self, car: ET.Element, config: Dict) -> Optional[Dict[str, any]]:
+        """
+        См. _prepare_car. Дополнительно собирает сообщения output.txt, записанные
+        при подготовке (prepared['messages']) — для инкрементального режима.
+        """
+        with capture_messages() as messages, stage('prepare_car'):
+            prepared = self._prepare_car(car, config)
+        if prepared is not None:
+            prepared['messages'] = messages
+        return prepared
+
+    def _prepare_car(self, car: ET.Element, config: Dict) -> Optional[Dict[str, any]]:
+        """
+        Подготовка автомобиля без побочных эффектов на общее состояние процессора:
+        извлечение данных, friendly_url, цены, шаблоны и описание для MDX.
+
+        Может выполняться в отдельном процессе (--workers), поэтому всё, что зависит
+        от порядка обработки (order, превью, агрегаты), делается в commit_car.
+
+        Returns:
+            Dict | None: подготовленные данные или None, если автомобиль пропущен
+        """
         if self.should_skip_car_for_availability(car):
             return None
 
         # Извлекаем данные автомобиля
-        car_data = self.extract_car_data(car)
+        with stage('extract'):
+            car_data = self.extract_car_data(car)
         
         # Обогащаем по внешним ID ДО генерации URL и расчётов
-        car_data = self.resolve_external_ids(car_data)
+        with stage('resolve_external_ids'):
+            car_data = self.resolve_external_ids(car_data)
 
         # Нормализуем заранее выбранные поля (начинаем с mark_id → нижний регистр).
         car_data = self.normalize_car_fields(car_data)
 
         # Проверяем наличие обязательных полей
         if not car_data.get('vin') or not car_data.get('mark_id') or not car_data.get('folder_id'):
-            print(car_data)
-            print(f"Пропущен автомобиль: отсутствуют обязательные поля VIN, mark_id или folder_id")
+            tally("Пропущено машин без VIN, mark_id или folder_id")
+            detail(car_data)
+            detail(f"Пропущен автомобиль: отсутствуют обязательные поля VIN, mark_id или folder_id")
             return None
         
         # Создание URL
-        friendly_url = process_friendly_url(
-            self.join_car_data_from_dict(car_data, 'mark_id', 'folder_id', 'generation', 'modification_id',
-                                 'complectation_name', 'color_eng', 'year'),
-            mark_id=car_data.get('mark_id'),
-            folder_id=car_data.get('folder_id'),
-            vin=car_data.get('vin'),
-            log_warnings=config.get('category_type') != 'used',
-        )
-        print(f"\n\n🆔 Уникальный идентификатор: {friendly_url}")
+        with stage('friendly_url'):
+            friendly_url = process_friendly_url(
+                self.join_car_data_from_dict(car_data, 'mark_id', 'folder_id', 'generation', 'modification_id',
+                                     'complectation_name', 'color_eng', 'year'),
+                mark_id=car_data.get('mark_id'),
+                folder_id=car_data.get('folder_id'),
+                vin=car_data.get('vin'),
+                log_warnings=config.get('category_type') != 'used',
+            )
+        detail(f"\n\n🆔 Уникальный идентификатор: {friendly_url}")
         
         # Получаем цену из car_data, если она есть, иначе используем 0
         price = to_int(car_data.get('price'))
@@ -985,24 +1156,11 @@ class CarProcessor:
         
         url = f"https://{config['domain']}{config['path_car_page']}{friendly_url}/"
         car_data['url'] = url
-        car_path = normalize_redirect_path(url)
-        redirect_target = get_redirect_target_for_car_url(car_path)
-        if redirect_target and car_path not in self.reported_redirected_car_urls:
-            self.reported_redirected_car_urls.add(car_path)
-            print_message(
-                "\n<b>Сгенерированный URL автомобиля попал в redirects routes.json</b>\n"
-                f"<code>{car_path}</code> → <code>{redirect_target}</code>\n"
-                f"VIN: <code>{car_data.get('vin')}</code>",
-                'error',
-            )
         
         # Обработка файла
         file_name = f"{friendly_url}.mdx"
         file_path = os.path.join(config['temp_cars_dir'], file_name)
 
-        # Проверяем ошибку "не найден цвет для заглушки" отложенно на уровне friendly_url.
-        self.register_deferred_color_error(car_data, file_path, friendly_url, ignore_feed_images=config.get('skip_thumbs', False))
-
         # Обновляем цены и скидки на основе car_data
         update_car_prices(
             car_data,
@@ -1010,8 +1168,7 @@ class CarProcessor:
             config.get('dealer_cars_price_override', False),
         )
 
-        # --- Формирование данных для JSON с ценами и скидками из фида ---
-        # Группировка и агрегация данных сразу в готовом формате
+        # Название модели из layered model catalog нужно и для шаблонов, и для JSON с ценами
         brand = car_data.get('mark_id', '')
         model_full = car_data.get('folder_id', '')
         log_errors = config.get('category_type') != 'used'
@@ -1019,50 +1176,90 @@ class CarProcessor:
         if not model is None:
             car_data['model_name'] = model
             car_data['model_id'] = get_model_info(brand, model_full, 'id', None, car_data.get('vin', ''), log_errors=log_errors)
-            key = (brand, model)
-            
-            if key in self.cars_price_data:
-                # Обновляем минимальную цену и максимальную скидку
-                self.cars_price_data[key]['price'] = min(self.cars_price_data[key]['price'], car_data['sale_price'])
-                self.cars_price_data[key]['benefit'] = max(self.cars_price_data[key]['benefit'], car_data['max_discount'])
-            else:
-                # Создаем новый объект в готовом для JSON формате
-                self.cars_price_data[key] = {
-                    'brand': brand,
-                    'model': model,
-                    'price': car_data['sale_price'],
-                    'benefit': car_data['max_discount']
-                }
-        # --- конец блока ---
 
         # Фоллбэк: если model_id не установлен (модель не найдена в layered model catalog),
         # генерируем его из folder_id через process_friendly_url
         if 'model_id' not in car_data:
             car_data['model_id'] = process_friendly_url(model_full)
 
-        # get info from ./src/data/site/settings.json
-        settings = {
-            'legal_city': 'Город',
-            'legal_city_where': 'Городе'
+        # get info from ./src/data/site/settings.json (снимок файла, а не чтение на каждую машину)
+        settings = get_site_settings()
+        config['legal_city'] = settings.get('legal_city', 'Город')
+        config['legal_city_where'] = settings.get('legal_city_where', 'Городе')
+
+        # Шаблоны frontmatter и описание для MDX зависят только от car_data,
+        # поэтому считаем их здесь, а не при записи файла
+        vin = car_data['vin']
+        description_for_content = car_data.get('description', '')
+        if (
+            vin in self.dealer_photos_for_cars_avito
+            and self.dealer_photos_for_cars_avito[vin]['description']
+            and not description_for_content
+        ):
+            description_for_content = self.dealer_photos_for_cars_avito[vin]['description']
+
+        with stage('templates'):
+            rendered = {
+                'h1': get_h1(car_data, config),
+                'breadcrumb': get_breadcrumb(car_data, config),
+                'title': get_title(car_data, config),
+                'description': get_description(car_data, config),
+                'content': process_description(description_for_content),
+            }
+
+        return {
+            'car_data': car_data,
+            'friendly_url': friendly_url,
+            'file_path': file_path,
+            'model_name': model,
+            'rendered': rendered,
         }
 
-        if os.path.exists('./src/data/site/settings.json'):
-            try:
-                with open('./src/data/site/settings.json', 'r', encoding='utf-8') as f:
-                    settings = json.load(f)
-            except json.JSONDecodeError:
-                print("Ошибка при чтении ./src/data/site/settings.json")
-            except Exception as e:
-                print(f"Произошла ошибка при работе с файлом: {e}")
+    def commit_car(self, prepared: Dict[str, any], config: Dict) -> ET.Element:
+        """
+        Вторая часть обработки автомобиля: всё, что зависит от порядка машин
+        (order, превью, агрегаты цен, запись MDX). Выполняется только в основном
+        процессе и строго в порядке VIN, чтобы результат совпадал с последовательным запуском.
+        """
+        car_data = prepared['car_data']
+        friendly_url = prepared['friendly_url']
+        file_path = prepared['file_path']
+        progress("Обработано машин")
 
-        config['legal_city'] = settings['legal_city']
-        config['legal_city_where'] = settings['legal_city_where']
+        car_path = normalize_redirect_path(car_data['url'])
+        redirect_target = get_redirect_target_for_car_url(car_path)
+        if redirect_target and car_path not in self.reported_redirected_car_urls:
+            self.reported_redirected_car_urls.add(car_path)
+            print_message(
+                "\n<b>Сгенерированный URL автомобиля попал в redirects routes.json</b>\n"
+                f"<code>{car_path}</code> → <code>{redirect_target}</code>\n"
+                f"VIN: <code>{car_data.get('vin')}</code>",
+                'error',
+            )
 
-        # Сохраняем или обновляем файл, теперь передаём car_data (dict), а не temp_car (XML)
-        if os.path.exists(file_path):
-            update_yaml(car_data, file_path, friendly_url, self.current_thumbs, self.sort_storage_data, self.dealer_photos_for_cars_avito, config, self.existing_files)
-        else:
-            create_file(car_data, file_path, friendly_url, self.current_thumbs, self.sort_storage_data, self.dealer_photos_for_cars_avito, config, self.existing_files)
+        # Проверяем ошибку "не найден цвет для заглушки" отложенно на уровне friendly_url.
+        self.register_deferred_color_error(car_data, file_path, friendly_url, ignore_feed_images=config.get('skip_thumbs', False))
+
+        # --- Формирование данных для JSON с ценами и скидками из фида ---
+        # Группировка и агрегация данных сразу в готовом формате
+        price_row = self.get_price_row(prepared)
+        if price_row is not None:
+            self.add_cars_price(*price_row)
+        # --- конец блока ---
+
+        # Собираем MDX группы в памяти: файл пишется один раз в flush_car_files(),
+        # а не перечитывается и переписывается на каждую машину с тем же friendly_url
+        with stage('mdx_merge'):
+            if file_path in self._car_files:
+                update_yaml(car_data, file_path, friendly_url, self.current_thumbs, self.sort_storage_data, self.dealer_photos_for_cars_avito, config, self.existing_files,
+                            rendered=prepared['rendered'], write_file=self._stage_car_file, loaded=self._car_files[file_path])
+            elif file_path in self._pending_writes or os.path.exists(file_path):
+                self._wait_for_pending_write(file_path)
+                update_yaml(car_data, file_path, friendly_url, self.current_thumbs, self.sort_storage_data, self.dealer_photos_for_cars_avito, config, self.existing_files,
+                            rendered=prepared['rendered'], write_file=self._stage_car_file)
+            else:
+                create_file(car_data, file_path, friendly_url, self.current_thumbs, self.sort_storage_data, self.dealer_photos_for_cars_avito, config, self.existing_files,
+                            rendered=prepared['rendered'], write_file=self._stage_car_file)
 
         if config.get('skip_thumbs'):
             car_data['images'] = []
@@ -1070,6 +1267,391 @@ class CarProcessor:
         # Возвращаем новый XML элемент в формате data_cars_car
         return self.create_car_element(car_data)
 
+    @staticmethod
+    def get_price_row(prepared: Dict[str, any]) -> Optional[list]:
+        """[brand, model, sale_price, max_discount] для dealer-models_cars_price.json или None."""
+        if prepared['model_name'] is None:
+            return None
+        car_data = prepared['car_data']
+        return [car_data.get('mark_id', ''), prepared['model_name'], car_data['sale_price'], car_data['max_discount']]
+
+    def add_cars_price(self, brand: str, model: str, price: int, benefit: int) -> None:
+        """Агрегирует минимальную цену и максимальную скидку по (brand, model)."""
+        key = (brand, model)
+
+        if key in self.cars_price_data:
+            # Обновляем минимальную цену и максимальную скидку
+            self.cars_price_data[key]['price'] = min(self.cars_price_data[key]['price'], price)
+            self.cars_price_data[key]['benefit'] = max(self.cars_price_data[key]['benefit'], benefit)
+        else:
+            # Создаем новый объект в готовом для JSON формате
+            self.cars_price_data[key] = {
+                'brand': brand,
+                'model': model,
+                'price': price,
+                'benefit': benefit
+            }
+
+    def process_car(self, car: ET.Element, config: Dict) -> ET.Element:
+        """Обработка отдельного автомобиля"""
+        prepared = self.prepare_car(car, config)
+        if prepared is None:
+            return None
+        return self.commit_car(prepared, config)
+
+    def process_cars(self, cars, config: Dict, remove_mark_ids: list, remove_folder_ids: list, workers: int = 1, output=None):
+        """
+        Обработка машин фида (см. _process_cars); время прохода — стадия process_cars.
+
+        output — куда добавлять готовые элементы машин (append): по умолчанию новый
+        список, CarsXmlWriter пишет каждую машину в файл сразу. Возвращается output.
+        """
+        processed_cars = [] if output is None else output
+        count_before = len(processed_cars)
+        with stage('process_cars'):
+            self._process_cars(cars, config, remove_mark_ids, remove_folder_ids, workers, processed_cars)
+        self.processed_cars_count += len(processed_cars) - count_before
+        return processed_cars
+
+    def commit_prepared_cars(self, prepared_cars: Iterable[Dict[str, any]], config: Dict, output=None):
+        """
+        Вторая половина process_cars для фида, подготовленного в пуле фидов
+        (--feed_workers): commit_car по машинам в порядке VIN и запись MDX.
+        """
+        processed_cars = [] if output is None else output
+        count_before = len(processed_cars)
+        with stage('process_cars'):
+            for prepared in prepared_cars:
+                processed_car = self.commit_car(prepared, config)
+                if processed_car is not None:
+                    processed_cars.append(processed_car)
+            self.flush_car_files()
+        self.processed_cars_count += len(processed_cars) - count_before
+        return processed_cars
+
+    def _process_cars(self, cars, config: Dict, remove_mark_ids: list, remove_folder_ids: list, workers: int, processed_cars) -> None:
+        """
+        Обрабатывает список автомобилей и добавляет элементы в формате data_cars_car
+        в processed_cars.
+
+        При workers > 1 подготовка машин (prepare_car) и сериализация MDX идут в пуле
+        процессов, а commit_car — в основном процессе в исходном порядке VIN, поэтому
+        cars_price_data, sort_storage_data, current_thumbs и итоговый XML совпадают
+        с последовательным запуском.
+        """
+        if iter(cars) is cars:
+            # Одноразовый итератор: машины проходим дважды (справочники, затем обработка)
+            cars = list(cars)
+
+        def kept_cars():
+            return (
+                car for car in cars
+                if not should_remove_car(car, remove_mark_ids, remove_folder_ids)
+            )
+
+        if self.fingerprints is not None:
+            self._process_cars_incremental(kept_cars(), config, workers, processed_cars)
+            return
+
+        with stage('lookup_prefetch'):
+            self.prefetch_lookup_values(kept_cars())
+
+        if workers <= 1:
+            for car in kept_cars():
+                # Обрабатываем автомобиль и получаем новый элемент в формате data_cars_car
+                processed_car = self.process_car(car, config)
+                if processed_car is not None:
+                    processed_cars.append(processed_car)
+            self.flush_car_files()
+            return
+
+        with self._car_pool(config, workers) as pool:
+            cars_xml = (ET.tostring(car, encoding='unicode') for car in kept_cars())
+            for prepared in self._iter_prepared_cars(pool, cars_xml, workers):
+                if prepared is None:
+                    continue
+                processed_car = self.commit_car(prepared, config)
+                if processed_car is not None:
+                    processed_cars.append(processed_car)
+            self.flush_car_files()
+
+    @contextmanager
+    def _car_pool(self, config: Dict, workers: int):
+        """Пул процессов для prepare_car и записи MDX (None при workers <= 1)."""
+        if workers <= 1:
+            yield None
+            return
+
+        print(f"⚙️ Параллельная обработка: {workers} процессов")
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_car_worker,
+            initargs=(self.source_type, config, self._lookup_cache),
+        ) as pool:
+            self._pool = pool
+            try:
+                yield pool
+                self._wait_for_pending_write()
+            finally:
+                self._pool = None
+
+    def _iter_prepared_cars(self, pool: ProcessPoolExecutor, cars_xml, workers: int):
+        """
+        Отдаёт результаты prepare_car в исходном порядке машин (машины — XML-строки).
+        В работе держим ограниченное число пачек, чтобы не сериализовать весь фид сразу.
+        """
+        in_flight = deque()
+        max_in_flight = workers * PREPARE_BATCHES_PER_WORKER
+        batch = []
+
+        for car_xml in cars_xml:
+            batch.append(car_xml)
+            if len(batch) < PREPARE_BATCH_SIZE:
+                continue
+            in_flight.append(pool.submit(_prepare_cars_in_worker, batch))
+            batch = []
+            while len(in_flight) >= max_in_flight:
+                yield from self._take_prepared_batch(in_flight.popleft())
+
+        if batch:
+            in_flight.append(pool.submit(_prepare_cars_in_worker, batch))
+        while in_flight:
+            yield from self._take_prepared_batch(in_flight.popleft())
+
+    @staticmethod
+    def _take_prepared_batch(future) -> List[Optional[Dict[str, any]]]:
+        prepared_cars, samples, worker_report = future.result()
+        merge_samples(samples)
+        merge_report(worker_report)
+        return prepared_cars
+
+    def _prepare_entries(self, pool: Optional[ProcessPoolExecutor], entries: List[Dict[str, any]], config: Dict, workers: int, spool: CarSpool) -> None:
+        """Готовит машины инкрементального режима (результат — в spool, см. _spool_prepared)."""
+        if pool is None:
+            prepared_cars = (self.prepare_car(ET.fromstring(spool.read(entry['xml'])), config) for entry in entries)
+        else:
+            prepared_cars = self._iter_prepared_cars(pool, (spool.read(entry['xml']) for entry in entries), workers)
+        for entry, prepared in zip(entries, prepared_cars):
+            self._spool_prepared(entry, prepared, spool)
+
+    @staticmethod
+    def _spool_prepared(entry: Dict[str, any], prepared: Optional[Dict[str, any]], spool: CarSpool) -> None:
+        """entry['prepared'] — смещение подготовленной машины в spool (None — машина пропущена), entry['file'] — имя её MDX."""
+        if prepared is None:
+            entry['prepared'] = entry['file'] = None
+        else:
+            entry['prepared'] = spool.append(prepared)
+            entry['file'] = os.path.basename(prepared['file_path'])
+
+    def get_incremental_environment(self, config: Dict) -> str:
+        """
+        Отпечаток всего, что влияет на результат помимо данных самой машины:
+        код скриптов, тип источника, настройки запуска и шаблоны, settings.json,
+        routes.json, словарь локализации и layered model catalog.
+        """
+        global _incremental_static_hash
+        if _incremental_static_hash is None:
+            scripts_dir = os.path.dirname(os.path.abspath(__file__))
+            # Все модули скриптов: логика результата разнесена по многим файлам (utils, шаблоны, frontmatter и т.д.)
+            _incremental_static_hash = hash_value({
+                'code': {
+                    name: hash_file(os.path.join(scripts_dir, name))
+                    for name in sorted(os.listdir(scripts_dir)) if name.endswith('.py')
+                },
+                'catalog': model_catalog.fingerprint(),
+                'translations': load_localized_value_translations(),
+            })
+
+        return hash_value({
+            'static': _incremental_static_hash,
+            'source_type': self.source_type,
+            'source_config': self.config,
+            'show_only_available_cars': self.show_only_available_cars,
+            'config': {key: value for key, value in config.items() if key not in INCREMENTAL_IGNORED_CONFIG_KEYS},
+            'settings': get_site_settings(),
+            'routes': hash_file('./src/data/site/routes.json'),
+        })
+
+    def get_car_fingerprint(self, car_xml: str, vin: str) -> str:
+        """Отпечаток машины: исходный XML и внешние данные по её VIN."""
+        return hash_value([
+            car_xml,
+            self.prices_data.get(vin),
+            self.dealer_photos_for_cars_avito.get(vin),
+            self.sort_storage_data.get(vin),
+        ])
+
+    def _process_cars_incremental(self, cars, config: Dict, workers: int, processed_cars) -> None:
+        """
+        process_cars для --incremental: группы (MDX-файлы), все машины которых не
+        изменились с прошлого запуска, берутся из хранилища отпечатков целиком,
+        остальные машины обрабатываются как обычно. Элементы машин — в processed_cars.
+
+        Группы видны только по всему фиду, поэтому XML и подготовленные машины
+        до сведения лежат во временном файле (CarSpool), а в памяти — VIN,
+        отпечаток и смещения: с --stream_xml память не растёт с размером фида.
+        """
+        spool = CarSpool()
+        try:
+            self._process_entries_incremental(cars, config, workers, processed_cars, spool)
+        finally:
+            spool.close()
+
+    def _process_entries_incremental(self, cars, config: Dict, workers: int, processed_cars, spool: CarSpool) -> None:
+        store = self.fingerprints
+        environment = self.get_incremental_environment(config)
+        vin_field = self.config['field_mapping'].get('vin')
+
+        entries = []
+        for car in cars:
+            vin_elem = car.find(vin_field) if vin_field else None
+            vin = vin_elem.text.strip() if vin_elem is not None and vin_elem.text else ""
+            car_xml = ET.tostring(car, encoding='unicode')
+            entries.append({
+                'xml': spool.append(car_xml),
+                'vin': vin,
+                'fingerprint': self.get_car_fingerprint(car_xml, vin),
+                'prepared': None,
+                'file': None,
+            })
+
+        reusable = store.find_reusable_groups(entries, environment, config['cars_dir'])
+        with stage('lookup_prefetch'):
+            self.prefetch_lookup_values(
+                ET.fromstring(spool.read(entry['xml'])) for entry in entries if entry['group'] not in reusable
+            )
+
+        with self._car_pool(config, workers) as pool:
+            self._prepare_entries(pool, [entry for entry in entries if entry['group'] not in reusable], config, workers, spool)
+
+            # Группа, в которую попала новая или изменённая машина, собирается заново целиком
+            touched_files = {entry['file'] for entry in entries if entry['prepared'] is not None}
+            rebuilt = {key for key in reusable if os.path.basename(key) in touched_files}
+            if rebuilt:
+                reusable -= rebuilt
+                self._prepare_entries(pool, [entry for entry in entries if entry['group'] in rebuilt], config, workers, spool)
+
+            reused_positions = {}
+            for entry in entries:
+                key = entry['group']
+                if key in reusable and key not in reused_positions:
+                    if self._reuse_group(key, config):
+                        reused_positions[key] = 0
+                    else:
+                        # order в группе разошёлся с прошлым запуском — собираем группу заново
+                        reusable.discard(key)
+                        for group_entry in entries:
+                            if group_entry['group'] == key:
+                                prepared = self.prepare_car(ET.fromstring(spool.read(group_entry['xml'])), config)
+                                self._spool_prepared(group_entry, prepared, spool)
+
+                if key in reused_positions:
+                    record = store.groups[key]
+                    processed_cars.append(record_to_element(record['xml'][reused_positions[key]]))
+                    reused_positions[key] += 1
+                    continue
+
+                if entry['prepared'] is not None:
+                    processed_cars.append(self._commit_tracked_car(entry, spool.read(entry['prepared']), environment, config))
+
+            self.flush_car_files()
+
+        print(f"♻️ Инкрементальный режим: без изменений {len(reused_positions)} групп, "
+              f"обработано {sum(1 for entry in entries if entry['group'] not in reused_positions)} машин")
+
+    def _reuse_group(self, key: str, config: Dict) -> bool:
+        """
+        Берёт группу из прошлого запуска: копирует опубликованный MDX во временную папку
+        и восстанавливает превью, цены, счётчик order и сообщения output.txt так,
+        как их дала бы обработка.
+        """
+        record = self.fingerprints.previous_groups[key]
+        temp_path = os.path.join(config['temp_cars_dir'], os.path.basename(key))
+        # Файл уже собран другим фидом этого запуска — копия прошлого MDX его бы затёрла
+        if key in self.fingerprints.groups or temp_path in self.existing_files:
+            return False
+
+        first_vin = record['cars'][0][0]
+        expected_order = None if first_vin in self.sort_storage_data else self.sort_storage_data.get('order', 0) + 1
+        if record.get('order') != expected_order:
+            return False
+
+        shutil.copyfile(key, temp_path)
+        if expected_order is not None:
+            self.sort_storage_data['order'] = expected_order
+        self.current_thumbs.extend(record['thumbs'])
+        for price_row in record['prices']:
+            if price_row is not None:
+                self.add_cars_price(*price_row)
+        self.existing_files.add(temp_path)
+        replay_messages(record['messages'])
+        if record['has_images']:
+            self.friendly_url_has_images[temp_path] = True
+        if record['color_error'] is not None:
+            error_text, error_key = record['color_error']
+            self.pending_color_errors[temp_path] = (error_text, tuple(error_key))
+
+        self.fingerprints.reuse_group(key, temp_path)
+        return True
+
+    def _commit_tracked_car(self, entry: Dict[str, any], prepared: Dict[str, any], environment: str, config: Dict) -> ET.Element:
+        """commit_car с записью результата машины в хранилище отпечатков."""
+        thumbs_before = len(self.current_thumbs)
+        order_before = self.sort_storage_data.get('order')
+
+        with capture_messages() as messages:
+            car_elem = self.commit_car(prepared, config)
+
+        order_after = self.sort_storage_data.get('order')
+        self.fingerprints.record_car(
+            CarsFingerprintStore.group_key(config['cars_dir'], prepared['file_path']),
+            prepared['file_path'],
+            environment,
+            entry['vin'],
+            entry['fingerprint'],
+            car_elem,
+            price_row=self.get_price_row(prepared),
+            thumbs=self.current_thumbs[thumbs_before:],
+            order=order_after if order_after != order_before else None,
+            messages=prepared['messages'] + messages,
+        )
+        return car_elem
+
+    def _stage_car_file(self, filename: str, data: Dict[str, any], body: str, prefix: str = '') -> None:
+        """
+        write_file для create_file/update_yaml: запоминает MDX группы в памяти до flush_car_files().
+        data — уже отдельная копия полей машины (create_file) или файла (update_yaml);
+        её значения только заменяются, а не меняются на месте, поэтому без deepcopy.
+        """
+        self._car_files[filename] = (data, body, prefix)
+
+    def flush_car_files(self) -> None:
+        """Записывает MDX групп, изменённых с прошлого сброса (каждый файл — один раз)."""
+        with stage('mdx_flush'):
+            self._flush_car_files()
+
+    def _flush_car_files(self) -> None:
+        # Записанная группа в памяти больше не нужна: следующая машина с тем же
+        # friendly_url (другой фид) прочитает MDX с диска в commit_car
+        for filename, car_file in self._car_files.items():
+            self._write_car_file(filename, *car_file)
+        self._car_files.clear()
+
+    def _write_car_file(self, filename: str, data: Dict[str, any], body: str, prefix: str = '') -> None:
+        """Пишет MDX сразу или отдаёт сериализацию YAML в пул процессов (--workers)."""
+        if self._pool is None:
+            write_car_file(filename, data, body, prefix)
+            return
+        self._pending_writes[filename] = self._pool.submit(_write_car_file_in_worker, filename, data, body, prefix)
+
+    def _wait_for_pending_write(self, filename: Optional[str] = None) -> None:
+        """Дожидается записи файла (или всех файлов, если filename не указан)."""
+        filenames = [filename] if filename else list(self._pending_writes)
+        for name in filenames:
+            future = self._pending_writes.pop(name, None)
+            if future is not None:
+                merge_samples(future.result())
+
     def get_cars_element(self, root: ET.Element) -> ET.Element:
         """Получение элемента, содержащего список машин"""
         if self.source_type == 'data_cars_car':
@@ -1088,6 +1670,53 @@ class CarProcessor:
                 return shop.find('offers')
         return root
 
+    def get_cars_container_path(self) -> Tuple[str, ...]:
+        """Путь от корня до элемента со списком машин (то же, что get_cars_element, но без дерева)."""
+        return CARS_CONTAINER_PATHS.get(self.source_type, ())
+
+    def stream_sorted_cars(self, xml_file_path: str):
+        """
+        Потоковое чтение фида: строит индекс (VIN, смещение) без полного дерева и
+        отдаёт машины по одному в порядке sort_cars_by_vin.
+
+        Returns:
+            Итератор элементов машин или None, если файл нельзя читать по кускам
+        """
+        xml_index = build_xml_cars_index(
+            xml_file_path,
+            self.get_cars_container_path(),
+            self.config['field_mapping'].get('vin'),
+        )
+        if xml_index is None:
+            return None
+
+        encoding, cars_index = xml_index
+        # sort стабильный, поэтому порядок машин с одинаковым VIN — как в файле
+        cars_index.sort(key=lambda item: item[0])
+        print(f"📋 Отсортировано {len(cars_index)} автомобилей по VIN (потоковое чтение)")
+        return XmlCarsStream(xml_file_path, encoding, cars_index)
+
+    def load_sorted_cars(self, xml_file_path: str, xml_url: Optional[str], stream: bool = False):
+        """
+        Загружает машины фида, отсортированные по VIN.
+
+        При stream=True локальный файл читается потоково (stream_sorted_cars),
+        иначе — целиком через get_xml_content.
+
+        Returns:
+            Итерируемые элементы машин или None, если XML получить не удалось
+        """
+        if stream and os.path.exists(xml_file_path):
+            sorted_cars = self.stream_sorted_cars(xml_file_path)
+            if sorted_cars is not None:
+                return sorted_cars
+            print(f"⚠️ Потоковое чтение недоступно для {xml_file_path}, читаю файл целиком")
+
+        root = get_xml_content(xml_file_path, xml_url)
+        if root is None:
+            return None
+        return self.sort_cars_by_vin(self.get_cars_element(root))
+
     def sort_cars_by_vin(self, cars_element: ET.Element) -> List[ET.Element]:
         """
         Сортирует элементы автомобилей по VIN.
@@ -1128,6 +1757,114 @@ class CarProcessor:
         self.source_type = new_source_type
         self.setup_source_config()
 
+# --- Пул процессов для --workers ---
+# Каждый процесс держит свой CarProcessor: prepare_car не трогает общее состояние,
+# а всё зависящее от порядка машин остаётся в основном процессе (commit_car).
+_worker_processor: Optional[CarProcessor] = None
+_worker_config: Optional[Dict] = None
+
+
+def _init_car_worker(source_type: str, config: Dict, lookup_cache: Dict[Tuple[str, str], Optional[str]]) -> None:
+    global _worker_processor, _worker_config
+    _worker_processor = CarProcessor()
+    _worker_processor.update_source_type(source_type)
+    _worker_processor._lookup_cache.update(lookup_cache)
+    _worker_config = config
+    # При fork процесс наследует замеры и сообщения основного процесса — их там уже учли
+    take_samples()
+    take_report()
+
+
+def _prepare_cars_in_worker(cars_xml: List[str]) -> Tuple[List[Optional[Dict[str, any]]], Dict[str, List[float]], Dict[str, any]]:
+    prepared_cars = [
+        _worker_processor.prepare_car(ET.fromstring(car_xml), _worker_config)
+        for car_xml in cars_xml
+    ]
+    # Замеры стадий и сообщения для output.txt возвращаем вместе с результатом
+    # (см. run_report и reporter)
+    return prepared_cars, take_samples(), take_report()
+
+
+def _write_car_file_in_worker(filename: str, data: Dict[str, any], body: str, prefix: str) -> Dict[str, List[float]]:
+    write_car_file(filename, data, body, prefix)
+    return take_samples()
+
+
+# --- Пул фидов для --feed_workers (режим автосканирования) ---
+# Процесс пула целиком разбирает и готовит свой фид (load_sorted_cars, справочники,
+# prepare_car), а основной процесс сводит результаты: commit_car по фидам в исходном
+# порядке, поэтому cars_price_data, current_thumbs, sort_storage и MDX групп,
+# общих для нескольких фидов, совпадают с последовательным запуском.
+def _init_feed_worker() -> None:
+    global _worker_processor
+    _worker_processor = CarProcessor()
+    take_samples()
+    take_report()
+
+
+def _prepare_feed_in_worker(feed: Dict[str, any]) -> Tuple[Optional[str], Dict[str, List[float]], Dict[str, any]]:
+    """
+    Файл CarSpool с подготовленными машинами фида (None, если XML получить не удалось),
+    замеры стадий и сообщения. Машины пишутся в файл по одной, а не собираются в список.
+    """
+    processor = _worker_processor
+    processor.update_source_type(feed['source_type'])
+    with stage('load_feed'):
+        sorted_cars = processor.load_sorted_cars(feed['xml_file_path'], feed['xml_url'], stream=feed['stream_xml'])
+    if sorted_cars is None:
+        return None, take_samples(), take_report()
+
+    def kept_cars():
+        # Машины проходим дважды (справочники, затем подготовка); при потоковом
+        # чтении элемент очищается после шага, поэтому каждый раз — новый проход
+        return (
+            car for car in sorted_cars
+            if not should_remove_car(car, feed['remove_mark_ids'], feed['remove_folder_ids'])
+        )
+
+    processor.lookup_store = LookupCache(**feed['lookup_cache'])
+    try:
+        with stage('lookup_prefetch'):
+            processor.prefetch_lookup_values(kept_cars())
+        spool = CarSpool(named=True)
+        try:
+            for car in kept_cars():
+                prepared = processor.prepare_car(car, feed['config'])
+                if prepared is not None:
+                    spool.append(prepared)
+        except BaseException:
+            spool.close()
+            raise
+    finally:
+        processor.lookup_store.close()
+        processor.lookup_store = None
+    return spool.detach(), take_samples(), take_report()
+
+
+def prepare_feeds_in_pool(feeds: List[Dict[str, any]], feed_workers: int):
+    """
+    Отдаёт результаты _prepare_feed_in_worker в порядке feeds, пока пул готовит
+    остальные фиды: общее время — примерно время самого долгого фида.
+    """
+    print(f"⚙️ Параллельная обработка фидов: {feed_workers} процессов")
+    with ProcessPoolExecutor(max_workers=feed_workers, initializer=_init_feed_worker) as pool:
+        futures = deque(pool.submit(_prepare_feed_in_worker, feed) for feed in feeds)
+        try:
+            while futures:
+                spool_path, samples, worker_report = futures.popleft().result()
+                merge_samples(samples)
+                merge_report(worker_report)
+                # Машины читаются из файла по одной во время commit_prepared_cars
+                yield None if spool_path is None else iter_spool(spool_path)
+        finally:
+            # Прерванный запуск: файлы несведённых фидов не оставляем на диске
+            for future in futures:
+                future.cancel()
+            for future in futures:
+                if not future.cancelled() and future.exception() is None and future.result()[0] is not None:
+                    remove_spool(future.result()[0])
+
+
 def find_xml_files(base_dir: str) -> List[Tuple[str, str, str]]:
     """
     Находит все XML файлы в подпапках базовой директории.
@@ -1222,6 +1959,53 @@ def main():
         help='Delay between mirrored image downloads in seconds',
     )
     parser.add_argument('--mirror_dry_run', action="store_true", help='Build image mirror manifest without writing image files')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=(get_env_value('UPDATE_CARS_WORKERS') or 1),
+        help='Number of worker processes for car preparation and MDX serialization (1 = serial)',
+    )
+    parser.add_argument(
+        '--feed_workers',
+        type=int,
+        default=(get_env_value('UPDATE_CARS_FEED_WORKERS') or 1),
+        help='Number of worker processes that parse and prepare auto-scan feeds in parallel (1 = one feed at a time)',
+    )
+    parser.add_argument(
+        '--stream_xml',
+        action="store_true",
+        default=str(get_env_value('UPDATE_CARS_STREAM_XML', '')).strip().lower() in TRUTHY_ENV_VALUES,
+        help='Read local feeds car by car via a (VIN, byte offset) index instead of a full XML tree',
+    )
+    parser.add_argument(
+        '--incremental',
+        action="store_true",
+        default=str(get_env_value('UPDATE_CARS_INCREMENTAL', '')).strip().lower() in TRUTHY_ENV_VALUES,
+        help=f'Reuse unchanged MDX groups from the previous run (fingerprints in {FINGERPRINTS_PATH})',
+    )
+    parser.add_argument(
+        '--incremental_max_age_hours',
+        type=float,
+        default=(get_env_value('UPDATE_CARS_INCREMENTAL_MAX_AGE_HOURS') or DEFAULT_MAX_AGE_HOURS),
+        help='Reprocess groups whose fingerprints are older than this, so image checks are refreshed',
+    )
+    parser.add_argument(
+        '--lookup_cache_ttl_days',
+        type=float,
+        default=(get_env_value('UPDATE_CARS_LOOKUP_CACHE_TTL_DAYS') or DEFAULT_LOOKUP_TTL_DAYS),
+        help='Days before a cached autocatalog lookup is refreshed in the background',
+    )
+    parser.add_argument(
+        '--lookup_cache_negative_ttl_hours',
+        type=float,
+        default=(get_env_value('UPDATE_CARS_LOOKUP_CACHE_NEGATIVE_TTL_HOURS') or DEFAULT_LOOKUP_NEGATIVE_TTL_HOURS),
+        help='Hours to cache autocatalog lookups that returned no name',
+    )
+    parser.add_argument(
+        '--run_report',
+        default=(get_env_value('UPDATE_CARS_RUN_REPORT') or RUN_REPORT_PATH),
+        help='Path of the JSON run report with per-stage timings (empty = do not write)',
+    )
     parser.add_argument('--count_thumbs', default=5, help='Count thumbs for create')
     parser.add_argument('--image_tag', default='image', help='Image tag name')
     parser.add_argument('--description_tag', default='description', help='Description tag name')
@@ -1238,6 +2022,10 @@ def main():
     
     args = parser.parse_args()
     config = vars(args)
+    workers = max(1, args.workers)
+    feed_workers = max(1, args.feed_workers)
+    # Готовые MDX-описания переиспользуются между машинами и запусками
+    open_description_cache()
 
     default_config = {
         "move_vin_id_up": 0,
@@ -1275,6 +2063,9 @@ def main():
         
         # Пробуем автоопределить тип для первого файла
         processor = CarProcessor()
+        processor.lookup_store = LookupCache(ttl_days=args.lookup_cache_ttl_days, negative_ttl_hours=args.lookup_cache_negative_ttl_hours)
+        if args.incremental:
+            processor.fingerprints = CarsFingerprintStore(max_age_hours=args.incremental_max_age_hours)
         
         # Словарь конфигураций для разных типов категорий
         category_configs = {
@@ -1313,12 +2104,10 @@ def main():
             os.makedirs(temp_thumbs_dir, exist_ok=True)
             print(f"   Создана временная папка превью: {temp_thumbs_dir}")
         
-        # Группируем обработанные автомобили по категориям
-        processed_cars_by_category = {'new': [], 'used': []}
-        
         # output.txt is initialized by the workflow step
 
-        # Обрабатываем каждый файл
+        # Сначала определяем тип и конфигурацию каждого файла, затем обрабатываем их
+        feeds = []
         for xml_file_path, folder_name, category_type in all_xml_files:
             print(f"\n\n🚗 Обработка файла: {xml_file_path}")
             print(f"📂 Папка: {folder_name}, Категория: {category_type}")
@@ -1371,59 +2160,96 @@ def main():
             current_config['breadcrumb_template'] = source_config.get('breadcrumb_template', '')
             current_config['title_template'] = source_config.get('title_template', '')
             current_config['description_template'] = source_config.get('description_template', '')
-                        
-            # Инициализация XML
-            root = get_xml_content(xml_file_path, args.xml_url)
-            if root is None:
-                print(f"[update_cars.py] Не удалось получить XML для файла {xml_file_path}. Пропускаю этот файл.")
-                continue  # Пропускаем обработку этого файла
-
-            # Настройка директорий для текущей категории
-            if not os.path.exists(current_config['thumbs_dir']):
-                os.makedirs(current_config['thumbs_dir'])
+            # Шаблоны разбираются один раз; ошибка в шаблоне останавливает запуск до обработки машин
+            compile_car_templates(current_config)
+
+            feeds.append({
+                'xml_file_path': xml_file_path,
+                'category_type': category_type,
+                'source_type': source_type,
+                'config': current_config,
+                'remove_mark_ids': remove_mark_ids,
+                'remove_folder_ids': remove_folder_ids,
+                'xml_url': args.xml_url,
+                'stream_xml': args.stream_xml,
+                'lookup_cache': {
+                    'ttl_days': args.lookup_cache_ttl_days,
+                    'negative_ttl_hours': args.lookup_cache_negative_ttl_hours,
+                },
+            })
+
+        # Фиды разбираются и готовятся параллельно, а сводятся (commit_car, агрегаты,
+        # MDX) в основном процессе в исходном порядке файлов. В инкрементальном режиме
+        # подготовка зависит от отпечатков, поэтому фиды идут последовательно.
+        prepared_feeds = None
+        if feed_workers > 1 and len(feeds) > 1:
+            if args.incremental:
+                print("⚠️ --feed_workers не используется вместе с --incremental, фиды обрабатываются последовательно")
+            else:
+                prepared_feeds = prepare_feeds_in_pool(feeds, min(feed_workers, len(feeds)))
+
+        # Машины каждой категории сразу пишутся в её XML (временный файл до finish)
+        cars_xml_writers = {
+            category_type: CarsXmlWriter(category_config['output_path'])
+            for category_type, category_config in category_configs.items()
+        }
+        try:
+            for feed in feeds:
+                xml_file_path = feed['xml_file_path']
+                current_config = feed['config']
+                print(f"\n🚗 Машины файла: {xml_file_path}")
+                processor.update_source_type(feed['source_type'])
+
+                # Инициализация XML
+                if prepared_feeds is not None:
+                    prepared_cars = next(prepared_feeds)
+                    feed_loaded = prepared_cars is not None
+                else:
+                    with stage('load_feed'):
+                        sorted_cars = processor.load_sorted_cars(xml_file_path, args.xml_url, stream=args.stream_xml)
+                    feed_loaded = sorted_cars is not None
+                if not feed_loaded:
+                    print(f"[update_cars.py] Не удалось получить XML для файла {xml_file_path}. Пропускаю этот файл.")
+                    continue  # Пропускаем обработку этого файла
+
+                # Настройка директорий для текущей категории
+                if not os.path.exists(current_config['thumbs_dir']):
+                    os.makedirs(current_config['thumbs_dir'])
             
-            if not os.path.exists(current_config['cars_dir']):
-                os.makedirs(current_config['cars_dir'])
+                if not os.path.exists(current_config['cars_dir']):
+                    os.makedirs(current_config['cars_dir'])
 
 
-            # Обработка машин
-            cars_element = processor.get_cars_element(root)
-            if cars_element is not None:
-                # Сортируем автомобили по VIN для стабильной обработки
-                sorted_cars = processor.sort_cars_by_vin(cars_element)
-                for car in sorted_cars:
-                    if should_remove_car(car, remove_mark_ids, remove_folder_ids):
-                        continue
-                    
-                    # Обрабатываем автомобиль и получаем новый элемент в формате data_cars_car
-                    processed_car = processor.process_car(car, current_config)
-                    if processed_car is not None:
-                        processed_cars_by_category[category_type].append(processed_car)
-        
-        # Создаем объединенные XML файлы по категориям в формате data_cars_car
+                # Обработка машин (отсортированы по VIN для стабильной обработки)
+                cars_xml_writer = cars_xml_writers[feed['category_type']]
+                if prepared_feeds is not None:
+                    processor.commit_prepared_cars(prepared_cars, current_config, output=cars_xml_writer)
+                else:
+                    processor.process_cars(sorted_cars, current_config, feed['remove_mark_ids'], feed['remove_folder_ids'], workers=workers, output=cars_xml_writer)
+        except BaseException:
+            for cars_xml_writer in cars_xml_writers.values():
+                cars_xml_writer.discard()
+            raise
+
+        # Публикуем объединенные XML файлы по категориям в формате data_cars_car
         for category_type in ['new', 'used']:
-            if processed_cars_by_category[category_type]:
-                # Получаем конфигурацию для категории из словаря
-                category_config = category_configs[category_type]
-                output_path = category_config['output_path']
-                thumbs_dir = category_config['thumbs_dir']
-                
-                # Создаем корневую структуру data_cars_car
-                data_root = ET.Element('data')
-                cars_container = ET.SubElement(data_root, 'cars')
-                
-                # Добавляем все обработанные автомобили
-                for car_elem in processed_cars_by_category[category_type]:
-                    cars_container.append(car_elem)
-                
-                # Сохраняем XML
-                convert_to_string(data_root)
-                tree = ET.ElementTree(data_root)
-                tree.write(output_path, encoding='utf-8', xml_declaration=True)
-                print(f"✅ Сохранен объединенный XML для категории {category_type}: {output_path}")
-                
-                # Очистка превью для категории
-                cleanup_unused_thumbs(processor.current_thumbs, thumbs_dir)
+            cars_xml_writer = cars_xml_writers[category_type]
+            if not len(cars_xml_writer):
+                cars_xml_writer.discard()
+                continue
+
+            # Получаем конфигурацию для категории из словаря
+            category_config = category_configs[category_type]
+            output_path = category_config['output_path']
+            thumbs_dir = category_config['thumbs_dir']
+
+            # Сохраняем XML
+            with stage('xml_write'):
+                cars_xml_writer.finish()
+            print(f"✅ Сохранен объединенный XML для категории {category_type}: {output_path}")
+
+            # Очистка превью для категории
+            cleanup_unused_thumbs(processor.current_thumbs, thumbs_dir)
         
         # Перенос содержимого из временных папок в основные папки для каждой категории
         print("\n\n📁 Перенос файлов из временных папок в основные...")
@@ -1432,23 +2258,10 @@ def main():
             temp_cars_dir = category_config['temp_cars_dir']
             cars_dir = category_config['cars_dir']
             
-            if os.path.exists(temp_cars_dir) and os.listdir(temp_cars_dir):
-                # Удаляем старое содержимое папки cars_dir
-                if os.path.exists(cars_dir):
-                    shutil.rmtree(cars_dir)
-                    print(f"   Удалено старое содержимое: {cars_dir}")
-                
-                # Создаем папку cars_dir заново
-                os.makedirs(cars_dir, exist_ok=True)
-                
-                # Копируем все файлы из temp_cars_dir в cars_dir
-                for file_name in os.listdir(temp_cars_dir):
-                    src_file = os.path.join(temp_cars_dir, file_name)
-                    dst_file = os.path.join(cars_dir, file_name)
-                    shutil.copy2(src_file, dst_file)
-                    print(f"   Скопирован файл: {file_name}")
-                
-                print(f"✅ Перенесено {len(os.listdir(temp_cars_dir))} файлов для категории {category_type}")
+            with stage('publish'):
+                counts = publish_cars_dir(temp_cars_dir, cars_dir)
+            if counts is not None:
+                print(f"✅ {cars_dir} для категории {category_type}: {format_publish_counts(counts)}")
             else:
                 print(f"⚠️ Временная папка {temp_cars_dir} пуста или не существует для категории {category_type}")
         
@@ -1490,9 +2303,13 @@ def main():
         config['breadcrumb_template'] = source_config.get('breadcrumb_template', '')
         config['title_template'] = source_config.get('title_template', '')
         config['description_template'] = source_config.get('description_template', '')
+        compile_car_templates(config)
 
         # Инициализация процессора для конкретного источника
         processor = CarProcessor()
+        processor.lookup_store = LookupCache(ttl_days=args.lookup_cache_ttl_days, negative_ttl_hours=args.lookup_cache_negative_ttl_hours)
+        if args.incremental:
+            processor.fingerprints = CarsFingerprintStore(max_age_hours=args.incremental_max_age_hours)
         detected_type = processor.auto_detect_source_type(args.input_file)
         if detected_type:
             processor.update_source_type(detected_type)
@@ -1502,8 +2319,9 @@ def main():
             processor.update_source_type(args.source_type)
         
         # Инициализация
-        root = get_xml_content(args.input_file, args.xml_url)
-        if root is None:
+        with stage('load_feed'):
+            sorted_cars = processor.load_sorted_cars(args.input_file, args.xml_url, stream=args.stream_xml)
+        if sorted_cars is None:
             print(f"[update_cars.py] Не удалось получить XML для файла {args.input_file}. Завершаю выполнение.")
             return  # Завершаем выполнение функции
 
@@ -1517,36 +2335,22 @@ def main():
         # Очистка директории для временных файлов
         if os.path.exists(config['temp_cars_dir']):
             shutil.rmtree(config['temp_cars_dir'])
-            os.makedirs(config['temp_cars_dir'])
+        os.makedirs(config['temp_cars_dir'], exist_ok=True)
         
         # output.txt is initialized by the workflow step
 
-        processed_cars = []
-        
-        # Обработка машин
-        cars_element = processor.get_cars_element(root)
-        # Сортируем автомобили по VIN для стабильной обработки
-        sorted_cars = processor.sort_cars_by_vin(cars_element)
-        for car in sorted_cars:
-            if should_remove_car(car, remove_mark_ids, remove_folder_ids):
-                continue
-            
-            # Обрабатываем автомобиль и получаем новый элемент в формате data_cars_car
-            processed_car = processor.process_car(car, config)
-            if processed_car is not None:
-                processed_cars.append(processed_car)
-        
-        # Создаем новую структуру в формате data_cars_car
-        data_root = ET.Element('data')
-        cars_container = ET.SubElement(data_root, 'cars')
-        
-        # Добавляем все обработанные автомобили
-        for car_elem in processed_cars:
-            cars_container.append(car_elem)
-        
-        convert_to_string(data_root)
-        tree = ET.ElementTree(data_root)
-        tree.write(args.output_path, encoding='utf-8', xml_declaration=True)
+
+        # Обработка машин (отсортированы по VIN для стабильной обработки);
+        # каждая машина сразу пишется в XML в формате data_cars_car
+        cars_xml_writer = CarsXmlWriter(args.output_path)
+        try:
+            processor.process_cars(sorted_cars, config, remove_mark_ids, remove_folder_ids, workers=workers, output=cars_xml_writer)
+        except BaseException:
+            cars_xml_writer.discard()
+            raise
+
+        with stage('xml_write'):
+            cars_xml_writer.finish()
         
         # Очистка превью
         cleanup_unused_thumbs(processor.current_thumbs, config['thumbs_dir'])
@@ -1556,27 +2360,19 @@ def main():
         temp_cars_dir = config['temp_cars_dir']
         cars_dir = config['cars_dir']
         
-        if os.path.exists(temp_cars_dir) and os.listdir(temp_cars_dir):
-            # Удаляем старое содержимое папки cars_dir
-            if os.path.exists(cars_dir):
-                shutil.rmtree(cars_dir)
-                print(f"   Удалено старое содержимое: {cars_dir}")
-            
-            # Создаем папку cars_dir заново
-            os.makedirs(cars_dir, exist_ok=True)
-            
-            # Копируем все файлы из temp_cars_dir в cars_dir
-            for file_name in os.listdir(temp_cars_dir):
-                src_file = os.path.join(temp_cars_dir, file_name)
-                dst_file = os.path.join(cars_dir, file_name)
-                shutil.copy2(src_file, dst_file)
-                print(f"   Скопирован файл: {file_name}")
-            
-            print(f"✅ Перенесено {len(os.listdir(temp_cars_dir))} файлов")
+        with stage('publish'):
+            counts = publish_cars_dir(temp_cars_dir, cars_dir)
+        if counts is not None:
+            print(f"✅ {cars_dir}: {format_publish_counts(counts)}")
         else:
             print(f"⚠️ Временная папка {temp_cars_dir} пуста или не существует")
     
+    processor.lookup_store.close()
+    close_description_cache()
+    if processor.fingerprints is not None:
+        processor.fingerprints.save(processor.pending_color_errors, processor.friendly_url_has_images)
     processor.flush_deferred_color_errors()
+    flush_report()
 
     if os.path.exists('output.txt') and os.path.getsize('output.txt') > 0:
         print("❌ Найдены ошибки 404")
@@ -1588,5 +2384,14 @@ def main():
         json.dump(sorted_cars_price_data, f, ensure_ascii=False, indent=2)
     # --- конец блока ---
 
+    print_summary()
+    write_run_report(args.run_report, {
+        'mode': 'auto_scan' if args.auto_scan else 'single',
+        'workers': workers,
+        'feed_workers': feed_workers,
+        'incremental': args.incremental,
+        'cars': processor.processed_cars_count,
+    })
+
 if __name__ == "__main__":
     main()
@@ -163,8 +163,7 @@ def main():
     if root is None:
         warning_msg = f"⚠️ Не удалось получить XML для {args.input_file}. Обработка {args.source_type} пропущена."
         print(warning_msg)
-        with open('output.txt', 'a', encoding='utf-8') as file:
-            file.write(f"{warning_msg}\n")
+        report(warning_msg)
         return
 
     tree = ET.ElementTree(root)
@@ -4,7 +4,6 @@ import re
 import copy
 import string
 import hashlib
-import yaml
 import json
 import shutil
 import requests
@@ -13,9 +12,18 @@ from PIL import Image, ImageOps
 from io import BytesIO
 import urllib.parse
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from xml.parsers import expat
 from functools import lru_cache
 from config import *
+from settings_snapshot import cached_file, get_site_settings, read_json
+from file_hashes import hash_file
+from run_report import timed
+from reporter import detail, report, tally
+from pattern_replacer import PatternReplacer
+from mdx_description import DESCRIPTION_CACHE_PATH, DescriptionCache, simple_html_to_string
+from frontmatter_io import dump_frontmatter, load_frontmatter
+from car_templates import get_template_renderer
 from bs4 import BeautifulSoup
 
 
@@ -32,43 +40,20 @@ CYRILLIC_TO_LATIN = {
 
 def _load_site_settings():
     """Загружает итоговый settings.json и возвращает словари переводов."""
-    settings_path = Path('./src/data/site/settings.json')
-    try:
-        with open(settings_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except Exception:
-        data = {}
+    data = get_site_settings()
     return (
         data.get('url_translations', {}),
         data.get('url_translations_by_brand', {}),
     )
 
 
-def _build_complectation_translation_map():
-    """Строит словарь {русское_название_lower: английское_название}
-    из layered-каталога моделей (уже загружен в config.py)."""
-    trans = {}
-    for model in model_catalog_data:
-        for comp in model.get('complectations', []):
-            caption = comp.get('displayName') or comp.get('caption', '')
-            name = comp.get('name', '')
-            if not caption or not name:
-                continue
-            # caption формата "Русское / English" или "Русское - English"
-            for sep in (' / ', ' - '):
-                if sep in caption:
-                    rus_part = caption.split(sep, 1)[0].strip()
-                    if rus_part and re.search(r'[а-яёА-ЯЁ]', rus_part):
-                        trans[rus_part.lower()] = name
-                    break
-    return trans
-
-
 # Загружаем один раз при старте
 _url_translations, _url_translations_by_brand = _load_site_settings()
-_complectation_map = _build_complectation_translation_map()
+# Словарь комплектаций собран вместе с каталогом (config.py, снимок каталога)
+_complectation_map = complectation_translation_map
 # Сортируем по длине (самые длинные первые) для корректной замены
 _complectation_sorted = sorted(_complectation_map.items(), key=lambda x: len(x[0]), reverse=True)
+_complectation_replacer = PatternReplacer(_complectation_sorted)
 
 
 def _has_cyrillic(text):
@@ -132,21 +117,20 @@ def translate_field_for_url(value, field_name, mark_id=None, folder_id=None, vin
     return _translate_russian_in_url(value, mark_id, folder_id, vin, log_warnings)
 
 
+# Таблица для str.translate: строчные и заглавные буквы (заглавные — в верхнем регистре)
+_TRANSLITERATION_TABLE = str.maketrans({
+    **CYRILLIC_TO_LATIN,
+    **{rus.upper(): lat.upper() for rus, lat in CYRILLIC_TO_LATIN.items()},
+})
+
+
 def _transliterate(text):
     """Транслитерация кириллицы в латиницу."""
-    result = []
-    for ch in text:
-        lower = ch.lower()
-        if lower in CYRILLIC_TO_LATIN:
-            mapped = CYRILLIC_TO_LATIN[lower]
-            result.append(mapped.upper() if ch.isupper() else mapped)
-        else:
-            result.append(ch)
-    return ''.join(result)
+    return text.translate(_TRANSLITERATION_TABLE)
 
 
-def _get_brand_model_overrides(mark_id, folder_id):
-    """Собирает переопределения для конкретного бренда/модели.
+def _build_url_override_tables(url_translations_by_brand):
+    """Собирает переопределения перевода для URL по бренду и модели.
 
     Структура url_translations_by_brand:
     {
@@ -159,30 +143,55 @@ def _get_brand_model_overrides(mark_id, folder_id):
     }
 
     Приоритет: модель > бренд (модельные переопределения перезаписывают брендовые).
-    """
-    if not mark_id or not _url_translations_by_brand:
-        return {}
 
-    brand_key = mark_id.lower()
-    overrides = {}
-
-    for cfg_brand, cfg_value in _url_translations_by_brand.items():
-        if cfg_brand.lower() != brand_key or not isinstance(cfg_value, dict):
+    Returns:
+        dict: { brand_lower: { '': брендовые, model_lower: брендовые + модельные } },
+        каждое значение — упорядоченный по длине ключа кортеж пар (слово, перевод)
+    """
+    tables = {}
+    for cfg_brand, cfg_value in (url_translations_by_brand or {}).items():
+        brand_key = cfg_brand.lower()
+        # Берётся первый подходящий бренд, как и раньше
+        if brand_key in tables or not isinstance(cfg_value, dict):
             continue
+
         # Собираем строковые значения — это брендовые переводы
+        brand_overrides = {k.lower(): v for k, v in cfg_value.items() if isinstance(v, str)}
+        model_overrides = {}
         for k, v in cfg_value.items():
-            if isinstance(v, str):
-                overrides[k.lower()] = v
-        # Если есть модельные переопределения — они перезаписывают
-        if folder_id:
-            model_key = folder_id.lower()
-            for k, v in cfg_value.items():
-                if isinstance(v, dict) and k.lower() == model_key:
-                    for mk, mv in v.items():
-                        overrides[mk.lower()] = mv
-        break
+            if isinstance(v, dict):
+                # Модельные переопределения перезаписывают брендовые
+                overrides = model_overrides.setdefault(k.lower(), dict(brand_overrides))
+                for mk, mv in v.items():
+                    overrides[mk.lower()] = mv
+
+        tables[brand_key] = {
+            model_key: tuple(sorted(overrides.items(), key=lambda x: len(x[0]), reverse=True))
+            for model_key, overrides in {'': brand_overrides, **model_overrides}.items()
+        }
+    return tables
+
+
+_url_override_tables = _build_url_override_tables(_url_translations_by_brand)
+# Автоматы замен по (brand_lower, model_lower) — строятся при первом обращении
+_url_override_replacers = {}
+
+
+def _get_brand_model_replacer(mark_id, folder_id):
+    """PatternReplacer переопределений бренда/модели (пустой, если их нет)."""
+    brand_key = mark_id.lower() if mark_id else ''
+    model_key = folder_id.lower() if folder_id else ''
+    key = (brand_key, model_key)
+    replacer = _url_override_replacers.get(key)
+    if replacer is None:
+        tables = _url_override_tables.get(brand_key, {}) if brand_key else {}
+        pairs = tables.get(model_key, tables.get('', ())) if model_key else tables.get('', ())
+        replacer = _url_override_replacers[key] = PatternReplacer(pairs)
+    return replacer
 
-    return overrides
+
+# (text, mark_id, folder_id) → (перевод, непереведённые слова или None)
+_url_translation_cache = {}
 
 
 def _translate_russian_in_url(text, mark_id=None, folder_id=None, vin=None, log_warnings=True):
@@ -196,10 +205,34 @@ def _translate_russian_in_url(text, mark_id=None, folder_id=None, vin=None, log_
     4. Аббревиатуры из url_translations (settings.json)
     5. Логирование непереведённых слов
     6. Транслитерация оставшейся кириллицы
+
+    Перевод запоминается по (text, mark_id, folder_id); предупреждение о
+    непереведённых словах пишется для каждого вызова со своим VIN.
     """
     if not _has_cyrillic(text):
         return text
 
+    cache_key = (text, mark_id, folder_id)
+    cached = _url_translation_cache.get(cache_key)
+    if cached is None:
+        cached = _url_translation_cache[cache_key] = _resolve_russian_in_url(text, mark_id, folder_id)
+    text, cyrillic_words = cached
+
+    # 5. Логируем, если после всех замен остались кириллические слова
+    if log_warnings and cyrillic_words is not None:
+        print_message(
+            f"\nvin: <code>{vin}</code>\n"
+            f"<b>Не найден перевод для URL</b>: <code>{', '.join(cyrillic_words)}</code> "
+            f"модели <code>{folder_id or '?'}</code> бренда <code>{mark_id or '?'}</code>",
+            'warning',
+            key=('Не найден перевод для URL', ', '.join(cyrillic_words), mark_id, folder_id),
+        )
+
+    return text
+
+
+def _resolve_russian_in_url(text, mark_id, folder_id):
+    """Шаги 1–4 и 6 _translate_russian_in_url: (перевод, слова для предупреждения или None)."""
     # 1. Паттерн «цифраХцифра» — русская Х → латинская x
     text = re.sub(r'(\d)[хХ](\d)', r'\1x\2', text)
 
@@ -207,24 +240,13 @@ def _translate_russian_in_url(text, mark_id=None, folder_id=None, vin=None, log_
     text = re.sub(r'л\.с([.)])', r'h.p\1', text, flags=re.IGNORECASE)
 
     # 2. Бренд/модель переопределения (высший приоритет)
-    brand_overrides = _get_brand_model_overrides(mark_id, folder_id)
-    if brand_overrides:
-        brand_sorted = sorted(brand_overrides.items(), key=lambda x: len(x[0]), reverse=True)
-        text_lower = text.lower()
-        for rus, eng in brand_sorted:
-            idx = text_lower.find(rus)
-            if idx != -1:
-                text = text[:idx] + eng + text[idx + len(rus):]
-                text_lower = text.lower()
+    brand_replacer = _get_brand_model_replacer(mark_id, folder_id)
+    if brand_replacer:
+        text = brand_replacer.replace(text)
 
     # 3. Комплектации из layered-каталога моделей (базовый словарь, для оставшейся кириллицы)
     if _has_cyrillic(text):
-        text_lower = text.lower()
-        for rus, eng in _complectation_sorted:
-            idx = text_lower.find(rus)
-            if idx != -1:
-                text = text[:idx] + eng + text[idx + len(rus):]
-                text_lower = text.lower()
+        text = _complectation_replacer.replace(text)
 
     # 4. Пословная замена аббревиатур из settings.json
     if _has_cyrillic(text):
@@ -233,27 +255,27 @@ def _translate_russian_in_url(text, mark_id=None, folder_id=None, vin=None, log_
             return _url_translations.get(w_lower, m.group(0))
         text = re.sub(r'[а-яёА-ЯЁ]+', _replace_abbrev, text)
 
-    # 5. Логируем, если после всех замен остались кириллические слова
-    if log_warnings and _has_cyrillic(text):
+    # 5. Непереведённые слова (предупреждение пишет _translate_russian_in_url)
+    cyrillic_words = None
+    if _has_cyrillic(text):
         cyrillic_words = [w for w in text.split() if _has_cyrillic(w)]
-        print_message(
-            f"\nvin: <code>{vin}</code>\n"
-            f"<b>Не найден перевод для URL</b>: <code>{', '.join(cyrillic_words)}</code> "
-            f"модели <code>{folder_id or '?'}</code> бренда <code>{mark_id or '?'}</code>",
-            'warning',
-        )
 
     # 6. Транслитерация оставшейся кириллицы
     if _has_cyrillic(text):
         text = _transliterate(text)
 
-    return text
+    return text, cyrillic_words
 
 
 def process_friendly_url(friendly_url, replace="-", mark_id=None, folder_id=None, vin=None, log_warnings=True):
     # Перевод кириллицы на английский / латиницу
     # friendly_url = _translate_russian_in_url(friendly_url, mark_id, folder_id, vin, log_warnings)
+    # (переводятся отдельные поля в translate_field_for_url, здесь — только очистка)
+    return _clean_friendly_url(friendly_url, replace)
 
+
+@lru_cache(maxsize=65536)
+def _clean_friendly_url(friendly_url, replace):
     # Удаление специальных символов
     processed_id = re.sub(r'[\/\\?%*:|"<>.,;\'\[\]()&]', '', friendly_url)
 
@@ -286,11 +308,15 @@ def format_html_for_mdx(raw_html):
     - Добавляет пробелы между тегами
     - Добавляет переносы между списками и жирным текстом
     """
-    # Проверяем корректность HTML с помощью BeautifulSoup
-    soup = BeautifulSoup(raw_html, "html.parser")
-    
-    # Получаем HTML без форматирования (сохраняет &nbsp;)
-    html_output = str(soup)
+    # Простой HTML (теги без атрибутов, правильная вложенность) сериализуем за один проход
+    # с тем же результатом, что у BeautifulSoup; остальное — через BeautifulSoup
+    html_output = simple_html_to_string(raw_html)
+    if html_output is None:
+        # Проверяем корректность HTML с помощью BeautifulSoup
+        soup = BeautifulSoup(raw_html, "html.parser")
+
+        # Получаем HTML без форматирования (сохраняет &nbsp;)
+        html_output = str(soup)
 
     # ВАЖНО: MDX воспринимает одиночную звёздочку '*' как начало курсива.
     # Это приводит к ошибкам парсинга ("Expected closing </p>...") в наших <p>..
@@ -341,6 +367,29 @@ def format_html_for_mdx(raw_html):
     return html_output
 
 
+# Дисковый кэш готовых описаний (mdx_description.DescriptionCache), задаётся в update_cars.main()
+_description_cache = None
+
+
+def open_description_cache(path=DESCRIPTION_CACHE_PATH):
+    """Включает кэш описаний; версия — код форматирования и версия BeautifulSoup."""
+    global _description_cache
+    import bs4
+
+    scripts_dir = os.path.dirname(os.path.abspath(__file__))
+    version = hash_file(os.path.join(scripts_dir, 'utils.py')) + hash_file(os.path.join(scripts_dir, 'mdx_description.py')) + bs4.__version__
+    _description_cache = DescriptionCache(version, path)
+    # До запуска пулов: воркеры только подключаются к готовому файлу
+    _description_cache.prepare()
+
+
+def close_description_cache():
+    global _description_cache
+    if _description_cache is not None:
+        _description_cache.close()
+        _description_cache = None
+
+
 # Helper function to process description and add it to the body
 def process_description(desc_text):
     """
@@ -355,7 +404,12 @@ def process_description(desc_text):
     """
     if not desc_text:
         return ""
-    
+    if _description_cache is not None:
+        return _description_cache.get_or_format(desc_text, _format_description)
+    return _format_description(desc_text)
+
+
+def _format_description(desc_text):
     pretty_html = format_html_for_mdx(desc_text)
     # Разбиваем результат на строки
     lines = pretty_html.split('\n')
@@ -539,7 +593,7 @@ def _get_color_fallback_image(brand, model, color, vin, skip_check_thumb):
         f"<pre>{color_image}</pre>\n"
         f"<code>{inspection['error']}</code>"
     )
-    print_message(error_text, "error")
+    print_message(error_text, "error", key=('Не удалось найти заглушку цвета модели', color_image))
     return DEFAULT_CAR_IMAGE
 
 
@@ -586,6 +640,7 @@ def _filter_mirror_cdn_image_urls(image_urls, config):
     ]
 
 
+@timed('images')
 def _apply_car_images_to_data(data, incoming_images, friendly_url, current_thumbs, config, vin, brand=None, model=None, color=None):
     if config.get('skip_thumbs'):
         data['images'] = []
@@ -741,11 +796,14 @@ def createThumbs(image_urls, friendly_url, current_thumbs, thumbs_dir, temp_thum
                 resized_image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
                 resized_image.save(output_path, "WEBP")
                 if version_token is None and file_exists:
-                    print(f"   ♻️ Обновлено превью без HTTP-валидаторов: {relative_output_path}")
+                    tally("Превью обновлено без HTTP-валидаторов")
+                    detail(f"   ♻️ Обновлено превью без HTTP-валидаторов: {relative_output_path}")
                 else:
-                    print(f"   ✅ Создано превью: {relative_output_path}")
+                    tally("Превью создано")
+                    detail(f"   ✅ Создано превью: {relative_output_path}")
             else:
-                print(f"   ⚠️ Файл уже существует: {relative_output_path} или пропущен флагом skip_thumbs: {skip_thumbs}")
+                tally("Превью уже есть или пропущено (skip_thumbs)")
+                detail(f"   ⚠️ Файл уже существует: {relative_output_path} или пропущен флагом skip_thumbs: {skip_thumbs}")
 
             # Добавление относительного пути файла в списки
             new_or_existing_files.append(relative_output_path)
@@ -763,7 +821,57 @@ def cleanup_unused_thumbs(current_thumbs, thumbs_dir):
 
     for thumb in unused_thumbs:
         os.remove(thumb)
-        print(f"Удалено неиспользуемое превью: {thumb}")
+        tally("Удалено неиспользуемых превью")
+        detail(f"Удалено неиспользуемое превью: {thumb}")
+
+
+def publish_cars_dir(temp_cars_dir: str, cars_dir: str) -> Optional[Dict[str, int]]:
+    """
+    Переносит собранные MDX из temp_cars_dir в cars_dir по разнице содержимого:
+    пишет только новые и изменённые файлы, удаляет только исчезнувшие.
+    Неизменённые файлы не трогаем (mtime остаётся прежним).
+
+    Если temp_cars_dir пуста или её нет — cars_dir не трогаем и возвращаем None.
+    """
+    if not os.path.isdir(temp_cars_dir) or not os.listdir(temp_cars_dir):
+        return None
+
+    os.makedirs(cars_dir, exist_ok=True)
+    new_names = set(os.listdir(temp_cars_dir))
+    counts = {'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 0}
+
+    for name in os.listdir(cars_dir):
+        if name in new_names:
+            continue
+        live_path = os.path.join(cars_dir, name)
+        if os.path.isdir(live_path) and not os.path.islink(live_path):
+            shutil.rmtree(live_path)
+        else:
+            os.remove(live_path)
+        counts['removed'] += 1
+
+    for name in sorted(new_names):
+        src_file = os.path.join(temp_cars_dir, name)
+        dst_file = os.path.join(cars_dir, name)
+        if os.path.isfile(dst_file):
+            if os.path.getsize(src_file) == os.path.getsize(dst_file) and hash_file(src_file) == hash_file(dst_file):
+                counts['unchanged'] += 1
+                continue
+            counts['changed'] += 1
+        else:
+            if os.path.isdir(dst_file):
+                shutil.rmtree(dst_file)
+            counts['added'] += 1
+        shutil.copy2(src_file, dst_file)
+
+    return counts
+
+
+def format_publish_counts(counts: Dict[str, int]) -> str:
+    return (
+        f"добавлено {counts['added']}, изменено {counts['changed']}, "
+        f"удалено {counts['removed']}, без изменений {counts['unchanged']}"
+    )
 
 
 # используется в air
@@ -935,10 +1043,9 @@ def avitoColor(color):
     if normalized_color in mapping:
         return mapping[normalized_color].capitalize()
     else:
-        # Логирование ошибки в файл
+        # Логирование ошибки в output.txt (один раз на цвет)
         error_text = f"Не удается обработать цвет для Avito: <code>{color}</code>"
-        with open('output.txt', 'a') as file:
-            file.write(f"{error_text}\n")
+        report(error_text, key=('Не удается обработать цвет для Avito', normalized_color))
         return color  # Возвращаем оригинальный ключ, если он не найден
 
 
@@ -1101,7 +1208,7 @@ def update_car_prices(car_data: dict, prices_data: Dict[str, Dict[str, int]], ov
     if not vin:
         print("Ключ 'vin' отсутствует или пустой в car_data")
         return
-    print(f"🔑 Обрабатываю автомобиль с VIN: {vin}")
+    detail(f"🔑 Обрабатываю автомобиль с VIN: {vin}")
 
     # Получаем текущую цену со скидкой
     try:
@@ -1169,6 +1276,214 @@ def get_xml_content(filename: str, xml_url: str) -> ET.Element:
         return None
 
 
+def build_xml_cars_index(
+    filename: str,
+    container_path: Tuple[str, ...],
+    vin_tag: Optional[str],
+) -> Optional[Tuple[Optional[str], List[Tuple[str, int, int]]]]:
+    """
+    Строит лёгкий индекс машин фида без построения дерева: (VIN, начало, конец) в байтах.
+
+    container_path — путь от корня до элемента со списком машин, как в
+    CarProcessor.get_cars_element (берётся первый найденный контейнер).
+    VIN — текст первого дочернего тега vin_tag, как в sort_cars_by_vin.
+
+    Returns:
+        (encoding, index) или None, если файл нельзя читать по кускам
+        (ошибка разбора, DOCTYPE, пространства имён) — тогда читаем файл целиком.
+    """
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    # Корень — глубина 1, контейнер — len(container_path) + 1, машины — на уровень ниже
+    car_depth = len(container_path) + 2
+    state = {
+        'encoding': None,
+        'depth': 0,
+        'path': [],
+        'container_done': False,
+        'in_container': False,
+        'car_start': None,
+        'vin': None,
+        'vin_text': None,
+        'streamable': True,
+    }
+    index: List[Tuple[str, int, int]] = []
+
+    def on_xml_decl(version, encoding, standalone):
+        state['encoding'] = encoding
+
+    def on_doctype(*args):
+        state['streamable'] = False
+
+    def on_start(tag, attrs):
+        depth = state['depth'] = state['depth'] + 1
+        if depth > 1:
+            state['path'].append(tag)
+        if depth <= car_depth and any(name == 'xmlns' or name.startswith('xmlns:') for name in attrs):
+            state['streamable'] = False
+
+        if depth == car_depth - 1 and not state['container_done'] and tuple(state['path']) == container_path:
+            state['in_container'] = True
+        elif depth == car_depth and state['in_container']:
+            state['car_start'] = parser.CurrentByteIndex
+            state['vin'] = None
+        elif depth == car_depth + 1 and state['car_start'] is not None:
+            if state['vin'] is None and tag == vin_tag:
+                state['vin_text'] = []
+        elif state['vin_text'] is not None:
+            # Текст после вложенного тега не входит в .text элемента
+            state['vin'] = ''.join(state['vin_text'])
+            state['vin_text'] = None
+
+    def on_end(tag):
+        depth = state['depth']
+        if depth == car_depth + 1 and state['vin_text'] is not None:
+            state['vin'] = ''.join(state['vin_text'])
+            state['vin_text'] = None
+        elif depth == car_depth and state['car_start'] is not None:
+            end_tag_start = parser.CurrentByteIndex
+            index.append(((state['vin'] or '').strip(), state['car_start'], end_tag_start))
+            state['car_start'] = None
+        elif depth == car_depth - 1 and state['in_container']:
+            state['in_container'] = False
+            state['container_done'] = True
+        if depth > 1:
+            state['path'].pop()
+        state['depth'] = depth - 1
+
+    def on_text(text):
+        if state['vin_text'] is not None:
+            state['vin_text'].append(text)
+
+    parser.XmlDeclHandler = on_xml_decl
+    parser.StartDoctypeDeclHandler = on_doctype
+    parser.StartElementHandler = on_start
+    parser.EndElementHandler = on_end
+    parser.CharacterDataHandler = on_text
+
+    try:
+        with open(filename, 'rb') as f:
+            parser.ParseFile(f)
+    except (expat.ExpatError, OSError) as e:
+        print(f"[build_xml_cars_index] Не удалось проиндексировать '{filename}': {e}")
+        return None
+
+    if not state['streamable']:
+        return None
+
+    # Для </car> expat отдаёт позицию начала закрывающего тега, а для пустого <car/> —
+    # позицию сразу после него; конец элемента — следующая за ней '>' или она сама.
+    with open(filename, 'rb') as f:
+        resolved_index = []
+        for vin, start, end_tag_start in index:
+            start_tag_close = _find_xml_byte(f, start, b'>')
+            if start_tag_close is None:
+                return None
+            f.seek(start_tag_close - 1)
+            if f.read(1) == b'/' and start_tag_close + 1 == end_tag_start:
+                resolved_index.append((vin, start, end_tag_start))
+                continue
+            end_tag_close = _find_xml_byte(f, end_tag_start, b'>')
+            if end_tag_close is None:
+                return None
+            resolved_index.append((vin, start, end_tag_close + 1))
+
+    return state['encoding'], resolved_index
+
+
+def _find_xml_byte(f, position: int, needle: bytes, chunk_size: int = 4096) -> Optional[int]:
+    """Ищет байт needle в файле начиная с position и возвращает его абсолютную позицию."""
+    f.seek(position)
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return None
+        found = chunk.find(needle)
+        if found >= 0:
+            return position + found
+        position += len(chunk)
+
+
+def iter_xml_cars(filename: str, encoding: Optional[str], index: List[Tuple[str, int, int]]) -> Iterator[ET.Element]:
+    """
+    Отдаёт элементы машин по одному в порядке индекса (см. build_xml_cars_index).
+    Каждый элемент разбирается из своего куска файла и очищается после обработки.
+    """
+    header = f'<?xml version="1.0" encoding="{encoding}"?>'.encode('ascii') if encoding else b''
+    with open(filename, 'rb') as f:
+        for _vin, start, end in index:
+            f.seek(start)
+            car = ET.fromstring(header + f.read(end - start))
+            yield car
+            car.clear()
+
+
+class XmlCarsStream:
+    """Повторно итерируемые машины фида по индексу build_xml_cars_index (каждый проход читает файл заново)."""
+
+    def __init__(self, filename: str, encoding: Optional[str], index: List[Tuple[str, int, int]]):
+        self.filename = filename
+        self.encoding = encoding
+        self.index = index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __iter__(self) -> Iterator[ET.Element]:
+        return iter_xml_cars(self.filename, self.encoding, self.index)
+
+
+class CarsXmlWriter:
+    """
+    Потоковая запись cars.xml в формате data_cars_car: каждая машина пишется в файл
+    сразу в append(), элементы в памяти не копятся. Пишем во временный файл рядом
+    с output_path и подменяем его атомарно в finish(); до первой машины файл не создаётся.
+
+    Результат совпадает с ElementTree.write(output_path, encoding='utf-8', xml_declaration=True)
+    для <data><cars>...</cars></data>.
+    """
+
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self.temp_path = f"{output_path}.tmp"
+        self.count = 0
+        self._file = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _open(self) -> None:
+        os.makedirs(os.path.dirname(self.output_path) or '.', exist_ok=True)
+        self._file = open(self.temp_path, 'w', encoding='utf-8', errors='xmlcharrefreplace')
+        self._file.write("<?xml version='1.0' encoding='utf-8'?>\n<data>")
+
+    @timed('xml_write')
+    def append(self, car: ET.Element) -> None:
+        if self._file is None:
+            self._open()
+        if not self.count:
+            self._file.write('<cars>')
+        self._file.write(ET.tostring(car, encoding='unicode'))
+        self.count += 1
+
+    def finish(self) -> None:
+        """Дописывает закрывающие теги и публикует файл (пустой список — <cars />)."""
+        if self._file is None:
+            self._open()
+        self._file.write('</cars></data>' if self.count else '<cars /></data>')
+        self._file.close()
+        self._file = None
+        os.replace(self.temp_path, self.output_path)
+
+    def discard(self) -> None:
+        """Удаляет недописанный временный файл, output_path остаётся прежним."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
 def setup_directories(thumbs_dir: str, cars_dir: str) -> None:
     """
     Создает необходимые директории для работы программы.
@@ -1245,7 +1560,7 @@ def check_local_files(brand, model, color, vin):
                 return f"/{thumb_brand_path}"
             else:
                 errorText = f"\nvin: <code>{vin}</code>\n<b>Не найден локальный файл</b>\n<pre>{color_image}</pre>\n<code>public/{thumb_path}</code>\n<code>public/{thumb_brand_path}</code>"
-                print_message(errorText)
+                print_message(errorText, key=('Не найден локальный файл', thumb_path))
                 return DEFAULT_CAR_IMAGE
         else:
             return DEFAULT_CAR_IMAGE
@@ -1289,13 +1604,28 @@ def get_redirect_target_for_car_url(
     return load_routes_redirects(routes_path).get(car_path)
 
 
-def create_file(car_data, filename, friendly_url, current_thumbs, sort_storage_data, dealer_photos_for_cars_avito, config, existing_files):
+def render_car_file(data, body, prefix=''):
+    """Собирает MDX: frontmatter в YAML и контент после него."""
+    return prefix + "---\n" + dump_frontmatter(data) + "---\n" + body
+
+
+@timed('mdx_write')
+def write_car_file(filename, data, body, prefix=''):
+    """Сериализует frontmatter и записывает MDX-файл автомобиля."""
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(render_car_file(data, body, prefix))
+
+
+def create_file(car_data, filename, friendly_url, current_thumbs, sort_storage_data, dealer_photos_for_cars_avito, config, existing_files,
+                rendered=None, write_file=write_car_file):
     """
     Создает файл с frontmatter в формате YAML и контентом, используя car_data (dict).
     Args:
         car_data: dict с данными автомобиля
         filename: путь к файлу
         ... остальные параметры без изменений ...
+        rendered: заранее посчитанные h1/breadcrumb/title/description/content (см. CarProcessor.prepare_car)
+        write_file: функция записи файла (filename, data, body)
     """
     # Получаем основные значения из словаря
     vin = car_data.get('vin')
@@ -1332,15 +1662,23 @@ def create_file(car_data, filename, friendly_url, current_thumbs, sort_storage_d
         data['equipment'] = equipment
 
     # Используем шаблоны для h1, breadcrumb, title, description
-    data['h1'] = get_h1(car_data, config)
-    data['breadcrumb'] = get_breadcrumb(car_data, config)
-    data['title'] = get_title(car_data, config)
-    data['description'] = get_description(car_data, config)
+    if rendered is not None:
+        data['h1'] = rendered['h1']
+        data['breadcrumb'] = rendered['breadcrumb']
+        data['title'] = rendered['title']
+        data['description'] = rendered['description']
+        content = rendered['content']
+    else:
+        data['h1'] = get_h1(car_data, config)
+        data['breadcrumb'] = get_breadcrumb(car_data, config)
+        data['title'] = get_title(car_data, config)
+        data['description'] = get_description(car_data, config)
 
-    # Описание для контента
-    description_for_content = car_data.get('description', '')
-    if vin in dealer_photos_for_cars_avito and dealer_photos_for_cars_avito[vin]['description'] and not description_for_content:
-        description_for_content = dealer_photos_for_cars_avito[vin]['description']
+        # Описание для контента
+        description_for_content = car_data.get('description', '')
+        if vin in dealer_photos_for_cars_avito and dealer_photos_for_cars_avito[vin]['description'] and not description_for_content:
+            description_for_content = dealer_photos_for_cars_avito[vin]['description']
+        content = process_description(description_for_content)
 
     # Сначала получаем изображения из car_data
     images = list(car_data.get('images', []))
@@ -1361,18 +1699,10 @@ def create_file(car_data, filename, friendly_url, current_thumbs, sort_storage_d
             except Exception:
                 pass  # Если не удалось привести к числу, оставляем как есть
 
-    # Сериализация в YAML
-    content = "---\n"
-    content += yaml.safe_dump(data, default_flow_style=False, allow_unicode=True)
-    content += "---\n"
-
-    # Добавление description и остального контента
-    content += process_description(description_for_content)
-
-    # Запись в файл
-    with open(filename, 'w') as f:
-        f.write(content)
-    print(f"Создан файл: {filename}")
+    # Сериализация в YAML и запись в файл
+    write_file(filename, data, content)
+    tally("MDX создано")
+    detail(f"Создан файл: {filename}")
     existing_files.add(filename)
 
 def format_value(value: str) -> str:
@@ -1391,11 +1721,8 @@ def format_value(value: str) -> str:
         return f"'{value}'"
     return value
 
-def update_yaml(car_data, filename, friendly_url, current_thumbs, sort_storage_data, dealer_photos_for_cars_avito, config, existing_files):
-    """
-    Обновляет YAML-файл, используя car_data (dict) вместо XML-элемента.
-    """
-    print(f"Обновление файла: {filename}")
+def read_car_file(filename):
+    """Читает MDX автомобиля: (frontmatter как dict, контент после него, текст до первого ---)."""
     with open(filename, "r", encoding="utf-8") as f:
         content = f.read()
 
@@ -1409,7 +1736,18 @@ def update_yaml(car_data, filename, friendly_url, current_thumbs, sort_storage_d
 
     # Parse the YAML block
     yaml_block = parts[1].strip()
-    data = yaml.safe_load(yaml_block)
+    return load_frontmatter(yaml_block), yaml_delimiter.join(parts[2:]), parts[0]
+
+
+def update_yaml(car_data, filename, friendly_url, current_thumbs, sort_storage_data, dealer_photos_for_cars_avito, config, existing_files,
+                rendered=None, write_file=write_car_file, loaded=None):
+    """
+    Обновляет YAML-файл, используя car_data (dict) вместо XML-элемента.
+    rendered и write_file — как в create_file.
+    loaded: (data, body, prefix) файла, уже собранного в памяти; без него файл читается с диска.
+    """
+    detail(f"Обновление файла: {filename}")
+    data, body, prefix = loaded if loaded is not None else read_car_file(filename)
     vin = car_data.get('vin')
     # Проверка: если vin уже есть в vin_list, не обновляем файл (логика на dict)
     if vin and 'vin_list' in data and vin in [v.strip() for v in data['vin_list'].split(',')]:
@@ -1431,14 +1769,11 @@ def update_yaml(car_data, filename, friendly_url, current_thumbs, sort_storage_d
         )
         _sync_processed_images_to_car_data(car_data, data)
 
-        updated_yaml_block = yaml.safe_dump(data, default_flow_style=False, allow_unicode=True)
-        updated_content = yaml_delimiter.join([parts[0], updated_yaml_block, yaml_delimiter.join(parts[2:])])
-
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(updated_content)
+        write_file(filename, data, body, prefix)
 
         existing_files.add(filename)
-        print(f"Такой VIN {vin} уже есть в файле, обновлены только изображения")
+        tally("VIN уже в MDX, обновлены только изображения")
+        detail(f"Такой VIN {vin} уже есть в файле, обновлены только изображения")
         return filename
     if vin:
         data['vin_list'] += ", " + vin
@@ -1482,7 +1817,7 @@ def update_yaml(car_data, filename, friendly_url, current_thumbs, sort_storage_d
             data['priceWithDiscount'] = min(data_priceWithDiscount_value, car_priceWithDiscount_value)
             data['sale_price'] = min(data_priceWithDiscount_value, car_priceWithDiscount_value)
             # Используем get_description для генерации description
-            data["description"] = get_description(car_data, config)
+            data["description"] = rendered['description'] if rendered is not None else get_description(car_data, config)
         except ValueError:
             pass
 
@@ -1524,15 +1859,11 @@ def update_yaml(car_data, filename, friendly_url, current_thumbs, sort_storage_d
         color=data.get('color', str(car_data.get('color', '')).capitalize()),
     )
     _sync_processed_images_to_car_data(car_data, data)
-    updated_yaml_block = yaml.safe_dump(data, default_flow_style=False, allow_unicode=True)
-
-    # Reassemble the content with the updated YAML block
-    updated_content = yaml_delimiter.join([parts[0], updated_yaml_block, yaml_delimiter.join(parts[2:])])
 
+    tally("MDX дополнено машиной")
     existing_files.add(filename)
-    # Save the updated content to the output file
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(updated_content)
+    # Reassemble the content with the updated YAML block and save it
+    write_file(filename, data, body, prefix)
 
     return filename
 
@@ -1693,7 +2024,7 @@ def duplicate_car(car, config, n, status="в пути", offset=0):
 def _load_env_json() -> Dict[str, Any]:
     """
     Загружает env.json как фолбек для переменных окружения.
-    Ищет файл в нескольких местах.
+    Ищет файл в нескольких местах, файл разбирается один раз (см. settings_snapshot).
     """
     repo_root = Path(__file__).resolve().parents[2]
     candidates = [
@@ -1701,15 +2032,44 @@ def _load_env_json() -> Dict[str, Any]:
         Path('./src/data/site/env.json'),
     ]
     for candidate in candidates:
-        if candidate.exists():
-            try:
-                with open(candidate, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception:
-                pass
+        data = cached_file(candidate, read_json)
+        if isinstance(data, dict):
+            return data
     return {}
 
 
+def _parse_dotenv_file(path: str) -> Optional[Dict[str, str]]:
+    """Разбирает простые KEY=VALUE пары из .env; None, если файл не прочитать."""
+    values = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#') or '=' not in line:
+                    continue
+
+                if line.startswith('export '):
+                    line = line[len('export '):].strip()
+
+                key, value = line.split('=', 1)
+                key = key.strip()
+                value = value.strip()
+
+                if (
+                    len(value) >= 2
+                    and value[0] == value[-1]
+                    and value[0] in ('"', "'")
+                ):
+                    value = value[1:-1]
+                    if line.split('=', 1)[1].strip().startswith('"'):
+                        value = value.replace(r'\"', '"').replace(r'\\', '\\')
+
+                values[key] = value
+        return values
+    except Exception:
+        return None
+
+
 def _load_dotenv_file() -> Dict[str, str]:
     """
     Загружает простые KEY=VALUE пары из локального .env.
@@ -1721,37 +2081,9 @@ def _load_dotenv_file() -> Dict[str, str]:
         Path('./.env'),
     ]
     for candidate in candidates:
-        if not candidate.exists():
-            continue
-
-        values = {}
-        try:
-            with open(candidate, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if not line or line.startswith('#') or '=' not in line:
-                        continue
-
-                    if line.startswith('export '):
-                        line = line[len('export '):].strip()
-
-                    key, value = line.split('=', 1)
-                    key = key.strip()
-                    value = value.strip()
-
-                    if (
-                        len(value) >= 2
-                        and value[0] == value[-1]
-                        and value[0] in ('"', "'")
-                    ):
-                        value = value[1:-1]
-                        if line.split('=', 1)[1].strip().startswith('"'):
-                            value = value.replace(r'\"', '"').replace(r'\\', '\\')
-
-                    values[key] = value
+        values = cached_file(candidate, _parse_dotenv_file)
+        if values is not None:
             return values
-        except Exception:
-            pass
 
     return {}
 
@@ -1932,65 +2264,18 @@ def extract_image_urls(images_container, image_tag):
                 print(f"  ⚠️ Изображение {i+1}: Не удалось извлечь URL (нет атрибута 'url' и текста)")
     return images
 
-def render_template_string(template: str, car, config):
-    """
-    Заменяет плейсхолдеры вида {{car.field}} и {{config.field}} на значения из car (dict) и config соответственно.
-    Теперь поддерживает только dict для car.
-    Пример: '{{car.mark_id}} {{car.folder_id}} у {{config.legal_city_where}}'
-    """
-    def get_car_value(field):
-        # Теперь car - это dict, а не XML
-        return str(car.get(field, ''))
-    def get_config_value(field):
-        return config.get(field, '')
-
-    def replacer(match):
-        expr = match.group(1).strip()
-        if expr.startswith('car.'):
-            return get_car_value(expr[4:])
-        elif expr.startswith('config.'):
-            return str(get_config_value(expr[7:]))
-        else:
-            return match.group(0)  # не меняем, если не car/config
-
-    # Заменяем все плейсхолдеры вида {{...}}
-    return re.sub(r'\{\{\s*([^}]+)\s*\}\}', replacer, template)
-
 def get_h1(car, config):
     """Генерирует h1 для автомобиля по шаблону (car - dict)."""
-    template = config.get('h1_template') or '{{car.mark_id}} {{car.folder_id}} {{car.modification_id}} {{car.complectation_name}} {{car.color}}'
-    return render_template_string(template, car, config).strip()
+    return get_template_renderer(config, 'h1_template')(car, config).strip()
 
 def get_breadcrumb(car, config):
     """Генерирует breadcrumb для автомобиля по шаблону (car - dict)."""
-    template = config.get('breadcrumb_template') or '{{car.mark_id}} {{car.folder_id}} {{car.complectation_name}}'
-    return render_template_string(template, car, config).strip()
+    return get_template_renderer(config, 'breadcrumb_template')(car, config).strip()
 
 def get_title(car, config):
     """Генерирует title для автомобиля по шаблону (car - dict)."""
-    template = config.get('title_template') or 'Купить {{car.mark_id}} {{car.folder_id}} {{car.modification_id}} {{car.complectation_name}} {{car.color}} у официального дилера в {{config.legal_city_where}}'
-    return render_template_string(template, car, config).strip()
+    return get_template_renderer(config, 'title_template')(car, config).strip()
 
 def get_description(car, config):
-    """Генерирует description для автомобиля по шаблону (car - dict)."""
-    template = config.get('description_template') or (
-        'Купить автомобиль {{car.mark_id}} {{car.folder_id}}'
-        '{% if car.year %} {{car.year}} года выпуска{% endif %}'
-        '{% if car.complectation_name %}, комплектация {{car.complectation_name}}{% endif %}'
-        '{% if car.color %}, цвет - {{car.color}}{% endif %}'
-        '{% if car.modification_id %}, двигатель - {{car.modification_id}}{% endif %}'
-        ' у официального дилера в г. {{config.legal_city}}. Стоимость данного автомобиля {{car.mark_id}} {{car.folder_id}} – {{car.priceWithDiscount}}'
-    )
-    # Удаляем все конструкции {% if ... %} ... {% endif %}, если поля пустые
-    def if_replacer(match):
-        expr = match.group(1).strip()
-        # Пример: car.year
-        if expr.startswith('car.'):
-            field = expr[4:]
-            if car.get(field):
-                return match.group(2)
-            else:
-                return ''
-        return ''
-    template = re.sub(r'\{% if ([^%]+)%\}([\s\S]*?)\{% endif %\}', if_replacer, template)
-    return render_template_string(template, car, config).strip()
+    """Генерирует description для автомобиля по шаблону (car - dict), с блоками {% if car.x %}...{% endif %}."""
+    return get_template_renderer(config, 'description_template')(car, config).strip()